@@ -70,6 +70,9 @@ const APPS: Record<string, AppInfo> = {
 const API_URL = 'https://alto-api-83dp.onrender.com/process-voice';
 const TTS_ONLY_URL = 'https://alto-api-83dp.onrender.com/tts-only';
 
+// Identifiant de session : le backend garde un historique par session
+const SESSION_ID = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
+
 export default function useVoiceRecognition() {
   const recordingRef = useRef<Audio.Recording | null>(null);
   const [error, setError] = useState<string | null>(null);
@@ -577,6 +580,7 @@ const stopRecording = async () => {
       { uri, name: `audio.${uri.split('.').pop()}`, type: uri.endsWith('.wav') ? 'audio/wav' : 'audio/webm' } as any,
     );
     if (lat && lng) { fd.append('lat', String(lat)); fd.append('lng', String(lng)); }
+    fd.append('session_id', SESSION_ID);
 
     const { data } = await axios.post(API_URL, fd, {
       headers: { 'Content-Type': 'multipart/form-data' },
@@ -0,0 +1,362 @@
+import asyncio
+import io
+import logging
+import os
+import shutil
+import subprocess
+import wave
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Réglages du prétraitement (surchargés par variables d'environnement)
+AUDIO_PREPROCESS = os.getenv("AUDIO_PREPROCESS", "1") != "0"
+TARGET_RATE = 16000
+VAD_FRAME_MS = 30
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "10"))
+VAD_FLOOR_DB = float(os.getenv("VAD_FLOOR_DB", "-60"))
+VAD_PAD_MS = int(os.getenv("VAD_PAD_MS", "200"))
+# Flux (WebSocket) : pause qui clôt un segment, silence qui clôt le tour
+SEGMENT_PAUSE_MS = int(os.getenv("SEGMENT_PAUSE_MS", "350"))
+END_OF_SPEECH_MS = int(os.getenv("END_OF_SPEECH_MS", "800"))
+MAX_SEGMENT_S = float(os.getenv("MAX_SEGMENT_S", "15"))
+NOISE_WINDOW_S = 3.0
+# Enregistrements longs : morceaux d'environ CHUNK_S secondes, coupés au
+# point le plus calme des CHUNK_SEARCH_S dernières secondes, avec
+# CHUNK_OVERLAP_S secondes communes de part et d'autre de la coupure
+CHUNK_S = float(os.getenv("STT_CHUNK_S", "30"))
+CHUNK_SEARCH_S = float(os.getenv("STT_CHUNK_SEARCH_S", "8"))
+CHUNK_OVERLAP_S = float(os.getenv("STT_CHUNK_OVERLAP_S", "1"))
+
+# Binaire système ffmpeg (paquet de la distribution, absent de requirements.txt) :
+# nécessaire pour décoder tout ce qui n'est pas du WAV, dont le webm d'Android
+# et le m4a d'iOS. Sans lui, ces enregistrements partent tels quels à Whisper,
+# sans retrait des silences ni découpage des longs enregistrements.
+FFMPEG = shutil.which("ffmpeg")
+
+# FLAC (requirements.txt) : environ deux fois plus compact que le WAV PCM 16 bits
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+
+def check_decoders():
+    """Signale au démarrage (une fois) l'absence de ffmpeg quand le prétraitement est actif."""
+    if AUDIO_PREPROCESS and not FFMPEG:
+        logger.warning(
+            "ffmpeg introuvable : les enregistrements non WAV (webm, m4a…) seront transcrits "
+            "sans prétraitement ni découpage. Installez ffmpeg (ex. apt install ffmpeg)."
+        )
+
+
+# 🎧 Décodage
+def decode_wav(data: bytes) -> tuple[np.ndarray, int]:
+    """WAV PCM (8/16/24/32 bits) → tableau float32 (échantillons × canaux) dans [-1, 1]."""
+    with wave.open(io.BytesIO(data)) as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = (b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8 >> 8
+        samples = ints.astype(np.float32) / 8388608
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width}")
+    return samples.reshape(-1, channels), rate
+
+
+def decode_ffmpeg(data: bytes) -> tuple[np.ndarray, int]:
+    """Autres conteneurs (webm, m4a…) : ffmpeg sort directement du mono 16 kHz."""
+    proc = subprocess.run(
+        [FFMPEG, "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+         "-f", "s16le", "-ac", "1", "-ar", str(TARGET_RATE), "pipe:1"],
+        input=data, capture_output=True, check=True
+    )
+    samples = np.frombuffer(proc.stdout, dtype="<i2").astype(np.float32) / 32768
+    return samples.reshape(-1, 1), TARGET_RATE
+
+
+def decode_pcm16(data: bytes, channels: int = 1) -> np.ndarray:
+    """PCM 16 bits little-endian brut (morceaux reçus en flux) → float32 (échantillons × canaux)."""
+    usable = len(data) - len(data) % (2 * channels)
+    samples = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768
+    return samples.reshape(-1, channels)
+
+
+def decode(data: bytes) -> tuple[np.ndarray, int] | None:
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        try:
+            return decode_wav(data)
+        except (wave.Error, ValueError, EOFError):
+            pass
+    if FFMPEG:
+        try:
+            return decode_ffmpeg(data)
+        except (subprocess.CalledProcessError, OSError):
+            pass
+    return None
+
+
+# 🔧 Traitements vectorisés
+def downmix(samples: np.ndarray) -> np.ndarray:
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+
+def _lowpass_kernel(cutoff: float, taps: int = 63) -> np.ndarray:
+    """Filtre passe-bas à sinus cardinal fenêtré (cutoff en fraction de la fréquence d'échantillonnage)."""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def resample(x: np.ndarray, rate: int, target: int = TARGET_RATE) -> np.ndarray:
+    """Rééchantillonnage : anti-repliement puis interpolation linéaire."""
+    if rate == target or len(x) == 0:
+        return x.astype(np.float32)
+    if target < rate:
+        x = np.convolve(x, _lowpass_kernel(0.45 * target / rate), mode="same")
+    duration = len(x) / rate
+    positions = np.arange(int(duration * target)) * (rate / target)
+    return np.interp(positions, np.arange(len(x)), x).astype(np.float32)
+
+
+class StreamResampler:
+    """
+    Rééchantillonnage d'un flux reçu par morceaux, sans artefact aux
+    jonctions ni dérive de longueur : le filtre anti-repliement garde ses
+    derniers échantillons d'entrée et l'interpolation sa position
+    fractionnaire d'un morceau à l'autre. Même sortie que `resample` sur
+    l'enregistrement entier, aux derniers échantillons près (encore dans le filtre).
+    """
+
+    def __init__(self, rate: int, target: int = TARGET_RATE):
+        self.rate = rate
+        self.target = target
+        self.step = rate / target
+        self._kernel = _lowpass_kernel(0.45 * target / rate) if target < rate else None
+        delay = len(self._kernel) - 1 if self._kernel is not None else 0
+        self._history = np.zeros(delay, dtype=np.float32)
+        # Échantillons filtrés pas encore dépassés, et position du prochain échantillon de sortie ;
+        # le filtre retarde le signal d'une demi-longueur, compensée dès le départ
+        self._filtered = np.zeros(0, dtype=np.float32)
+        self._pos = delay / 2
+
+    def feed(self, x: np.ndarray) -> np.ndarray:
+        if self.rate == self.target:
+            return x.astype(np.float32)
+        if self._kernel is not None:
+            data = np.concatenate([self._history, x])
+            self._history = data[len(data) - len(self._history):]
+            x = np.convolve(data, self._kernel, mode="valid")
+        buf = np.concatenate([self._filtered, x])
+        # Chaque sortie s'interpole entre deux échantillons déjà reçus
+        count = max(int(np.ceil((len(buf) - 1 - self._pos) / self.step)), 0)
+        positions = self._pos + np.arange(count) * self.step
+        out = np.interp(positions, np.arange(len(buf)), buf).astype(np.float32)
+        following = self._pos + count * self.step
+        drop = min(int(following), len(buf))
+        self._filtered = buf[drop:]
+        self._pos = following - drop
+        return out
+
+
+def frame_energy_db(x: np.ndarray, rate: int, frame_ms: int = VAD_FRAME_MS) -> np.ndarray:
+    """Énergie RMS (dBFS) par trame de `frame_ms` millisecondes."""
+    frame = max(int(rate * frame_ms / 1000), 1)
+    count = len(x) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = x[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def voiced_frames(energy: np.ndarray) -> np.ndarray:
+    """
+    VAD par énergie : le seuil suit le bruit de fond (10e percentile) plus une
+    marge, sans dépasser « pic − 20 dB » pour ne pas couper une voix faible
+    sur un enregistrement sans silence, ni descendre sous un plancher absolu.
+    """
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+    noise = np.percentile(energy, 10)
+    threshold = max(min(noise + VAD_MARGIN_DB, energy.max() - 20), VAD_FLOOR_DB)
+    return energy > threshold
+
+
+def trim_silence(x: np.ndarray, rate: int, pad_ms: int = VAD_PAD_MS) -> np.ndarray:
+    """Retire le silence de début et de fin (un tableau vide s'il n'y a aucune parole)."""
+    voiced = np.flatnonzero(voiced_frames(frame_energy_db(x, rate)))
+    if len(voiced) == 0:
+        return x[:0]
+    frame = int(rate * VAD_FRAME_MS / 1000)
+    pad = int(rate * pad_ms / 1000)
+    start = max(voiced[0] * frame - pad, 0)
+    end = min((voiced[-1] + 1) * frame + pad, len(x))
+    return x[start:end]
+
+
+class SpeechSegmenter:
+    """
+    VAD en flux sur de l'audio mono 16 kHz reçu par morceaux : la parole est
+    découpée aux pauses (segments transcriptibles pendant que l'utilisateur
+    parle encore) et `ended` passe à True après un silence prolongé.
+    Le bruit de fond est le minimum des énergies sur les dernières secondes,
+    faute de connaître l'enregistrement entier comme dans `voiced_frames`.
+    """
+
+    def __init__(
+        self,
+        rate: int = TARGET_RATE,
+        pause_ms: int = SEGMENT_PAUSE_MS,
+        end_ms: int = END_OF_SPEECH_MS,
+        pad_ms: int = VAD_PAD_MS,
+        max_segment_s: float = MAX_SEGMENT_S,
+    ):
+        self.frame = int(rate * VAD_FRAME_MS / 1000)
+        self.pause_frames = max(pause_ms // VAD_FRAME_MS, 1)
+        self.end_frames = max(end_ms // VAD_FRAME_MS, 1)
+        self.pad_frames = pad_ms // VAD_FRAME_MS
+        self.max_frames = int(max_segment_s * 1000 / VAD_FRAME_MS)
+        self._noise = deque(maxlen=int(NOISE_WINDOW_S * 1000 / VAD_FRAME_MS))
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._frames: list[np.ndarray] = []
+        self._voiced = 0
+        self._silence = 0
+        self.speech_seen = False
+        self.ended = False
+
+    def _is_voiced(self, energy: float) -> bool:
+        self._noise.append(energy)
+        return energy > max(min(self._noise) + VAD_MARGIN_DB, VAD_FLOOR_DB)
+
+    def _cut(self) -> np.ndarray:
+        # On garde `pad` de silence après la dernière trame voisée
+        keep = len(self._frames) - max(self._silence - self.pad_frames, 0)
+        segment = np.concatenate(self._frames[:keep])
+        self._frames, self._voiced = [], 0
+        return segment
+
+    def feed(self, x: np.ndarray) -> list[np.ndarray]:
+        """Ajoute des échantillons ; renvoie les segments de parole terminés."""
+        segments = []
+        data = np.concatenate([self._pending, x])
+        count = len(data) // self.frame
+        frames = data[:count * self.frame].reshape(count, self.frame)
+        self._pending = data[count * self.frame:]
+        energies = 20 * np.log10(np.maximum(np.sqrt(np.mean(frames ** 2, axis=1)), 1e-10))
+
+        for frame, energy in zip(frames, energies):
+            self._frames.append(frame)
+            if self._is_voiced(energy):
+                self._voiced += 1
+                self._silence = 0
+                self.speech_seen = True
+            else:
+                self._silence += 1
+                if self._voiced == 0:
+                    # Avant la parole : seulement une marge de silence
+                    del self._frames[:-max(self.pad_frames, 1)]
+            if self._voiced and (self._silence >= self.pause_frames or len(self._frames) >= self.max_frames):
+                segments.append(self._cut())
+            if self.speech_seen and self._silence >= self.end_frames:
+                self.ended = True
+        return segments
+
+    def flush(self) -> np.ndarray | None:
+        """Fin du tour : renvoie le segment en cours s'il contient de la parole."""
+        segment = self._cut() if self._voiced else None
+        self._frames = []
+        return segment
+
+
+def split_at_silences(
+    x: np.ndarray,
+    rate: int = TARGET_RATE,
+    chunk_s: float = CHUNK_S,
+    search_s: float = CHUNK_SEARCH_S,
+    overlap_s: float = CHUNK_OVERLAP_S,
+) -> list[np.ndarray]:
+    """
+    Découpe un long enregistrement en morceaux d'au plus `chunk_s` secondes
+    (plus le chevauchement). Chaque coupure tombe sur la trame la plus calme
+    de la fenêtre de recherche, de préférence une pause entre deux phrases ;
+    le chevauchement rattrape un mot coupé quand il n'y a pas de vraie pause.
+    """
+    frame = int(rate * VAD_FRAME_MS / 1000)
+    chunk = int(chunk_s * rate)
+    search = min(int(search_s * rate), chunk // 2)
+    half = int(overlap_s * rate / 2)
+    # Un dernier morceau trop court ne vaut pas un appel de plus
+    if len(x) <= chunk * 1.25:
+        return [x]
+    energy = frame_energy_db(x, rate)
+
+    pieces, start = [], 0
+    while len(x) - start > chunk * 1.25:
+        lo = (start + chunk - search) // frame
+        hi = (start + chunk) // frame
+        # À énergie égale, la trame la plus tardive (morceaux les plus longs possible)
+        window = energy[lo:hi][::-1]
+        cut = (hi - 1 - int(np.argmin(window))) * frame + frame // 2
+        pieces.append(x[start:cut + half])
+        start = cut - half
+    pieces.append(x[start:])
+    return pieces
+
+
+# 📦 Encodage compact
+def encode(x: np.ndarray, rate: int = TARGET_RATE) -> tuple[bytes, str]:
+    """FLAC si soundfile est installé, sinon WAV PCM 16 bits mono."""
+    pcm = (np.clip(x, -1, 1) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    if soundfile is not None:
+        soundfile.write(buf, pcm, rate, format="FLAC", subtype="PCM_16")
+        return buf.getvalue(), "audio.flac"
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue(), "audio.wav"
+
+
+def preprocess(data: bytes, filename: str) -> tuple[list[tuple[bytes, str]], float]:
+    """
+    Décode, passe en mono 16 kHz, retire les silences, découpe les longs
+    enregistrements (cf. split_at_silences) et ré-encode chaque morceau.
+    Renvoie ([(octets, nom de fichier), …], durée en secondes). Si le format
+    n'est pas décodable, l'audio d'origine est renvoyé tel quel (durée -1).
+    Un enregistrement d'un seul morceau garde ses octets d'origine quand le
+    ré-encodage n'est pas plus petit (webm / m4a compressés, WAV 8 kHz…) ;
+    un long enregistrement reste découpé (transcription en parallèle).
+    """
+    decoded = decode(data)
+    if decoded is None:
+        return [(data, filename)], -1.0
+    samples, rate = decoded
+    mono = resample(downmix(samples), rate)
+    speech = trim_silence(mono, TARGET_RATE)
+    if len(speech) == 0:
+        return [], 0.0
+    duration = len(speech) / TARGET_RATE
+    pieces = split_at_silences(speech)
+    if len(pieces) == 1:
+        encoded = encode(pieces[0])
+        return [encoded if len(encoded[0]) < len(data) else (data, filename)], duration
+    return [encode(piece) for piece in pieces], duration
+
+
+async def preprocess_audio(data: bytes, filename: str) -> tuple[list[tuple[bytes, str]], float]:
+    """Version asynchrone : le calcul tourne hors de la boucle d'événements."""
+    if not AUDIO_PREPROCESS:
+        return [(data, filename)], -1.0
+    return await asyncio.to_thread(preprocess, data, filename)
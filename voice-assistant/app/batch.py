@@ -0,0 +1,201 @@
+import asyncio
+import base64
+import logging
+import os
+import threading
+import time
+import uuid
+
+from fastapi import UploadFile
+
+from app.clients import OPENAI_STT
+from app.governor import RETRY_AFTER, overload_cause
+from app.utils import FALLBACK_ANSWER, ask_gpt, conversation_store, synthesize_speech, transcribe_audio
+
+logger = logging.getLogger(__name__)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "16"))
+# Appels STT simultanés pour tout le lot, morceaux des longs enregistrements compris.
+# Sans ce plafond, chaque enregistrement lance jusqu'à STT_CHUNK_PARALLELISM (8) appels :
+# quelques longues dictées rempliraient openai_stt (16 appels, file de 32, 2 s d'attente
+# au plus, cf. governor.QUEUE_TIMEOUT) et leurs propres morceaux seraient refusés
+# (« queue timeout »). La moitié des places reste aux requêtes interactives.
+BATCH_STT_PARALLELISM = int(os.getenv("BATCH_STT_PARALLELISM", str(max(OPENAI_STT.concurrency // 2, 1))))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+# Whisper refuse les fichiers de plus de 25 Mo
+BATCH_MAX_ITEM_BYTES = int(os.getenv("BATCH_MAX_ITEM_BYTES", str(25 * 1024 * 1024)))
+# Corps complet de la requête (archives comprises)
+BATCH_MAX_UPLOAD_BYTES = int(os.getenv("BATCH_MAX_UPLOAD_BYTES", str(500 * 1024 * 1024)))
+
+# transcribe : transcription seule ; respond : + réponse GPT ; speak : + synthèse vocale
+BATCH_MODES = ("transcribe", "respond", "speak")
+
+# Formats acceptés par Whisper
+AUDIO_EXTENSIONS = frozenset({"flac", "m4a", "mp3", "mp4", "mpeg", "mpga", "oga", "ogg", "wav", "webm"})
+
+
+def _extension(name: str) -> str:
+    return name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+
+def _is_audio(name: str) -> bool:
+    base = name.rsplit("/", 1)[-1]
+    # Fichiers cachés et métadonnées macOS (__MACOSX/._*) ignorés
+    return not base.startswith(".") and "__MACOSX/" not in name and _extension(base) in AUDIO_EXTENSIONS
+
+
+class BatchItem:
+    """Un enregistrement du lot ; son contenu n'est lu qu'au moment de le traiter."""
+
+    __slots__ = ("name", "size", "error", "_read")
+
+    def __init__(self, name: str, size: int | None, read=None, error: str | None = None):
+        self.name = name
+        self.size = size
+        self.error = error
+        self._read = read
+
+    async def read(self) -> bytes:
+        return await self._read()
+
+
+def _upload_item(upload: UploadFile, name: str) -> BatchItem:
+    async def read() -> bytes:
+        await upload.seek(0)
+        return await upload.read()
+    return BatchItem(name, upload.size, read)
+
+
+def _archive_items(upload: UploadFile, name: str) -> list[BatchItem] | None:
+    """Enregistrements d'une archive zip ou tar(.gz) ; None si ce n'en est pas une."""
+    # Importés à la demande : les lots restent rares
+    import tarfile
+    import zipfile
+
+    f = upload.file
+    # Une seule lecture à la fois dans l'archive (le fichier sous-jacent est partagé)
+    lock = threading.Lock()
+
+    def member(member_name: str, size: int, extract) -> BatchItem:
+        def read_sync() -> bytes:
+            with lock:
+                return extract()
+        return BatchItem(f"{name}/{member_name}", size, lambda: asyncio.to_thread(read_sync))
+
+    f.seek(0)
+    if zipfile.is_zipfile(f):
+        archive = zipfile.ZipFile(f)
+        return [
+            member(info.filename, info.file_size, lambda info=info: archive.read(info))
+            for info in archive.infolist()
+            if not info.is_dir() and _is_audio(info.filename)
+        ]
+
+    f.seek(0)
+    try:
+        archive = tarfile.open(fileobj=f, mode="r:*")
+        members = archive.getmembers()
+    except tarfile.TarError:
+        return None
+    return [
+        member(info.name, info.size, lambda info=info: archive.extractfile(info).read())
+        for info in members
+        if info.isfile() and _is_audio(info.name)
+    ]
+
+
+async def collect_items(uploads: list[UploadFile]) -> list[BatchItem]:
+    """Fichiers audio envoyés tels quels ou dans des archives, dans l'ordre de la requête."""
+    items = []
+    for index, upload in enumerate(uploads):
+        name = upload.filename or f"file-{index}"
+        if _is_audio(name):
+            items.append(_upload_item(upload, name))
+            continue
+        members = await asyncio.to_thread(_archive_items, upload, name)
+        if members is None:
+            items.append(BatchItem(name, upload.size, error="Unsupported file type."))
+        else:
+            items.extend(members)
+    return items
+
+
+def _describe(exc: Exception) -> dict:
+    overload = overload_cause(exc)
+    if overload is not None:
+        return {"error": f"Service overloaded ({overload.upstream}: {overload.reason}).", "retry_after": RETRY_AFTER}
+    message = str(exc) or type(exc).__name__
+    return {"error": message[:300]}
+
+
+async def _process(item: BatchItem, mode: str, lat: float, lng: float, stt_slots: asyncio.Semaphore) -> dict:
+    if item.error:
+        raise ValueError(item.error)
+    if item.size is not None and item.size > BATCH_MAX_ITEM_BYTES:
+        raise ValueError(f"File exceeds {BATCH_MAX_ITEM_BYTES} bytes.")
+    data = await item.read()
+    if len(data) > BATCH_MAX_ITEM_BYTES:
+        raise ValueError(f"File exceeds {BATCH_MAX_ITEM_BYTES} bytes.")
+
+    transcript = await transcribe_audio(data, item.name.rsplit("/", 1)[-1], stt_slots=stt_slots)
+    result = {"transcript": transcript}
+    if mode == "transcribe":
+        return result
+
+    # Chaque enregistrement est indépendant : session éphémère, effacée ensuite
+    session_id = f"batch-{uuid.uuid4().hex}"
+    try:
+        reply = await ask_gpt(transcript, lat=lat, lng=lng, session_id=session_id)
+    finally:
+        await conversation_store.clear(session_id)
+    text = reply.get("text_to_speak") or FALLBACK_ANSWER
+    result.update(response_text=text, action=reply.get("action"))
+    if mode == "speak":
+        result["audio"] = base64.b64encode(await synthesize_speech(text)).decode()
+    return result
+
+
+async def run_batch(items: list[BatchItem], mode: str = "transcribe", lat: float = None, lng: float = None,
+                    concurrency: int = BATCH_CONCURRENCY):
+    """
+    Traite les enregistrements au plus `concurrency` à la fois et produit un
+    résultat par enregistrement dès qu'il est prêt (ordre d'achèvement, avec
+    son `index` dans le lot), puis un récapitulatif. L'échec d'un
+    enregistrement n'interrompt pas le lot. Les appels STT de tout le lot
+    sont en plus bornés à BATCH_STT_PARALLELISM.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    stt_slots = asyncio.Semaphore(BATCH_STT_PARALLELISM)
+    started = time.perf_counter()
+
+    async def process(index: int, item: BatchItem) -> dict:
+        async with slots:
+            start = time.perf_counter()
+            try:
+                outcome = {"ok": True, **await _process(item, mode, lat, lng, stt_slots)}
+            except Exception as e:
+                logger.warning("Lot : %s en échec : %s", item.name, e)
+                outcome = {"ok": False, **_describe(e)}
+            duration = round((time.perf_counter() - start) * 1000, 1)
+        return {"type": "item", "index": index, "name": item.name, **outcome, "duration_ms": duration}
+
+    tasks = [asyncio.create_task(process(index, item)) for index, item in enumerate(items)]
+    succeeded = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            succeeded += result["ok"]
+            yield result
+    finally:
+        # Client parti en cours de route : on n'use pas les quotas pour rien
+        for task in tasks:
+            task.cancel()
+
+    yield {
+        "type": "summary",
+        "total": len(items),
+        "succeeded": succeeded,
+        "failed": len(items) - succeeded,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
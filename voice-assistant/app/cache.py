@@ -0,0 +1,103 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class AsyncTTLCache:
+    """
+    Cache asynchrone borné (LRU) avec durée de vie par entrée et
+    coalescence des requêtes : si 50 appels concurrents demandent la même
+    clé absente du cache, un seul appel amont est effectué et tous
+    attendent son résultat. Les erreurs ne sont pas mises en cache.
+    """
+
+    def __init__(self, name: str, ttl: float, maxsize: int = 256):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._inflight: dict = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            # ttl=0 : « ne pas garder » (et oublier une éventuelle valeur précédente)
+            self._data.pop(key, None)
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def get_or_fetch(self, key, fetch, ttl: float = None):
+        """
+        Renvoie la valeur en cache, ou appelle `fetch()` une seule fois pour la clé.
+        `ttl` remplace la durée de vie par défaut pour cette entrée.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fetch()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                e = RuntimeError(f"{self.name}: fetch cancelled")
+            future.set_exception(e)
+            # Évite l'avertissement « exception never retrieved » sans attente
+            future.exception()
+            raise
+        else:
+            self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+_caches: dict[str, AsyncTTLCache] = {}
+
+
+def ttl_cache(name: str, ttl: float, maxsize: int = 256) -> AsyncTTLCache:
+    """Crée (ou récupère) un cache nommé, pour l'exposer dans les statistiques."""
+    if name not in _caches:
+        _caches[name] = AsyncTTLCache(name, ttl, maxsize)
+    return _caches[name]
+
+
+def cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -0,0 +1,265 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app import google_calendar
+from app.google_calendar import CalendarAPIError
+
+logger = logging.getLogger(__name__)
+
+# 📅 Miroir local de l'agenda Google (surchargé par variables d'environnement)
+CALENDAR_MIRROR_ENABLED = os.getenv("CALENDAR_MIRROR", "1") != "0"
+# :memory: par défaut ; un fichier permet de reprendre la synchro incrémentale au redémarrage
+CALENDAR_MIRROR_DB = os.getenv("CALENDAR_MIRROR_DB", ":memory:")
+CALENDAR_SYNC_INTERVAL = float(os.getenv("CALENDAR_SYNC_INTERVAL", "60"))
+# Miroir plus ancien que cela (synchros en échec) : les lectures repassent par l'API
+CALENDAR_MIRROR_MAX_STALENESS = float(os.getenv("CALENDAR_MIRROR_MAX_STALENESS", "600"))
+# Historique conservé : la synchro complète part de maintenant moins ce nombre de jours
+CALENDAR_MIRROR_PAST_DAYS = int(os.getenv("CALENDAR_MIRROR_PAST_DAYS", "7"))
+# Fuseau des dates sans décalage horaire (dont les événements « journée entière »)
+CALENDAR_TIMEZONE = ZoneInfo(os.getenv("CALENDAR_TIMEZONE", "Europe/Brussels"))
+
+SYNC_PAGE_SIZE = 2500
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS events ("
+    " id TEXT PRIMARY KEY, start_ts REAL NOT NULL, end_ts REAL NOT NULL,"
+    " start TEXT NOT NULL, summary TEXT, updated TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS events_by_start ON events (start_ts)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+)
+
+
+def _timestamp(when: dict) -> float:
+    if "dateTime" in when:
+        moment = datetime.fromisoformat(when["dateTime"])
+        if moment.tzinfo is None:
+            zone = when.get("timeZone")
+            moment = moment.replace(tzinfo=ZoneInfo(zone) if zone else CALENDAR_TIMEZONE)
+        return moment.timestamp()
+    # Journée entière : à partir de minuit dans le fuseau de l'agenda
+    return datetime.combine(date.fromisoformat(when["date"]), datetime.min.time(), CALENDAR_TIMEZONE).timestamp()
+
+
+def _row(event: dict) -> tuple:
+    start = event["start"]
+    end = event.get("end") or start
+    return (
+        event["id"],
+        _timestamp(start),
+        _timestamp(end),
+        start.get("dateTime", start.get("date")),
+        event.get("summary"),
+        event.get("updated", ""),
+    )
+
+
+class CalendarMirror:
+    """
+    Copie locale de l'agenda Google, tenue à jour en tâche de fond par
+    synchronisation incrémentale (syncToken) : seules les modifications
+    depuis la dernière synchro transitent. Les événements sont indexés par
+    heure de début dans SQLite ; une fenêtre de temps est lue par l'index
+    (début ≥ borne − plus longue durée connue), sans appel réseau.
+    Un jeton refusé (410) relance une synchro complète.
+    """
+
+    def __init__(
+        self,
+        calendar_id: str = "primary",
+        path: str = CALENDAR_MIRROR_DB,
+        interval: float = CALENDAR_SYNC_INTERVAL,
+        max_staleness: float = CALENDAR_MIRROR_MAX_STALENESS,
+        enabled: bool = CALENDAR_MIRROR_ENABLED,
+    ):
+        self.calendar_id = calendar_id
+        self.path = path
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self.enabled = enabled
+        self._conn = None
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        # Plus longue durée d'événement présente : borne basse du parcours de l'index
+        self._max_span = 0.0
+        self.sync_token: str | None = None
+        self.synced_at: float | None = None
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        self.resyncs = 0
+        self.errors = 0
+        self.changes = 0
+        self.local_reads = 0
+        self.api_reads = 0
+        self.last_sync_ms: float | None = None
+
+    def _db(self):
+        if self._conn is None:
+            import sqlite3  # seulement si le miroir sert
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self._conn = conn
+            row = conn.execute("SELECT value FROM meta WHERE key = 'sync_token'").fetchone()
+            self.sync_token = row[0] if row else None
+            self._max_span = conn.execute("SELECT coalesce(max(end_ts - start_ts), 0) FROM events").fetchone()[0]
+        return self._conn
+
+    # ✍️ Écritures (toujours dans une transaction : une lecture ne voit jamais un état partiel)
+    def apply(self, events: list[dict]):
+        """Applique des événements de l'API (créés, modifiés ou annulés) au miroir."""
+        conn = self._db()
+        with conn:
+            conn.execute("BEGIN")
+            self._apply(conn, events)
+
+    def _apply(self, conn, events: list[dict]):
+        for event in events:
+            if event.get("status") == "cancelled":
+                conn.execute("DELETE FROM events WHERE id = ?", (event["id"],))
+                continue
+            row = _row(event)
+            # Une version plus ancienne (réponse arrivée en retard) n'écrase pas la plus récente
+            conn.execute(
+                "INSERT INTO events (id, start_ts, end_ts, start, summary, updated) VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET start_ts = excluded.start_ts, end_ts = excluded.end_ts,"
+                " start = excluded.start, summary = excluded.summary, updated = excluded.updated"
+                " WHERE excluded.updated >= events.updated",
+                row,
+            )
+            self._max_span = max(self._max_span, row[2] - row[1])
+        self.changes += len(events)
+
+    def _store_token(self, conn, token: str | None):
+        self.sync_token = token
+        if token is None:
+            conn.execute("DELETE FROM meta WHERE key = 'sync_token'")
+        else:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('sync_token', ?)", (token,))
+
+    # 🔄 Synchronisation
+    async def _fetch(self, **params) -> tuple[list[dict], str | None]:
+        """Toutes les pages d'une liste d'événements, et le jeton de la prochaine synchro."""
+        items, page_token = [], None
+        while True:
+            page = await google_calendar.list_events(
+                self.calendar_id, singleEvents=True, maxResults=SYNC_PAGE_SIZE,
+                **params, **({"pageToken": page_token} if page_token else {})
+            )
+            items += page.get("items", [])
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                return items, page.get("nextSyncToken")
+
+    async def _full_sync(self):
+        since = datetime.now(timezone.utc) - timedelta(days=CALENDAR_MIRROR_PAST_DAYS)
+        items, token = await self._fetch(timeMin=since.isoformat().replace("+00:00", "Z"))
+        conn = self._db()
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute("DELETE FROM events")
+            self._max_span = 0.0
+            self._apply(conn, items)
+            self._store_token(conn, token)
+        self.full_syncs += 1
+
+    async def _incremental_sync(self):
+        try:
+            items, token = await self._fetch(syncToken=self.sync_token)
+        except CalendarAPIError as e:
+            if e.status != 410:
+                raise
+            # Jeton périmé ou invalidé côté Google : on repart de zéro
+            logger.info("Jeton de synchro d'agenda refusé (410) : synchro complète")
+            self.resyncs += 1
+            return await self._full_sync()
+        conn = self._db()
+        horizon = time.time() - CALENDAR_MIRROR_PAST_DAYS * 86400
+        with conn:
+            conn.execute("BEGIN")
+            self._apply(conn, items)
+            self._store_token(conn, token)
+            conn.execute("DELETE FROM events WHERE end_ts < ?", (horizon,))
+        self.incremental_syncs += 1
+
+    async def sync(self):
+        """Une synchro : incrémentale si un jeton est connu, complète sinon."""
+        async with self._lock:
+            start = time.perf_counter()
+            self._db()
+            if self.sync_token:
+                await self._incremental_sync()
+            else:
+                await self._full_sync()
+            self.synced_at = time.monotonic()
+            self.last_sync_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Synchro de l'agenda en échec : %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Lance la synchro périodique (appelé par le lifespan)."""
+        if self.enabled and google_calendar.GOOGLE_REFRESH_TOKEN and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # 🔎 Lectures
+    @property
+    def fresh(self) -> bool:
+        """Synchronisé récemment : les lectures peuvent se passer de l'API."""
+        return self.synced_at is not None and time.monotonic() - self.synced_at <= self.max_staleness
+
+    def between(self, since: float, until: float | None = None, limit: int | None = None) -> list[dict]:
+        """
+        Événements en cours ou à venir entre deux instants (timestamps), triés par
+        début — mêmes règles que timeMin / timeMax de l'API : fin après `since`,
+        début avant `until`.
+        """
+        rows = self._db().execute(
+            "SELECT summary, start FROM events"
+            " WHERE start_ts >= ? AND start_ts < ? AND end_ts > ?"
+            " ORDER BY start_ts, id LIMIT ?",
+            (since - self._max_span, until if until is not None else float("inf"), since,
+             limit if limit is not None else -1),
+        ).fetchall()
+        self.local_reads += 1
+        return [{"summary": summary, "start": start} for summary, start in rows]
+
+    def stats(self) -> dict:
+        events = self._conn.execute("SELECT count(*) FROM events").fetchone()[0] if self._conn else 0
+        return {
+            "enabled": self.enabled,
+            "fresh": self.fresh,
+            "events": events,
+            "age_s": round(time.monotonic() - self.synced_at, 1) if self.synced_at is not None else None,
+            "full_syncs": self.full_syncs,
+            "incremental_syncs": self.incremental_syncs,
+            "resyncs": self.resyncs,
+            "errors": self.errors,
+            "changes": self.changes,
+            "local_reads": self.local_reads,
+            "api_reads": self.api_reads,
+            "last_sync_ms": self.last_sync_ms,
+        }
+
+
+calendar_mirror = CalendarMirror()
@@ -0,0 +1,139 @@
+import os
+import httpx
+from openai import AsyncOpenAI
+
+from app.governor import GovernedTransport, upstream
+
+# ⚙️ Réglages du pool de connexions (surchargés par variables d'environnement)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_MAX_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+# HTTP/2 uniquement si le paquet h2 est installé
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# 🌐 URL de base des API amont (surchargeables, ex. serveurs factices du banc de charge)
+BRAVE_API_BASE = os.getenv("BRAVE_API_BASE", "https://api.search.brave.com")
+OPENWEATHER_API_BASE = os.getenv("OPENWEATHER_API_BASE", "https://api.openweathermap.org")
+GOOGLE_MAPS_API_BASE = os.getenv("GOOGLE_MAPS_API_BASE", "https://maps.googleapis.com")
+GOOGLE_API_BASE = os.getenv("GOOGLE_API_BASE", "https://www.googleapis.com")
+GOOGLE_OAUTH_BASE = os.getenv("GOOGLE_OAUTH_BASE", "https://oauth2.googleapis.com")
+
+# Hôtes appelés par les outils : chacun a son propre pool (limite par hôte)
+TOOL_HOSTS = list(dict.fromkeys([
+    BRAVE_API_BASE,
+    OPENWEATHER_API_BASE,
+    GOOGLE_MAPS_API_BASE,
+    GOOGLE_API_BASE,
+    GOOGLE_OAUTH_BASE,
+]))
+
+
+# 🚦 Limiteurs par service amont (concurrence, file d'attente, nouvels essais, disjoncteur)
+OPENAI_CHAT = upstream("openai_chat", concurrency=32, max_queue=64, retry_unsafe=True)
+OPENAI_STT = upstream("openai_stt", concurrency=16, max_queue=32, retry_unsafe=True)
+OPENAI_TTS = upstream("openai_tts", concurrency=16, max_queue=64, retry_unsafe=True)
+TOOL_UPSTREAMS = [
+    (f"{BRAVE_API_BASE}/res/", upstream("brave", concurrency=8, max_queue=16)),
+    (f"{OPENWEATHER_API_BASE}/data/", upstream("openweather", concurrency=8, max_queue=16)),
+    (f"{GOOGLE_MAPS_API_BASE}/maps/", upstream("google_maps", concurrency=8, max_queue=16)),
+    (f"{GOOGLE_API_BASE}/calendar/", upstream("google_calendar", concurrency=8, max_queue=16)),
+    # Le rafraîchissement du jeton peut être rejoué sans risque
+    (f"{GOOGLE_OAUTH_BASE}/token", upstream("google_oauth", concurrency=4, max_queue=16, retry_unsafe=True)),
+]
+
+
+def _openai_upstream(request: httpx.Request):
+    path = request.url.path
+    if path.endswith("/audio/transcriptions"):
+        return OPENAI_STT
+    if path.endswith("/audio/speech"):
+        return OPENAI_TTS
+    if path.endswith("/chat/completions"):
+        return OPENAI_CHAT
+    # Autres chemins (échauffement des connexions, sonde de disponibilité) : sans limiteur
+    return None
+
+
+def _tool_upstream(request: httpx.Request):
+    url = str(request.url)
+    for prefix, limiter in TOOL_UPSTREAMS:
+        if url.startswith(prefix):
+            return limiter
+    return None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_PER_HOST,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+# Un seul contexte TLS pour tous les pools : charger les certificats coûte
+# plusieurs dizaines de millisecondes par transport au démarrage
+SSL_CONTEXT = httpx.create_ssl_context()
+
+
+def _transport(route=None) -> httpx.AsyncBaseTransport:
+    transport = httpx.AsyncHTTPTransport(verify=SSL_CONTEXT, http2=HTTP2, limits=_limits())
+    return GovernedTransport(transport, route) if route else transport
+
+
+def _timeout(total: float) -> httpx.Timeout:
+    return httpx.Timeout(total, connect=HTTP_CONNECT_TIMEOUT)
+
+
+def _new_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=_transport(_tool_upstream),
+        mounts={host: _transport(_tool_upstream) for host in TOOL_HOSTS},
+        timeout=_timeout(HTTP_TIMEOUT),
+    )
+
+
+# 🤖 Client OpenAI, avec les mêmes réglages de pool ; les nouvels essais
+# sont faits par le limiteur (avec gigue), pas par le SDK
+openai_http_client = httpx.AsyncClient(
+    transport=_transport(_openai_upstream),
+    timeout=_timeout(OPENAI_TIMEOUT),
+)
+openai_client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    timeout=OPENAI_TIMEOUT,
+    max_retries=0,
+    http_client=openai_http_client,
+)
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Client HTTP partagé par tous les outils (Brave, OpenWeather, Google).
+    Créé au démarrage par le lifespan FastAPI, ou à la demande hors serveur.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _new_http_client()
+    return _http_client
+
+
+def open_clients():
+    get_http_client()
+
+
+async def close_clients():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    await openai_client.close()
@@ -0,0 +1,93 @@
+import os
+
+from app.cache import ttl_cache
+from app.intents import fold
+
+# 🧭 Tuiles geohash (précision = nombre de caractères du geohash)
+#   4 ≈ 39 × 20 km · 5 ≈ 4,9 × 4,9 km · 6 ≈ 1,2 × 0,6 km · 7 ≈ 153 × 153 m
+# Origine des itinéraires : deux demandes dans la même tuile partagent le trajet
+ROUTE_TILE_PRECISION = int(os.getenv("ROUTE_TILE_PRECISION", "7"))
+# Météo par position
+WEATHER_TILE_PRECISION = int(os.getenv("WEATHER_TILE_PRECISION", "5"))
+# Région dans laquelle un nom de destination désigne le même lieu (« Gare » à Mons ≠ à Namur)
+PLACE_TILE_PRECISION = int(os.getenv("PLACE_TILE_PRECISION", "4"))
+
+# Lieux résolus (nom de destination → place_id Google), stables dans le temps
+place_cache = ttl_cache("geocode", float(os.getenv("GEOCODE_CACHE_TTL", str(7 * 24 * 3600))), maxsize=2048)
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Articles de tête ignorés : « la gare de Mons » et « Gare de Mons » sont la même destination
+_LEADING_ARTICLES = ("le", "la", "les", "l")
+
+
+def geohash(lat: float, lng: float, precision: int) -> str:
+    """Geohash standard (base 32) de la position, sur `precision` caractères."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Bits pairs : longitude, bits impairs : latitude
+        interval, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def tile_center(tile: str) -> tuple[float, float]:
+    """Centre (lat, lng) de la tuile désignée par un geohash."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in tile:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lng_range if even else lat_range
+            mid = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
+
+
+def snap(lat: float, lng: float, precision: int) -> tuple[str, tuple[float, float]]:
+    """Tuile contenant la position, et son centre (la position envoyée à l'API amont)."""
+    tile = geohash(lat, lng, precision)
+    return tile, tile_center(tile)
+
+
+def destination_key(destination: str) -> str:
+    """Forme normalisée d'une destination : casse, accents, ponctuation et article de tête ignorés."""
+    words = fold(destination).split()
+    if len(words) > 1 and words[0] in _LEADING_ARTICLES:
+        words = words[1:]
+    return " ".join(words)
+
+
+def _place_key(destination: str, lat: float, lng: float) -> tuple[str, str]:
+    return destination_key(destination), geohash(lat, lng, PLACE_TILE_PRECISION)
+
+
+def known_place(destination: str, lat: float, lng: float) -> dict | None:
+    """Lieu déjà résolu pour cette destination dans la région de la position, ou None."""
+    entry = place_cache.get(_place_key(destination, lat, lng))
+    if entry is None:
+        place_cache.misses += 1
+        return None
+    place_cache.hits += 1
+    return entry[1]
+
+
+def remember_place(destination: str, lat: float, lng: float, place: dict):
+    """Mémorise la résolution d'une destination ({"place_id", "address", "location"})."""
+    place_cache.set(_place_key(destination, lat, lng), place)
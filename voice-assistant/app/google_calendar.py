@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import os
+import time
+
+from app.clients import GOOGLE_API_BASE, GOOGLE_OAUTH_BASE, get_http_client
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
+GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
+GOOGLE_REFRESH_TOKEN = os.getenv("GOOGLE_REFRESH_TOKEN")
+
+TOKEN_URI = f"{GOOGLE_OAUTH_BASE}/token"
+CALENDAR_API = f"{GOOGLE_API_BASE}/calendar/v3"
+
+# Un jeton est considéré périmé 60 s avant son expiration,
+# et rafraîchi en arrière-plan 5 min avant.
+TOKEN_EXPIRY_MARGIN = 60
+TOKEN_REFRESH_AHEAD = 300
+
+
+class CalendarAPIError(RuntimeError):
+    """Réponse d'erreur de l'API Calendar ; `status` distingue p. ex. 410 (jeton de synchro périmé)."""
+
+    def __init__(self, status: int):
+        super().__init__("Google Calendar API error")
+        self.status = status
+
+
+class GoogleTokenManager:
+    """
+    Cache du jeton d'accès OAuth Google, rafraîchi via le refresh token.
+    Le rafraîchissement est asynchrone (client HTTP partagé), protégé par un
+    verrou pour qu'une rafale de requêtes ne déclenche qu'un seul appel, et
+    reprogrammé en tâche de fond avant l'expiration.
+    """
+
+    def __init__(self, client_id: str, client_secret: str, refresh_token: str):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self._token: str | None = None
+        self._expiry = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+    def _valid(self) -> bool:
+        return self._token is not None and time.monotonic() < self._expiry - TOKEN_EXPIRY_MARGIN
+
+    async def token(self) -> str:
+        if not self._valid():
+            async with self._lock:
+                if not self._valid():
+                    await self._refresh()
+        return self._token
+
+    def invalidate(self):
+        self._token = None
+
+    async def _refresh(self):
+        resp = await get_http_client().post(
+            TOKEN_URI,
+            data={
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "refresh_token": self.refresh_token,
+                "grant_type": "refresh_token",
+            }
+        )
+        if resp.status_code != 200:
+            raise RuntimeError("Google OAuth token refresh error")
+        data = resp.json()
+        self._token = data["access_token"]
+        self._expiry = time.monotonic() + data.get("expires_in", 3600)
+        self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        delay = max(self._expiry - TOKEN_REFRESH_AHEAD - time.monotonic(), 0)
+        self._refresh_task = asyncio.create_task(self._refresh_later(delay))
+
+    async def _refresh_later(self, delay: float):
+        await asyncio.sleep(delay)
+        try:
+            async with self._lock:
+                await self._refresh()
+        except Exception as e:
+            # La prochaine requête retentera un rafraîchissement synchrone
+            logger.warning("Rafraîchissement du jeton Google échoué : %s", e)
+
+    def close(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+
+tokens = GoogleTokenManager(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REFRESH_TOKEN)
+
+
+async def _request(method: str, path: str, **kwargs) -> dict:
+    """Appel REST à l'API Calendar v3, avec un nouvel essai si le jeton est refusé."""
+    for attempt in range(2):
+        token = await tokens.token()
+        resp = await get_http_client().request(
+            method,
+            f"{CALENDAR_API}{path}",
+            headers={"Authorization": f"Bearer {token}"},
+            **kwargs
+        )
+        if resp.status_code == 401 and attempt == 0:
+            tokens.invalidate()
+            continue
+        break
+    if resp.status_code >= 400:
+        raise CalendarAPIError(resp.status_code)
+    return resp.json()
+
+
+async def list_events(calendar_id: str = "primary", **params) -> dict:
+    return await _request("GET", f"/calendars/{calendar_id}/events", params=params)
+
+
+async def insert_event(body: dict, calendar_id: str = "primary") -> dict:
+    return await _request("POST", f"/calendars/{calendar_id}/events", json=body)
@@ -0,0 +1,303 @@
+import asyncio
+import logging
+import os
+import random
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Réglages communs (surchargés par variables d'environnement)
+QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "2"))
+RETRY_ATTEMPTS = int(os.getenv("UPSTREAM_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.2"))
+RETRY_MAX_DELAY = float(os.getenv("UPSTREAM_RETRY_MAX_DELAY", "2"))
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "15"))
+MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", "64"))
+RETRY_AFTER = int(os.getenv("OVERLOAD_RETRY_AFTER", "5"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class Overloaded(Exception):
+    """Requête refusée sans appel amont : file pleine, délai d'attente dépassé ou circuit ouvert."""
+
+    def __init__(self, upstream: str, reason: str):
+        super().__init__(f"{upstream}: {reason}")
+        self.upstream = upstream
+        self.reason = reason
+
+
+def overload_cause(exc: BaseException | None) -> Overloaded | None:
+    """
+    Retrouve un `Overloaded` dans la chaîne des causes : le SDK OpenAI
+    enveloppe les erreurs de transport (APIConnectionError).
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        if isinstance(exc, Overloaded):
+            return exc
+        seen.add(id(exc))
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+class CircuitBreaker:
+    """
+    Fermé → ouvert après `threshold` échecs consécutifs → semi-ouvert une
+    fois `cooldown` écoulé : un seul appel d'essai, qui referme le circuit
+    s'il réussit et le rouvre sinon.
+    """
+
+    def __init__(self, name: str, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+
+    def rejecting(self) -> bool:
+        """Vrai tant que le circuit est ouvert (ou que l'essai semi-ouvert est en cours)."""
+        if self.state == "open":
+            return time.monotonic() - self.opened_at < self.cooldown
+        return self.state == "half_open" and self._trial
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.rejecting():
+            return False
+        self.state, self._trial = "half_open", True
+        return True
+
+    def success(self):
+        self.state, self.failures, self._trial = "closed", 0, False
+
+    def failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.threshold:
+            if self.state != "open":
+                logger.warning("%s : circuit ouvert après %d échec(s)", self.name, self.failures)
+            self.state, self.opened_at, self._trial = "open", time.monotonic(), False
+
+    def abandon(self):
+        # Essai semi-ouvert non effectué (ex. requête annulée) : un autre pourra le tenter
+        self._trial = False
+
+
+class Upstream:
+    """
+    Limiteur d'un service amont : sémaphore de `concurrency` appels, file
+    d'attente bornée à `max_queue` avec un délai maximal d'attente,
+    nouvel essai avec gigue sur 429 / 5xx / erreur réseau, disjoncteur.
+    Les méthodes non idempotentes ne sont rejouées que sur 429, sauf si
+    `retry_unsafe` (API sans effet de bord, comme celles d'OpenAI).
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, retry_unsafe: bool = False):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.retry_unsafe = retry_unsafe
+        self.breaker = CircuitBreaker(name)
+        self._slots = asyncio.Semaphore(concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.calls = 0
+        self.shed = 0
+        self.retries = 0
+        self.failures = 0
+
+    async def acquire(self):
+        if self.breaker.rejecting():
+            self.shed += 1
+            raise Overloaded(self.name, "circuit open")
+        if not self._slots.locked():
+            # Place libre : prise immédiatement, sans passer par la file
+            await self._slots.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self.shed += 1
+                raise Overloaded(self.name, "queue full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                raise Overloaded(self.name, "queue timeout") from None
+            finally:
+                self.waiting -= 1
+        if not self.breaker.allow():
+            self._slots.release()
+            self.shed += 1
+            raise Overloaded(self.name, "circuit open")
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._slots.release()
+
+    def _delay(self, attempt: int, response: httpx.Response | None) -> float:
+        # « Full jitter » : uniforme entre 0 et le plafond exponentiel
+        delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), RETRY_MAX_DELAY))
+            except ValueError:
+                pass
+        return delay
+
+    async def send(self, transport: httpx.AsyncBaseTransport, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        attempt = 0
+        try:
+            while True:
+                response, error = None, None
+                try:
+                    response = await transport.handle_async_request(request)
+                except (httpx.TimeoutException, httpx.NetworkError) as e:
+                    error = e
+                if response is not None and response.status_code not in RETRY_STATUSES:
+                    # Un 4xx est une erreur de l'appelant : le service amont va bien
+                    self.breaker.success()
+                    return response
+
+                replayable = (
+                    (response is not None and response.status_code == 429)
+                    or self.retry_unsafe
+                    or request.method in IDEMPOTENT_METHODS
+                )
+                if attempt >= RETRY_ATTEMPTS or not replayable:
+                    self.failures += 1
+                    self.breaker.failure()
+                    if response is not None:
+                        return response
+                    raise error
+
+                attempt += 1
+                self.retries += 1
+                delay = self._delay(attempt, response)
+                if response is not None:
+                    await response.aclose()
+                logger.info("%s : nouvel essai %d dans %.2f s", self.name, attempt, delay)
+                await asyncio.sleep(delay)
+        except BaseException:
+            # Annulation ou erreur inattendue : l'éventuel essai semi-ouvert reste à faire
+            self.breaker.abandon()
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "shed": self.shed,
+            "retries": self.retries,
+            "failures": self.failures,
+            "circuit": self.breaker.state,
+        }
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Corps de réponse qui rend la place du sémaphore à sa fermeture (réponses streamées comprises)."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class GovernedTransport(httpx.AsyncBaseTransport):
+    """
+    Transport httpx qui fait passer chaque requête par le limiteur de son
+    service amont (`route(request)` ; None = pas de limite). La place est
+    gardée jusqu'à la fermeture de la réponse, flux SSE compris.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, route):
+        self._transport = transport
+        self._route = route
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        upstream = self._route(request)
+        if upstream is None:
+            return await self._transport.handle_async_request(request)
+        await upstream.acquire()
+        try:
+            response = await upstream.send(self._transport, request)
+        except BaseException:
+            upstream.release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, upstream.release),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class AdmissionControl:
+    """Nombre maximal de requêtes vocales traitées en même temps ; au-delà, refus immédiat."""
+
+    def __init__(self, limit: int = MAX_INFLIGHT_REQUESTS):
+        self.limit = limit
+        self.inflight = 0
+        self.rejected = 0
+
+    def enter(self, slots: int = 1):
+        """`slots` > 1 : requête qui en vaut plusieurs (lot traité en parallèle)."""
+        if self.inflight + slots > self.limit:
+            self.rejected += 1
+            raise Overloaded("server", "too many requests in flight")
+        self.inflight += slots
+
+    def leave(self, slots: int = 1):
+        self.inflight -= slots
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "inflight": self.inflight, "rejected": self.rejected}
+
+
+admission = AdmissionControl()
+
+_upstreams: dict[str, Upstream] = {}
+
+
+def upstream(name: str, concurrency: int, max_queue: int, retry_unsafe: bool = False) -> Upstream:
+    """
+    Crée (ou récupère) le limiteur d'un service amont. Les limites se
+    règlent par variables d'environnement : <NOM>_CONCURRENCY, <NOM>_QUEUE.
+    """
+    if name not in _upstreams:
+        _upstreams[name] = Upstream(
+            name,
+            concurrency=int(os.getenv(f"{name.upper()}_CONCURRENCY", str(concurrency))),
+            max_queue=int(os.getenv(f"{name.upper()}_QUEUE", str(max_queue))),
+            retry_unsafe=retry_unsafe,
+        )
+    return _upstreams[name]
+
+
+def upstream_stats() -> dict:
+    return {name: u.stats() for name, u in _upstreams.items()}
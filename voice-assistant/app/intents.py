@@ -0,0 +1,210 @@
+import os
+import re
+import unicodedata
+from dataclasses import dataclass
+
+# Seuil de confiance en dessous duquel on laisse GPT traiter la phrase
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.85"))
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER", "1") != "0"
+
+# Applications connues du front (hooks/useVoiceRecognition.ts)
+KNOWN_APPS = {
+    "youtube": "YouTube",
+    "spotify": "Spotify",
+    "whatsapp": "WhatsApp",
+    "facebook": "Facebook",
+    "instagram": "Instagram",
+}
+
+PERIODS = {
+    "aujourd hui": "aujourd'hui",
+    "demain": "demain",
+    "cette semaine": "cette semaine",
+    "ce week end": "ce week-end",
+    "la semaine prochaine": "semaine prochaine",
+    "semaine prochaine": "semaine prochaine",
+}
+
+DAYS_AHEAD = {"demain": 1, "apres demain": 2}
+
+
+@dataclass
+class IntentMatch:
+    tool: str
+    args: dict
+    confidence: float
+
+
+def fold(text: str) -> str:
+    """
+    Minuscules, sans accents ni ponctuation, en conservant la longueur du
+    texte : une position dans le texte replié est la même dans l'original,
+    ce qui permet d'extraire les noms (ville, contact) avec leur graphie.
+    """
+    out = []
+    for ch in text:
+        base = unicodedata.normalize("NFKD", ch)[0].lower()
+        out.append(base if base.isalnum() and len(base) == 1 else " ")
+    return "".join(out)
+
+
+_PREFIX = (
+    r"^\s*(?:(?:ok\s+|dis\s+|hey\s+)?alto\s+)?"
+    r"(?:(?:est\s+ce\s+que\s+)?(?:tu\s+peux|peux\s+tu|pourrais\s+tu|pouvez\s+vous|"
+    r"je\s+veux|je\s+voudrais|j\s+aimerais)\s+)?"
+)
+_SUFFIX = r"(?:\s+(?:s\s+il\s+te\s+plait|s\s+il\s+vous\s+plait|stp|svp|merci))?\s*$"
+_OPEN = r"(?:ouvre|ouvrir|ouvrez|lance|lancer|lancez|demarre|demarrer|allume|allumer|active|activer)"
+_WHEN = r"(?P<when>aujourd\s+hui|maintenant|ce\s+soir|apres\s+demain|demain)"
+# Période de plusieurs jours : hors de portée des outils météo (un jour donné), laissée à GPT
+_SPAN = (
+    r"(?:(?:cette|la|le|ce)\s+)?(?:semaine|week\s+end)(?:\s+prochaine?)?|semaine\s+prochaine"
+    r"|(?:(?:en|la|cette)\s+)?fin\s+de\s+(?:la\s+)?semaine|(?:les\s+)?prochains\s+jours|(?:les\s+)?jours\s+a\s+venir"
+)
+# Mots de temps qu'un nom de ville ne peut pas contenir
+_NOT_TIME = (
+    r"(?!(?:aujourd\s+hui|maintenant|ce\s+soir|ce\s+matin|cet\s+apres\s+midi|apres\s+demain|demain"
+    rf"|{_SPAN})\b)"
+)
+# Ni « et » : « Météo à Mons et à Namur » (plusieurs villes) est laissée à GPT
+_CITY = rf"(?P<city>(?!et\b){_NOT_TIME}[^\W\d_]+(?:[\s-]+(?!et\b){_NOT_TIME}[^\W\d_]+){{0,3}}?)"
+_PERIOD = r"(?P<period>aujourd\s+hui|demain|cette\s+semaine|ce\s+week\s+end|(?:la\s+)?semaine\s+prochaine)"
+
+
+def _rule(pattern: str) -> re.Pattern:
+    return re.compile(_PREFIX + pattern + _SUFFIX)
+
+
+_CAMERA = _rule(
+    rf"(?:{_OPEN}\s+(?:l\s+|la\s+|mon\s+|ma\s+)?(?:appareil\s+photo|camera)"
+    r"|(?:prends|prendre|prenez)\s+une\s+photo)"
+)
+_APP = _rule(rf"{_OPEN}\s+(?:l\s+)?(?:application\s+|appli\s+|app\s+)?(?P<app>\w+(?:\s+\w+)?)")
+_CALL = _rule(
+    r"(?:appelle|appeler|appelez|telephone\s+a|telephoner\s+a|passe\s+un\s+appel\s+a|"
+    r"passer\s+un\s+appel\s+a)\s+(?!moi\b|nous\b)"
+    rf"(?P<name>(?!et\b){_NOT_TIME}\w+(?:\s+(?!et\b){_NOT_TIME}\w+){{0,2}}?)"
+    r"(?:\s+(?P<when>maintenant|tout\s+de\s+suite|(?:aujourd\s+hui|ce\s+soir|ce\s+matin|cet\s+apres\s+midi"
+    r"|apres\s+demain|demain|plus\s+tard)(?:\s+(?:matin|midi|apres\s+midi|soir))?))?"
+)
+_ASK_WEATHER = (
+    r"(?:(?:quelle\s+est\s+)?(?:la\s+)?meteo|quel\s+temps\s+(?:fait\s+il|fera\s+t\s+il|va\s+t\s+il\s+faire)"
+    r"|il\s+fait\s+quel\s+temps|il\s+fera\s+quel\s+temps)"
+)
+_WEATHER = _rule(
+    rf"{_ASK_WEATHER}(?:\s+(?:(?:de|d|pour|du|pendant)\s+)?(?:{_WHEN}|(?P<span>{_SPAN})))?"
+    rf"\s+(?:a|au|aux|en|sur|pour|de|du)\s+{_CITY}"
+    r"(?:\s+(?P<when_after>aujourd\s+hui|maintenant|ce\s+soir|apres\s+demain|demain))?"
+    rf"(?:\s+(?:(?:pour|pendant)\s+)?(?P<span_after>{_SPAN}))?"
+)
+# Sans ville : météo à la position du téléphone
+_WEATHER_HERE = _rule(
+    rf"{_ASK_WEATHER}(?:\s+(?:ici|dehors))?(?:\s+(?:(?:de|d|pour)\s+)?{_WHEN})?(?:\s+(?:ici|dehors))?"
+)
+_CALENDAR = _rule(
+    r"(?:(?:qu\s+est\s+ce\s+qu\s+il\s+y\s+a\s+(?:dans|sur)\s+|(?:montre|lis|lire|donne|consulte)\s+(?:moi\s+)?)?"
+    r"(?:mon|l|le|ma)\s+(?:agenda|emploi\s+du\s+temps|planning|calendrier|programme)"
+    rf"(?:\s+(?:de|pour|d))?\s+{_PERIOD}"
+    rf"|qu\s+est\s+ce\s+que\s+j\s+ai\s+(?:de\s+prevu\s+)?{_PERIOD.replace('period', 'period2')}"
+    r"(?:\s+dans\s+(?:mon|l)\s+agenda)?)"
+)
+
+
+def _span(text: str, match: re.Match, group: str) -> str:
+    return text[match.start(group):match.end(group)].strip()
+
+
+def _canonical(folded: str, table: dict) -> str | None:
+    return table.get(" ".join(folded.split()))
+
+
+def _match(text: str) -> IntentMatch | None:
+    folded = fold(text)
+
+    if _CAMERA.search(folded):
+        return IntentMatch("prepare_open_camera", {}, 0.97)
+
+    m = _APP.search(folded)
+    if m and " ".join(m.group("app").split()) not in ("camera", "appareil photo"):
+        app = _canonical(m.group("app"), KNOWN_APPS)
+        if app:
+            return IntentMatch("prepare_open_app", {"app_name": app}, 0.95)
+        # Application inconnue : GPT saura mieux reformuler le nom
+        return IntentMatch("prepare_open_app", {"app_name": _span(text, m, "app")}, 0.6)
+
+    m = _CALL.search(folded)
+    if m and m.group("when") and " ".join(m.group("when").split()) not in ("maintenant", "tout de suite"):
+        # « Appelle Maman ce soir » : appel différé, pas un appel immédiat, GPT s'en charge
+        return None
+    if m:
+        return IntentMatch("prepare_call_contact", {"recipient_name": _span(text, m, "name")}, 0.9)
+
+    m = _WEATHER.search(folded)
+    if m and (m.group("span") or m.group("span_after")):
+        # « Météo du week-end à Mons » : pas d'outil pour plusieurs jours, GPT s'en charge
+        return None
+    if m:
+        city = _span(text, m, "city")
+        when = m.group("when") or m.group("when_after")
+        days = DAYS_AHEAD.get(" ".join(when.split())) if when else None
+        if days:
+            return IntentMatch("get_weather_forecast", {"city": city, "days_ahead": days}, 0.9)
+        return IntentMatch("get_weather", {"city": city}, 0.92)
+
+    m = _WEATHER_HERE.search(folded)
+    if m:
+        days = DAYS_AHEAD.get(" ".join(m.group("when").split())) if m.group("when") else None
+        if days:
+            return IntentMatch("get_weather_forecast", {"days_ahead": days}, 0.9)
+        return IntentMatch("get_weather", {}, 0.9)
+
+    m = _CALENDAR.search(folded)
+    if m:
+        period = _canonical(m.group("period") or m.group("period2"), PERIODS)
+        if period:
+            return IntentMatch("read_local_calendar", {"period": period}, 0.9)
+
+    return None
+
+
+class IntentRouter:
+    """
+    Routeur d'intentions local (règles, CPU uniquement) appliqué à la
+    transcription avant GPT. Seules les correspondances au-dessus du seuil
+    de confiance court-circuitent GPT ; les compteurs mesurent le taux de succès.
+    """
+
+    def __init__(self, threshold: float = INTENT_CONFIDENCE_THRESHOLD, enabled: bool = INTENT_ROUTER_ENABLED):
+        self.threshold = threshold
+        self.enabled = enabled
+        self.total = 0
+        self.routed: dict[str, int] = {}
+        self.below_threshold = 0
+        self.tool_errors = 0
+
+    def route(self, text: str) -> IntentMatch | None:
+        if not self.enabled or not text:
+            return None
+        self.total += 1
+        match = _match(text)
+        if match is None:
+            return None
+        if match.confidence < self.threshold:
+            self.below_threshold += 1
+            return None
+        self.routed[match.tool] = self.routed.get(match.tool, 0) + 1
+        return match
+
+    def stats(self) -> dict:
+        routed = sum(self.routed.values())
+        return {
+            "total": self.total,
+            "routed": routed,
+            "hit_rate": round(routed / self.total, 4) if self.total else 0.0,
+            "below_threshold": self.below_threshold,
+            "tool_errors": self.tool_errors,
+            "by_tool": dict(self.routed),
+        }
+
+
+intent_router = IntentRouter()
@@ -0,0 +1,79 @@
+"""
+Inférence vocale locale (CPU), exécutée dans les processus du pool de
+app/speech.py : ce module n'importe que la bibliothèque standard au
+chargement, pour que chaque processus démarre vite, et charge son modèle
+une seule fois (initialiseur du pool).
+  • STT : faster-whisper (CTranslate2), poids quantifiés int8 ;
+  • TTS : Piper (VITS, ONNX), encodé en MP3 par lameenc.
+Dépendances facultatives : voir requirements-local.txt.
+"""
+import io
+import os
+import wave
+
+_model = None
+
+
+def _limit_threads(threads: int):
+    # Les bibliothèques de calcul lisent ces variables à leur import
+    for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(name, str(threads))
+
+
+# 🎤 Transcription
+def init_stt(model: str, compute_type: str, threads: int):
+    """Initialiseur d'un processus STT : charge le modèle Whisper quantifié."""
+    global _model
+    _limit_threads(threads)
+    from faster_whisper import WhisperModel
+
+    _model = WhisperModel(model, device="cpu", compute_type=compute_type, cpu_threads=threads, num_workers=1)
+
+
+def transcribe(audio: bytes, language: str) -> str:
+    # Décodage par PyAV (FLAC, WAV, m4a…) et rééchantillonnage en 16 kHz par faster-whisper
+    segments, _ = _model.transcribe(
+        io.BytesIO(audio),
+        language=language or None,
+        beam_size=1,
+        condition_on_previous_text=False,
+    )
+    return "".join(segment.text for segment in segments).strip()
+
+
+# 🔊 Synthèse vocale
+def init_tts(voice: str, threads: int):
+    """Initialiseur d'un processus TTS : charge la voix Piper (fichier .onnx + .onnx.json)."""
+    global _model
+    _limit_threads(threads)
+    from piper import PiperVoice
+
+    _model = PiperVoice.load(voice)
+
+
+def synthesize(text: str, bitrate: int) -> bytes:
+    """MP3 mono de la phrase (même format que l'API OpenAI : le front et le cache n'y voient rien)."""
+    import lameenc
+
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        # piper-tts ≥ 1.3 : synthesize_wav ; versions antérieures : synthesize(texte, wav)
+        if hasattr(_model, "synthesize_wav"):
+            _model.synthesize_wav(text, wav)
+        else:
+            _model.synthesize(text, wav)
+    buf.seek(0)
+    with wave.open(buf, "rb") as wav:
+        rate, pcm = wav.getframerate(), wav.readframes(wav.getnframes())
+
+    encoder = lameenc.Encoder()
+    encoder.set_bit_rate(bitrate)
+    encoder.set_in_sample_rate(rate)
+    encoder.set_channels(1)
+    encoder.set_quality(7)
+    return bytes(encoder.encode(pcm) + encoder.flush())
+
+
+def ready() -> bool:
+    """Tâche vide : sa fin garantit que l'initialiseur (chargement du modèle) a tourné."""
+    return _model is not None
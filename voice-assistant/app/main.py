@@ -1,72 +1,558 @@
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import JSONResponse
-import tempfile, os, base64
+from contextlib import asynccontextmanager
+import logging
+import os
+from fastapi import Depends, FastAPI, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import asyncio, base64, json
+from openai import APIConnectionError
 
-from app.utils import transcribe_audio, ask_gpt, synthesize_speech
+from app.utils import (
+    transcribe_audio, ask_gpt, ask_gpt_stream, synthesize_speech,
+    cached_speech, tool_selector, speech_router, FALLBACK_ANSWER, BUSY_ANSWER
+)
+from app.audio import check_decoders
+from app.clients import open_clients, close_clients
+from app.governor import RETRY_AFTER, Overloaded, admission, overload_cause, upstream_stats
+from app import google_calendar
+from app.batch import (
+    BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY, BATCH_MAX_ITEMS, BATCH_MAX_UPLOAD_BYTES, BATCH_MODES,
+    collect_items, run_batch
+)
+from app.cache import cache_stats
+from app.calendar_mirror import calendar_mirror
+from app.tts_cache import tts_cache
+from app.intents import intent_router
+from app.speculation import speculator
+from app.memory import DEFAULT_SESSION
+from app.responses import voice_response
+from app.metrics import TimingMiddleware, finish_timer, mark, render_metrics, stage, use_timer
+from app.utils import conversation_store
+from app.uploads import UploadLimitMiddleware
+from app.voice_session import PCM16, StreamingTranscription, TurnTooLarge, validate_format
+from app.warmup import WARMUP_BLOCKING, warmup
 
-app = FastAPI()
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger("alto")
 
-@app.post("/process-voice")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pools de connexions partagés pour toute la durée de vie du service
+    open_clients()
+    check_decoders()
+    # Échauffement (connexions, jeton Google, phrases fixes…) : en tâche de fond,
+    # ou avant d'accepter la moindre requête si WARMUP_BLOCKING
+    warming = asyncio.create_task(warmup.run())
+    if WARMUP_BLOCKING:
+        await asyncio.shield(warming)
+    # Miroir local de l'agenda : synchro incrémentale périodique
+    calendar_mirror.start()
+    yield
+    warming.cancel()
+    await calendar_mirror.close()
+    speech_router.close()
+    google_calendar.tokens.close()
+    await conversation_store.backend.close()
+    await close_clients()
+
+app = FastAPI(lifespan=lifespan)
+# Server-Timing, logs structurés et histogrammes par étape
+app.add_middleware(TimingMiddleware)
+# Uploads bornés (MAX_UPLOAD_BYTES) : refus en 413 dès que la limite est franchie
+app.add_middleware(UploadLimitMiddleware, limits={"/batch": BATCH_MAX_UPLOAD_BYTES})
+
+async def _transcribe_upload(file: UploadFile) -> str:
+    """
+    Transcrit l'upload reçu par Starlette (en mémoire, spoolé sur disque
+    au-delà de 1 Mo, borné par MAX_UPLOAD_BYTES). Avec le prétraitement
+    (par défaut), il est lu entièrement en mémoire pour être décodé ; sans,
+    le flux est transmis tel quel à Whisper. FastAPI le ferme en fin de requête.
+    """
+    # Le formulaire est déjà reçu et analysé quand l'endpoint démarre
+    mark("upload")
+    await file.seek(0)
+    return await transcribe_audio(file.file, file.filename or "audio.wav")
+
+async def _admitted():
+    """Admission : au-delà de MAX_INFLIGHT_REQUESTS requêtes vocales en cours, refus immédiat."""
+    admission.enter()
+    try:
+        yield
+    finally:
+        admission.leave()
+
+class _AdmittedStream(StreamingResponse):
+    """
+    Réponse streamée qui garde sa place d'admission jusqu'à l'envoi complet
+    du corps (ou la déconnexion du client). Une dépendance à yield ne suffit
+    pas : selon la version de FastAPI, sa sortie peut précéder la fin du flux,
+    alors que STT, GPT et TTS tournent encore dans le générateur.
+    """
+
+    def __init__(self, content, slots: int = 1, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slots = slots
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            admission.leave(self.slots)
+
+async def _busy_reply(transcript: str = ""):
+    """Délestage : réponse pré-synthétisée, sans aucun appel amont (mêmes événements que _spoken_reply)."""
+    audio = await cached_speech(BUSY_ANSWER)
+    yield {"type": "audio", "index": 0, "text": BUSY_ANSWER, "audio": audio}
+    yield {
+        "type": "done",
+        "transcript": transcript,
+        "response_text": BUSY_ANSWER,
+        "action": None,
+        "retry_after": RETRY_AFTER
+    }
+
+async def _busy_response(request: Request, exc: Overloaded):
+    logger.warning("Délestage (%s) : %s", request.url.path, exc)
+    headers = {"Retry-After": str(RETRY_AFTER)}
+    if request.url.path == "/process-voice-stream":
+        return StreamingResponse(_sse_stream(_busy_reply()), media_type="text/event-stream", headers=headers)
+    if request.url.path == "/process-voice":
+        # 200 : le front joue la phrase au lieu d'afficher une erreur
+        response = voice_response(request.headers.get("accept"), {
+            "transcript": "",
+            "response_text": BUSY_ANSWER,
+            "action": None,
+            "retry_after": RETRY_AFTER
+        }, await cached_speech(BUSY_ANSWER))
+        response.headers.update(headers)
+        return response
+    return JSONResponse(status_code=503, content={"error": "Service overloaded, retry shortly."}, headers=headers)
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return await _busy_response(request, exc)
+
+@app.exception_handler(APIConnectionError)
+async def openai_connection_handler(request: Request, exc: APIConnectionError):
+    # Le SDK OpenAI enveloppe les refus du limiteur dans une erreur de connexion
+    overload = overload_cause(exc)
+    if overload is not None:
+        return await _busy_response(request, overload)
+    logger.warning("Connexion OpenAI impossible : %s", exc)
+    return JSONResponse(status_code=502, content={"error": "OpenAI connection error."})
+
+@app.post("/process-voice", dependencies=[Depends(_admitted)])
 async def process_voice(
+    request: Request,
     file: UploadFile = File(...),
     lat: float = Form(None),
-    lng: float = Form(None)
+    lng: float = Form(None),
+    session_id: str = Form(DEFAULT_SESSION)
 ):
-    # 1️⃣ Sauvegarde du WAV reçu
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-        tmp.write(await file.read())
-        audio_path = tmp.name
-
-    # 2️⃣ Transcription
-    user_transcript = await transcribe_audio(audio_path)
-    print("🎙️ Transcrit :", user_transcript)
-
-    # 3️⃣ Appel à GPT pour texte + action
-    assistant_result = await ask_gpt(user_transcript, lat=lat, lng=lng)
-    text_to_speak = assistant_result.get("text_to_speak") or "Désolé, je n'ai pas de réponse."
+    # 1️⃣ Transcription directe du flux reçu
+    user_transcript = await _transcribe_upload(file)
+    logger.info("🎙️ Transcrit : %s", user_transcript)
+
+    # 2️⃣ Appel à GPT pour texte + action
+    assistant_result = await ask_gpt(
+        user_transcript, lat=lat, lng=lng, session_id=session_id
+    )
+    text_to_speak = assistant_result.get("text_to_speak") or FALLBACK_ANSWER
     action_details = assistant_result.get("action")
 
-    print("🤖 Réponse GPT :", text_to_speak)
+    logger.info("🤖 Réponse GPT : %s", text_to_speak)
     if action_details:
-        print("🎬 Action :", action_details)
-
-    # 4️⃣ Synthèse vocale
-    mp3_path = await synthesize_speech(text_to_speak)
-    os.remove(audio_path)
-
-    audio_base64 = ""
-    if os.path.exists(mp3_path):
-        with open(mp3_path, "rb") as f:
-            audio_base64 = base64.b64encode(f.read()).decode()
-        os.remove(mp3_path)
-    else:
-        print(f"Erreur TTS : fichier {mp3_path} introuvable.")
-
-    # 5️⃣ Réponse JSON pour le front
-    return JSONResponse({
+        logger.info("🎬 Action : %s", action_details)
+
+    # 3️⃣ Synthèse vocale, gardée en mémoire
+    audio = b""
+    try:
+        audio = await synthesize_speech(text_to_speak)
+    except Exception as e:
+        logger.warning("Erreur TTS : %s", e)
+
+    # 4️⃣ Réponse pour le front (JSON base64, multipart ou MP3 brut selon Accept)
+    return voice_response(request.headers.get("accept"), {
         "transcript": user_transcript,
         "response_text": text_to_speak,
-        "audio": audio_base64,
-        "action": action_details
-    })
+        "action": action_details,
+        "session_id": session_id
+    }, audio)
 
-@app.post("/tts-only")
-async def tts_only(text: str = Form(...)):
-    mp3_path = await synthesize_speech(text)
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _sse_stream(events):
+    """Événements de réponse → SSE (audio encodé en base64)."""
+    async for event in events:
+        kind = event.pop("type")
+        if kind == "audio":
+            with stage("encode"):
+                chunk = _sse("audio", {**event, "audio": base64.b64encode(event["audio"]).decode()})
+            yield chunk
+        else:
+            yield _sse(kind, event)
+
+async def _spoken_reply(user_transcript: str, lat: float, lng: float, session_id: str):
+    """
+    Réponse parlée phrase par phrase, commune au SSE et à la WebSocket :
+    chaque phrase de GPT part au TTS dès qu'elle est complète, les synthèses
+    tournent en parallèle mais sont produites dans l'ordre.
+
+    Événements : {"type": "audio", "index", "text", "audio": octets MP3},
+    puis {"type": "action"} s'il y a lieu et {"type": "done"}.
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for event in ask_gpt_stream(
+                user_transcript, lat=lat, lng=lng, session_id=session_id
+            ):
+                if event["type"] == "sentence":
+                    task = asyncio.create_task(synthesize_speech(event["text"]))
+                    await pending.put((event["text"], task))
+                else:
+                    await pending.put((None, event))
+        finally:
+            await pending.put(None)
+
+    producer = asyncio.create_task(produce())
+    index, done = 0, None
+    try:
+        while (item := await pending.get()) is not None:
+            text, payload = item
+            if text is None:
+                done = payload
+                continue
+            audio = await payload
+            yield {"type": "audio", "index": index, "text": text, "audio": audio}
+            index += 1
+        await producer
+    finally:
+        producer.cancel()
+        while not pending.empty():
+            item = pending.get_nowait()
+            if item and item[0] is not None:
+                item[1].cancel()
+
+    text_to_speak = done["text_to_speak"] if done else None
+    if index == 0:
+        # Rien n'a été dit : on garde le message de repli habituel
+        text_to_speak = text_to_speak or FALLBACK_ANSWER
+        audio = await synthesize_speech(text_to_speak)
+        yield {"type": "audio", "index": 0, "text": text_to_speak, "audio": audio}
+
+    logger.info("🤖 Réponse GPT : %s", text_to_speak)
+    action_details = done["action"] if done else None
+    if action_details:
+        logger.info("🎬 Action : %s", action_details)
+        yield {"type": "action", "action": action_details}
+
+    yield {
+        "type": "done",
+        "transcript": user_transcript,
+        "response_text": text_to_speak,
+        "action": action_details,
+        "session_id": session_id
+    }
+
+@app.post("/process-voice-stream")
+async def process_voice_stream(
+    file: UploadFile = File(...),
+    lat: float = Form(None),
+    lng: float = Form(None),
+    session_id: str = Form(DEFAULT_SESSION)
+):
+    """
+    Variante streamée de /process-voice (Server-Sent Events) :
+    la réponse de GPT est découpée en phrases, chaque phrase est envoyée
+    au TTS dès qu'elle est complète et son MP3 est poussé au client
+    sans attendre la fin de la génération.
 
-    if os.path.exists(mp3_path):
-        with open(mp3_path, "rb") as f:
-            audio = base64.b64encode(f.read()).decode()
-        os.remove(mp3_path)
-        return {"audio": audio}
-    return JSONResponse(status_code=500, content={"error": "TTS generation failed."})
+    Événements : transcript, audio (index, text, audio base64), action, done.
+    """
+    # Place d'admission tenue jusqu'à la fin du flux (libérée par _AdmittedStream)
+    admission.enter()
+    try:
+        user_transcript = await _transcribe_upload(file)
+    except BaseException:
+        admission.leave()
+        raise
+    logger.info("🎙️ Transcrit : %s", user_transcript)
+
+    async def events():
+        yield _sse("transcript", {"transcript": user_transcript})
+        try:
+            async for chunk in _sse_stream(_spoken_reply(user_transcript, lat, lng, session_id)):
+                yield chunk
+        except Exception as e:
+            if overload_cause(e) is None:
+                logger.exception("Erreur streaming : %s", e)
+                yield _sse("error", {"error": str(e)})
+                return
+            logger.warning("Délestage (/process-voice-stream) : %s", e)
+            async for chunk in _sse_stream(_busy_reply(user_transcript)):
+                yield chunk
+
+    return _AdmittedStream(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/ws/voice")
+async def voice_socket(
+    websocket: WebSocket,
+    session_id: str = DEFAULT_SESSION,
+    lat: float = None,
+    lng: float = None,
+    format: str = PCM16,
+    sample_rate: int = 16000,
+    channels: int = 1
+):
+    """
+    Session vocale duplex, ouverte pour plusieurs tours de parole.
+
+    Client → serveur :
+      • binaire : morceaux d'audio pendant l'enregistrement (par défaut PCM
+        16 bits little-endian, 16 kHz mono ; voir `format`, `sample_rate`,
+        `channels`) ;
+      • {"type": "start", ...} : nouveau tour, avec éventuellement lat, lng,
+        format, sample_rate, channels à jour ;
+      • {"type": "end"} : fin de parole imposée (bouton relâché) ;
+      • {"type": "cancel"} : interrompt la réponse en cours.
+
+    Serveur → client : ready, partial (transcription partielle), transcript,
+    audio (index, text, size) suivi d'une trame binaire MP3, action, done,
+    error. En PCM, la fin de parole est détectée côté serveur (silence) et
+    la réponse part sans attendre de message « end ».
+    """
+    settings = {"lat": lat, "lng": lng, "format": format, "sample_rate": sample_rate, "channels": channels}
+    await websocket.accept()
+    try:
+        validate_format(format, sample_rate, channels)
+    except ValueError as e:
+        await websocket.send_text(json.dumps({"type": "error", "error": str(e)}))
+        await websocket.close(code=1003)
+        return
+    send_lock = asyncio.Lock()
+
+    async def send(message: dict, audio: bytes = None):
+        # L'en-tête JSON et sa trame audio ne doivent pas être séparés
+        async with send_lock:
+            await websocket.send_text(json.dumps(message, ensure_ascii=False))
+            if audio is not None:
+                await websocket.send_bytes(audio)
+
+    async def send_reply(events):
+        async for event in events:
+            if event["type"] == "audio":
+                audio = event.pop("audio")
+                await send({**event, "size": len(audio)}, audio)
+            else:
+                await send(event)
+
+    async def respond(current: StreamingTranscription, previous: asyncio.Task | None):
+        status = "ok"
+        try:
+            transcript = await current.finish()
+            logger.info("🎙️ Transcrit : %s", transcript)
+            await send({"type": "transcript", "text": transcript})
+            # Les réponses sont jouées dans l'ordre des tours
+            if previous is not None:
+                await asyncio.wait({previous})
+            with use_timer(current.timer):
+                admission.enter()
+                try:
+                    await send_reply(_spoken_reply(transcript, settings["lat"], settings["lng"], session_id))
+                finally:
+                    admission.leave()
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        except Exception as e:
+            if overload_cause(e) is not None:
+                status = "shed"
+                logger.warning("Délestage (/ws/voice) : %s", e)
+                await send_reply(_busy_reply())
+                return
+            status = "error"
+            logger.exception("Erreur WebSocket : %s", e)
+            await send({"type": "error", "error": str(e)})
+        finally:
+            finish_timer(current.timer, status)
+
+    def new_turn() -> StreamingTranscription:
+        return StreamingTranscription(
+            settings["format"], settings["sample_rate"], settings["channels"],
+            on_partial=lambda text: send({"type": "partial", "text": text})
+        )
+
+    turn: StreamingTranscription | None = None
+    reply: asyncio.Task | None = None
+    try:
+        await send({"type": "ready", "session_id": session_id})
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes") is not None:
+                turn = turn or new_turn()
+                try:
+                    ended = turn.feed(message["bytes"])
+                except TurnTooLarge as e:
+                    turn.cancel()
+                    turn = None
+                    await send({"type": "error", "error": str(e)})
+                    continue
+                if ended:
+                    current, turn = turn, None
+                    reply = asyncio.create_task(respond(current, reply))
+                continue
+
+            try:
+                data = json.loads(message.get("text") or "")
+            except ValueError:
+                await send({"type": "error", "error": "Invalid JSON message"})
+                continue
+            kind = data.get("type")
+            if kind == "start":
+                update = {key: data[key] for key in settings if key in data}
+                try:
+                    validate_format(
+                        update.get("format", settings["format"]),
+                        int(update.get("sample_rate", settings["sample_rate"])),
+                        int(update.get("channels", settings["channels"]))
+                    )
+                except (TypeError, ValueError) as e:
+                    await send({"type": "error", "error": str(e)})
+                    continue
+                settings.update(update)
+                if turn is not None:
+                    turn.cancel()
+                turn = new_turn()
+            elif kind == "end":
+                current, turn = turn or new_turn(), None
+                reply = asyncio.create_task(respond(current, reply))
+            elif kind == "cancel":
+                if reply is not None:
+                    reply.cancel()
+            else:
+                await send({"type": "error", "error": f"Unknown message type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if turn is not None:
+            turn.cancel()
+        if reply is not None:
+            reply.cancel()
+
+@app.post("/tts-only")
+async def tts_only(request: Request, text: str = Form(...)):
+    try:
+        audio = await synthesize_speech(text)
+    except Exception as e:
+        logger.warning("Erreur TTS : %s", e)
+        return JSONResponse(status_code=500, content={"error": "TTS generation failed."})
+    return voice_response(request.headers.get("accept"), {}, audio)
 
 @app.post("/transcribe-only")
 async def transcribe_only(file: UploadFile = File(...)):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-        tmp.write(await file.read())
-        audio_path = tmp.name
-
-    transcript = await transcribe_audio(audio_path)
-    os.remove(audio_path)
+    transcript = await _transcribe_upload(file)
     return {"transcript": transcript}
+
+@app.post("/batch")
+async def batch(
+    files: list[UploadFile] = File(...),
+    mode: str = Form("transcribe"),
+    concurrency: int = Form(BATCH_CONCURRENCY),
+    lat: float = Form(None),
+    lng: float = Form(None)
+):
+    """
+    Lot d'enregistrements (fichiers audio et/ou archives zip / tar) traités
+    en parallèle ; résultats en NDJSON, une ligne par enregistrement dès
+    qu'il est prêt, puis une ligne de récapitulatif.
+    Un lot compte pour autant de requêtes en cours que d'enregistrements
+    traités en même temps (au plus la limite d'admission) : refus en 503 si
+    le serveur est déjà chargé.
+    """
+    if mode not in BATCH_MODES:
+        return JSONResponse(status_code=400, content={"error": f"Unknown mode: {mode}."})
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+    slots = min(concurrency, admission.limit)
+    admission.enter(slots)
+    response = None
+    try:
+        items = await collect_items(files)
+        if not items:
+            return JSONResponse(status_code=400, content={"error": "No audio file in request."})
+        if len(items) > BATCH_MAX_ITEMS:
+            return JSONResponse(status_code=413, content={"error": f"Too many files (max {BATCH_MAX_ITEMS})."})
+
+        async def lines():
+            async for result in run_batch(items, mode, lat, lng, concurrency):
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+
+        response = _AdmittedStream(lines(), slots=slots, media_type="application/x-ndjson")
+        return response
+    finally:
+        # Sans flux, les places sont rendues tout de suite ; sinon par _AdmittedStream à la fin du flux
+        if response is None:
+            admission.leave(slots)
+
+@app.get("/healthz")
+async def healthz():
+    """Vivant : le processus répond (sans rien vérifier d'autre)."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Prêt à servir : échauffement terminé (et sonde OpenAI réussie si WARMUP_PROBE=1)."""
+    is_ready = await warmup.ready()
+    return JSONResponse(status_code=200 if is_ready else 503, content={"ready": is_ready, **warmup.stats()})
+
+@app.get("/cache-stats")
+async def get_cache_stats():
+    """Compteurs hits / misses / requêtes coalescées des caches d'outils et du TTS."""
+    return {**cache_stats(), "tts": tts_cache.stats()}
+
+@app.get("/calendar-stats")
+async def get_calendar_stats():
+    """Miroir local de l'agenda : fraîcheur, synchros (complètes, incrémentales, 410) et lectures locales / API."""
+    return calendar_mirror.stats()
+
+@app.get("/speech-stats")
+async def get_speech_stats():
+    """Fournisseurs STT / TTS : mode de routage, requêtes et durée moyenne par fournisseur, replis sur l'API."""
+    return speech_router.stats()
+
+@app.get("/intent-stats")
+async def get_intent_stats():
+    """Taux de commandes traitées localement, sélection des schémas d'outils et préchargement spéculatif."""
+    return {
+        **intent_router.stats(),
+        "tool_selection": tool_selector.stats(),
+        "speculation": speculator.stats()
+    }
+
+@app.get("/upstream-stats")
+async def get_upstream_stats():
+    """Admission et limiteurs par service amont : en cours, en file, délestés, nouvels essais, circuit."""
+    return {"admission": admission.stats(), **upstream_stats()}
+
+@app.get("/metrics")
+async def metrics():
+    """Histogrammes par endpoint / étape / outil et compteurs, au format Prometheus."""
+    return PlainTextResponse(
+        render_metrics(
+            {**cache_stats(), "tts": tts_cache.stats()},
+            intent_router.stats(),
+            conversation_store.stats(),
+            {"admission": admission.stats(), **upstream_stats()},
+            calendar_mirror.stats(),
+            speech_router.stats(),
+        ),
+        media_type="text/plain; version=0.0.4"
+    )
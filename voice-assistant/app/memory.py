@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+import random
+import weakref
+from collections import OrderedDict
+
+from app.session_store import MemoryBackend, SessionBackend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION = "default"
+# Nombre de sessions dont la dernière lecture est gardée en attendant l'enregistrement du tour
+LOADED_MAX = 1024
+CONFLICT_BACKOFF = 0.01
+
+
+def estimate_tokens(message: dict) -> int:
+    """Estimation grossière (≈ 4 caractères par token), suffisante pour le budget."""
+    return len(json.dumps(message, ensure_ascii=False)) // 4 + 4
+
+
+def _compact(message: dict, max_chars: int) -> dict:
+    """Tronque le contenu d'un résultat de fonction déjà exploité."""
+    content = message.get("content") or ""
+    if len(content) <= max_chars:
+        return message
+    return {**message, "content": content[:max_chars] + "…"}
+
+
+class ConversationStore:
+    """
+    Historique de conversation par session, borné :
+      • fenêtre glissante au budget de tokens (on retire les tours les plus anciens),
+      • compaction des résultats de fonction des tours précédents,
+      • éviction des sessions inactives et plafonds, laissés au backend
+        (mémoire, SQLite ou Redis, cf. app.session_store).
+
+    Un « tour » est la liste des messages produits par une requête :
+    message utilisateur, appels de fonctions, résultats, réponse finale.
+    On ne coupe jamais au milieu d'un tour pour ne pas orpheliner un résultat.
+
+    Dans un worker, les tours d'une session sont sérialisés par un verrou ;
+    entre workers, l'enregistrement est optimiste : en cas de conflit de
+    version, on relit la session et on y ajoute le tour à nouveau.
+    """
+
+    def __init__(
+        self,
+        system_message: dict,
+        backend: SessionBackend | None = None,
+        max_tokens: int = 3000,
+        function_result_max_chars: int = 500,
+        max_attempts: int = 5,
+    ):
+        self.system_message = system_message
+        self.backend = backend or MemoryBackend()
+        self.max_tokens = max_tokens
+        self.function_result_max_chars = function_result_max_chars
+        self.max_attempts = max_attempts
+        # Un verrou vit tant qu'un tour de la session le détient ou l'attend
+        self._locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+        # Dernière lecture par session : évite de relire au moment d'enregistrer
+        self._loaded: OrderedDict[str, tuple[list[list[dict]], int]] = OrderedDict()
+        self.commits = 0
+        self.conflicts = 0
+        self.lost = 0
+
+    def lock(self, session_id: str) -> asyncio.Lock:
+        """Verrou sérialisant les tours d'une même session (dans ce worker)."""
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        return lock
+
+    async def history(self, session_id: str) -> list[dict]:
+        """Messages à envoyer à GPT : prompt système + fenêtre de la session."""
+        turns, version = await self.backend.load(session_id)
+        self._loaded[session_id] = (turns, version)
+        self._loaded.move_to_end(session_id)
+        while len(self._loaded) > LOADED_MAX:
+            self._loaded.popitem(last=False)
+        return [self.system_message] + [m for turn in turns for m in turn]
+
+    def _append(self, turns: list[list[dict]], turn: list[dict]) -> list[list[dict]]:
+        """Nouvelle liste de tours : compaction, ajout puis fenêtre (sans modifier `turns`)."""
+        turns = list(turns)
+        # Les résultats de fonction des tours précédents sont compactés
+        if turns:
+            turns[-1] = [
+                _compact(m, self.function_result_max_chars)
+                if m.get("role") in ("function", "tool") else m
+                for m in turns[-1]
+            ]
+        turns.append(turn)
+
+        tokens = sum(estimate_tokens(m) for t in turns for m in t)
+        # Fenêtre glissante : on garde toujours au moins le dernier tour
+        while len(turns) > 1 and tokens > self.max_tokens:
+            dropped = turns.pop(0)
+            tokens -= sum(estimate_tokens(m) for m in dropped)
+        return turns
+
+    async def commit(self, session_id: str, turn: list[dict]):
+        """Ajoute un tour terminé à la session, en relisant celle-ci tant qu'un autre worker l'a modifiée."""
+        loaded = self._loaded.pop(session_id, None)
+        for attempt in range(self.max_attempts):
+            if attempt:
+                # Petite attente aléatoire : deux workers en conflit ne se recroisent pas aussitôt
+                await asyncio.sleep(random.uniform(0, CONFLICT_BACKOFF * attempt))
+            turns, version = loaded if loaded is not None else await self.backend.load(session_id)
+            loaded = None
+            if await self.backend.save(session_id, self._append(turns, turn), version):
+                self.commits += 1
+                return
+            self.conflicts += 1
+        self.lost += 1
+        logger.warning("Session %s : tour non enregistré après %d conflits", session_id, self.max_attempts)
+
+    async def clear(self, session_id: str):
+        self._loaded.pop(session_id, None)
+        await self.backend.delete(session_id)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            **self.backend.stats(),
+            "commits": self.commits,
+            "conflicts": self.conflicts,
+            "lost": self.lost,
+        }
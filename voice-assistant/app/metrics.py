@@ -0,0 +1,270 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger("alto.timing")
+
+# Bornes des histogrammes (secondes), de la milliseconde à la minute
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Histogramme au format Prometheus, avec étiquettes."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        series = self._series.get(key)
+        if series is None:
+            # [compteurs par borne..., somme, total]
+            series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            labels = ",".join(f'{n}="{v}"' for n, v in zip(self.label_names, key))
+            sep = "," if labels else ""
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {series[-1]}')
+            lines.append(f"{self.name}_sum{{{labels}}} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{{{labels}}} {series[-1]}")
+        return lines
+
+
+request_duration = Histogram(
+    "alto_request_duration_seconds", "Durée totale des requêtes HTTP.", ("endpoint", "status")
+)
+stage_duration = Histogram(
+    "alto_stage_duration_seconds", "Durée de chaque étape d'une requête.", ("endpoint", "stage")
+)
+tool_duration = Histogram(
+    "alto_tool_duration_seconds", "Durée d'exécution des outils appelés par GPT.", ("endpoint", "tool", "outcome")
+)
+HISTOGRAMS = [request_duration, stage_duration, tool_duration]
+
+# Étiquette des requêtes qui ne correspondent à aucune route (404, scans…)
+UNMATCHED_ENDPOINT = "other"
+
+
+class RequestTimer:
+    """
+    Chronométrage des étapes d'une requête (upload, stt, llm_1, tool_*, tts…).
+    Avec le scope ASGI, l'étiquette `endpoint` est le gabarit de la route
+    retenue par le routeur (ex. /items/{item_id}), jamais le chemin brut :
+    le nombre de séries des histogrammes reste borné.
+    """
+
+    def __init__(self, endpoint: str, scope: dict | None = None):
+        self._endpoint = endpoint
+        self._scope = scope
+        self.start = time.perf_counter()
+        self.stages: list[tuple[str, float]] = []
+
+    @property
+    def endpoint(self) -> str:
+        # Le routeur Starlette renseigne scope["route"] une fois la route trouvée
+        route = self._scope.get("route") if self._scope is not None else None
+        return getattr(route, "path", None) or self._endpoint
+
+    def record(self, name: str, seconds: float):
+        self.stages.append((name, seconds))
+        stage_duration.observe(seconds, endpoint=self.endpoint, stage=name)
+
+    def mark(self, name: str):
+        """Enregistre le temps écoulé depuis le début de la requête (ex. réception de l'upload)."""
+        self.record(name, time.perf_counter() - self.start)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages]
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[RequestTimer | None] = ContextVar("alto_request_timer", default=None)
+
+
+def current_timer() -> RequestTimer | None:
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str):
+    """Chronomètre un bloc et l'attribue à la requête en cours (s'il y en a une)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer = _current.get()
+        seconds = time.perf_counter() - start
+        if timer is not None:
+            timer.record(name, seconds)
+        else:
+            stage_duration.observe(seconds, endpoint="", stage=name)
+
+
+def observe_tool(name: str, seconds: float, ok: bool):
+    timer = _current.get()
+    if timer is not None:
+        timer.record(f"tool_{name}", seconds)
+    tool_duration.observe(
+        seconds, endpoint=timer.endpoint if timer else "", tool=name, outcome="ok" if ok else "error"
+    )
+
+
+def mark(name: str):
+    timer = _current.get()
+    if timer is not None:
+        timer.mark(name)
+
+
+@contextmanager
+def use_timer(timer: RequestTimer):
+    """Attribue au chronomètre donné les étapes du bloc (et des tâches qui y sont créées)."""
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+def finish_timer(timer: RequestTimer, status):
+    """Clôt une requête (ou un tour WebSocket) : histogramme + log structuré."""
+    total = timer.elapsed()
+    request_duration.observe(total, endpoint=timer.endpoint, status=status)
+    logger.info(json.dumps({
+        "event": "request",
+        "endpoint": timer.endpoint,
+        "status": status,
+        "total_ms": round(total * 1000, 1),
+        "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in timer.stages},
+    }, ensure_ascii=False))
+
+
+class TimingMiddleware:
+    """
+    Middleware ASGI : ouvre un chronomètre par requête, ajoute l'en-tête
+    Server-Timing (étapes connues au moment où les en-têtes partent) et,
+    une fois le corps entièrement envoyé — y compris pour les réponses
+    streamées —, écrit un log structuré et alimente les histogrammes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timer = RequestTimer(UNMATCHED_ENDPOINT, scope)
+        token = _current.set(timer)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timer.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            finish_timer(timer, status)
+            _current.reset(token)
+
+
+def _gauge(name: str, help_text: str, values: dict[tuple, float], label_names: tuple[str, ...]) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for key, value in sorted(values.items()):
+        labels = ",".join(f'{n}="{v}"' for n, v in zip(label_names, key))
+        lines.append(f"{name}{{{labels}}} {value}")
+    return lines
+
+
+def render_metrics(caches: dict, intents: dict, sessions: dict, upstreams: dict, calendar: dict, speech: dict) -> str:
+    """
+    Exposition texte Prometheus : histogrammes + compteurs des caches, du
+    routeur, des sessions, des limiteurs et du miroir d'agenda.
+    """
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    lines += _gauge(
+        "alto_cache_events",
+        "Compteurs des caches (hits, misses, coalesced…).",
+        {(cache, event): value for cache, stats in caches.items() for event, value in stats.items()},
+        ("cache", "event"),
+    )
+    lines += _gauge(
+        "alto_intent_router_routed",
+        "Commandes traitées localement par le routeur d'intentions, par outil.",
+        {(tool,): count for tool, count in intents.get("by_tool", {}).items()},
+        ("tool",),
+    )
+    lines += _gauge(
+        "alto_intent_router",
+        "Compteurs du routeur d'intentions.",
+        {(key,): intents[key] for key in ("total", "routed", "below_threshold", "tool_errors")},
+        ("event",),
+    )
+    lines += _gauge(
+        "alto_sessions",
+        "Sessions de conversation : taille du backend, tours enregistrés, conflits de version.",
+        {(key,): value for key, value in sessions.items() if isinstance(value, (int, float))},
+        ("metric",),
+    )
+    lines += _gauge(
+        "alto_upstream",
+        "Limiteurs par service amont (en cours, en file, délestés, nouvels essais…).",
+        {
+            (name, key): value
+            for name, stats in upstreams.items()
+            for key, value in stats.items()
+            if isinstance(value, (int, float))
+        },
+        ("upstream", "metric"),
+    )
+    lines += _gauge(
+        "alto_calendar_mirror",
+        "Miroir local de l'agenda : événements, synchros, lectures locales / API.",
+        # fresh / enabled : 1 ou 0
+        {(key,): float(value) for key, value in calendar.items() if isinstance(value, (int, float))},
+        ("metric",),
+    )
+    lines += _gauge(
+        "alto_speech_provider",
+        "Fournisseurs STT / TTS (API, modèles locaux) : requêtes, erreurs, durée moyenne, tâches en attente.",
+        {
+            (name, key): float(value)
+            for name, stats in speech["providers"].items()
+            for key, value in stats.items()
+            if isinstance(value, (int, float))
+        },
+        ("provider", "metric"),
+    )
+    lines += _gauge(
+        "alto_upstream_circuit_open",
+        "Disjoncteur ouvert (1) ou fermé (0), par service amont.",
+        {(name,): int(stats["circuit"] != "closed") for name, stats in upstreams.items() if "circuit" in stats},
+        ("upstream",),
+    )
+    return "\n".join(lines) + "\n"
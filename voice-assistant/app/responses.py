@@ -0,0 +1,80 @@
+import base64
+import json
+import uuid
+from urllib.parse import quote
+
+from fastapi.responses import JSONResponse, Response
+
+from app.metrics import stage
+
+JSON = "application/json"
+MULTIPART = "multipart/mixed"
+MPEG = "audio/mpeg"
+
+
+def negotiate(accept: str | None) -> str:
+    """
+    Choisit le format de réponse selon l'en-tête Accept (qualité « q » prise
+    en compte). Sans préférence explicite, on garde le JSON base64 attendu
+    par les anciennes versions de l'app.
+    """
+    best, best_q = JSON, 0.0
+    for item in (accept or "").split(","):
+        media_type, *params = [p.strip() for p in item.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type in (MULTIPART, MPEG) and q > best_q:
+            best, best_q = media_type, q
+        elif media_type == JSON and q >= best_q:
+            best, best_q = JSON, q
+    return best
+
+
+def _multipart(metadata: dict, audio: bytes) -> Response:
+    boundary = uuid.uuid4().hex
+    meta = json.dumps(metadata, ensure_ascii=False).encode()
+    body = b"".join([
+        f"--{boundary}\r\n".encode(),
+        b"Content-Type: application/json; charset=utf-8\r\n",
+        f"Content-Length: {len(meta)}\r\n\r\n".encode(),
+        meta,
+        f"\r\n--{boundary}\r\n".encode(),
+        f"Content-Type: {MPEG}\r\n".encode(),
+        f"Content-Length: {len(audio)}\r\n\r\n".encode(),
+        audio,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ])
+    return Response(body, media_type=f'{MULTIPART}; boundary="{boundary}"')
+
+
+def _raw_audio(metadata: dict, audio: bytes) -> Response:
+    # Les en-têtes HTTP sont en latin-1 : les valeurs sont encodées en URL (UTF-8)
+    headers = {
+        f"X-Alto-{key.replace('_', '-').title()}": quote(
+            value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        )
+        for key, value in metadata.items()
+        if value is not None
+    }
+    return Response(audio, media_type=MPEG, headers=headers)
+
+
+def voice_response(accept: str | None, metadata: dict, audio: bytes) -> Response:
+    """
+    Réponse audio selon la négociation de contenu :
+      • multipart/mixed : une partie JSON (métadonnées) + une partie audio/mpeg brute ;
+      • audio/mpeg : le MP3 brut, métadonnées dans les en-têtes X-Alto-* ;
+      • sinon : JSON avec l'audio en base64 (format historique).
+    """
+    media_type = negotiate(accept)
+    with stage("encode"):
+        if media_type == MULTIPART:
+            return _multipart(metadata, audio)
+        if media_type == MPEG:
+            return _raw_audio(metadata, audio)
+        return JSONResponse({**metadata, "audio": base64.b64encode(audio).decode()})
@@ -0,0 +1,366 @@
+import asyncio
+import json
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from urllib.parse import unquote, urlparse
+
+# Au-delà de cette taille, l'historique sérialisé est compressé
+COMPRESS_MIN_BYTES = 512
+
+
+# 📦 Sérialisation compacte : JSON sans espaces, zlib si ça vaut la peine
+def encode_turns(turns: list[list[dict]]) -> bytes:
+    raw = json.dumps(turns, ensure_ascii=False, separators=(",", ":")).encode()
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        return b"z" + zlib.compress(raw, 1)
+    return b"j" + raw
+
+
+def decode_turns(blob: bytes) -> list[list[dict]]:
+    if not blob:
+        return []
+    raw = zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+    return json.loads(raw)
+
+
+def _approx_size(turns: list[list[dict]]) -> int:
+    return sum(len(json.dumps(m, ensure_ascii=False)) for turn in turns for m in turn)
+
+
+class SessionBackend:
+    """
+    Stockage des tours de conversation, partageable entre workers.
+    Chaque session porte un numéro de version (0 = absente) : `save` n'écrit
+    que si la version n'a pas bougé depuis la lecture (concurrence optimiste)
+    et renvoie False sinon, à charge pour l'appelant de relire et recommencer.
+    """
+
+    name = "abstract"
+
+    async def load(self, session_id: str) -> tuple[list[list[dict]], int]:
+        raise NotImplementedError
+
+    async def save(self, session_id: str, turns: list[list[dict]], version: int) -> bool:
+        raise NotImplementedError
+
+    async def delete(self, session_id: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class _Entry:
+    __slots__ = ("turns", "version", "last_used", "size")
+
+    def __init__(self, turns: list[list[dict]], version: int, size: int):
+        self.turns = turns
+        self.version = version
+        self.last_used = time.monotonic()
+        self.size = size
+
+
+class MemoryBackend(SessionBackend):
+    """
+    Sessions dans la mémoire du processus (un seul worker) : éviction des
+    sessions inactives puis LRU au-delà de `max_sessions` / `max_bytes`.
+    Les listes stockées ne sont jamais modifiées en place.
+    """
+
+    name = "memory"
+
+    def __init__(self, idle_ttl: float = 1800, max_sessions: int = 1000, max_bytes: int = 50_000_000):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+
+    async def load(self, session_id: str) -> tuple[list[list[dict]], int]:
+        self._evict_idle()
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return [], 0
+        self._sessions.move_to_end(session_id)
+        entry.last_used = time.monotonic()
+        return entry.turns, entry.version
+
+    async def save(self, session_id: str, turns: list[list[dict]], version: int) -> bool:
+        entry = self._sessions.get(session_id)
+        if (entry.version if entry else 0) != version:
+            return False
+        self._drop(session_id)
+        entry = self._sessions[session_id] = _Entry(turns, version + 1, _approx_size(turns))
+        self._bytes += entry.size
+        self._enforce_caps(keep=session_id)
+        return True
+
+    async def delete(self, session_id: str):
+        self._drop(session_id)
+
+    def _drop(self, session_id: str):
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict_idle(self):
+        deadline = time.monotonic() - self.idle_ttl
+        # L'OrderedDict est trié du moins au plus récemment utilisé
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if entry.last_used >= deadline:
+                break
+            self._drop(session_id)
+
+    def _enforce_caps(self, keep: str):
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions and self._bytes <= self.max_bytes:
+                break
+            if session_id != keep:
+                self._drop(session_id)
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._sessions), "approx_bytes": self._bytes}
+
+
+class SQLiteBackend(SessionBackend):
+    """
+    Fichier SQLite en mode WAL, partagé par les workers d'une même machine.
+    Les requêtes passent dans un thread (une connexion par thread) ; la
+    version est comparée dans le UPDATE lui-même.
+    """
+
+    name = "sqlite"
+    PURGE_EVERY = 200
+
+    def __init__(self, path: str, idle_ttl: float = 1800):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self._local = threading.local()
+        self._saves = 0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY, version INTEGER NOT NULL, data BLOB NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            import sqlite3  # seulement si ce backend est choisi
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self, session_id: str) -> tuple[list[list[dict]], int]:
+        row = self._connection().execute(
+            "SELECT version, data, updated FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return [], 0
+        version, data, updated = row
+        # Session expirée : vide, mais la version reste celle de la ligne
+        if updated < time.time() - self.idle_ttl:
+            return [], version
+        return decode_turns(data), version
+
+    def _save(self, session_id: str, blob: bytes, version: int) -> bool:
+        conn = self._connection()
+        now = time.time()
+        if version == 0:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO sessions (id, version, data, updated) VALUES (?, 1, ?, ?)",
+                (session_id, blob, now),
+            )
+        else:
+            cursor = conn.execute(
+                "UPDATE sessions SET version = version + 1, data = ?, updated = ? WHERE id = ? AND version = ?",
+                (blob, now, session_id, version),
+            )
+        return cursor.rowcount == 1
+
+    def _purge(self):
+        self._connection().execute("DELETE FROM sessions WHERE updated < ?", (time.time() - self.idle_ttl,))
+
+    async def load(self, session_id: str) -> tuple[list[list[dict]], int]:
+        return await asyncio.to_thread(self._load, session_id)
+
+    async def save(self, session_id: str, turns: list[list[dict]], version: int) -> bool:
+        saved = await asyncio.to_thread(self._save, session_id, encode_turns(turns), version)
+        self._saves += 1
+        if self._saves % self.PURGE_EVERY == 0:
+            await asyncio.to_thread(self._purge)
+        return saved
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(
+            lambda: self._connection().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        )
+
+    def stats(self) -> dict:
+        return {"saves": self._saves}
+
+
+# 🧵 Client RESP minimal (Redis, Valkey, KeyDB…), sans dépendance
+class RedisError(Exception):
+    pass
+
+
+def _resp_command(args: tuple) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+async def _resp_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Redis connection closed")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise RedisError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(payload)
+        if length < 0:
+            return None
+        return [await _resp_reply(reader) for _ in range(length)]
+    raise RedisError(f"Unexpected reply: {line!r}")
+
+
+class _RedisConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    async def execute(self, *args):
+        self.writer.write(_resp_command(args))
+        await self.writer.drain()
+        return await _resp_reply(self.reader)
+
+    def close(self):
+        self.writer.close()
+
+
+class RedisBackend(SessionBackend):
+    """
+    Serveur parlant le protocole Redis, partagé par plusieurs machines.
+    Valeur = version (8 octets) + historique sérialisé, expirée par TTL ;
+    l'écriture conditionnelle passe par WATCH / MULTI / EXEC.
+    """
+
+    name = "redis"
+    PREFIX = "alto:session:"
+
+    def __init__(self, url: str, idle_ttl: float = 1800, pool_size: int = 8):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.idle_ttl = max(int(idle_ttl), 1)
+        self._idle: list[_RedisConnection] = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+    async def _connect(self) -> _RedisConnection:
+        conn = _RedisConnection(*await asyncio.open_connection(self.host, self.port))
+        if self.password:
+            await conn.execute("AUTH", self.password)
+        if self.db:
+            await conn.execute("SELECT", self.db)
+        return conn
+
+    async def _run(self, operation):
+        """Exécute `operation(conn)` sur une connexion du pool ; une connexion en erreur est jetée."""
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await self._connect()
+            try:
+                result = await operation(conn)
+            except BaseException:
+                conn.close()
+                raise
+            self._idle.append(conn)
+            return result
+
+    @staticmethod
+    def _unpack(value: bytes | None) -> tuple[list[list[dict]], int]:
+        if value is None:
+            return [], 0
+        (version,) = struct.unpack_from(">Q", value)
+        return decode_turns(value[8:]), version
+
+    async def load(self, session_id: str) -> tuple[list[list[dict]], int]:
+        key = self.PREFIX + session_id
+        return self._unpack(await self._run(lambda conn: conn.execute("GET", key)))
+
+    async def save(self, session_id: str, turns: list[list[dict]], version: int) -> bool:
+        key = self.PREFIX + session_id
+        value = struct.pack(">Q", version + 1) + encode_turns(turns)
+
+        async def cas(conn: _RedisConnection) -> bool:
+            await conn.execute("WATCH", key)
+            current = await conn.execute("GET", key)
+            if (struct.unpack_from(">Q", current)[0] if current else 0) != version:
+                await conn.execute("UNWATCH")
+                return False
+            await conn.execute("MULTI")
+            await conn.execute("SET", key, value, "EX", self.idle_ttl)
+            # EXEC renvoie nil si la clé a changé depuis le WATCH
+            return await conn.execute("EXEC") is not None
+
+        return await self._run(cas)
+
+    async def delete(self, session_id: str):
+        key = self.PREFIX + session_id
+        await self._run(lambda conn: conn.execute("DEL", key))
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+    def stats(self) -> dict:
+        return {"pooled_connections": len(self._idle)}
+
+
+def create_backend(url: str, idle_ttl: float = 1800, max_sessions: int = 1000,
+                   max_bytes: int = 50_000_000) -> SessionBackend:
+    """
+    Backend choisi par URL :
+      • memory://                    (défaut, un seul worker)
+      • sqlite://sessions.db         (plusieurs workers, une machine)
+      • redis://[:mdp@]hôte:6379/0   (plusieurs machines)
+    SQLite : tout ce qui suit « sqlite:// » est le chemin du fichier, donc
+    sqlite://sessions.db est relatif au répertoire de lancement et
+    sqlite:///var/lib/alto/sessions.db absolu (à la différence de
+    SQLAlchemy, trois barres ne désignent pas un chemin relatif).
+    """
+    scheme = urlparse(url).scheme or "memory"
+    if scheme == "memory":
+        return MemoryBackend(idle_ttl, max_sessions, max_bytes)
+    if scheme == "sqlite":
+        path = url.split("://", 1)[1]
+        # sqlite:///abs/path → /abs/path ; sqlite://rel.db → rel.db
+        return SQLiteBackend(path or "sessions.db", idle_ttl)
+    if scheme in ("redis", "valkey"):
+        return RedisBackend(url, idle_ttl)
+    raise ValueError(f"Unsupported session backend: {url}")
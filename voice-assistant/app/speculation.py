@@ -0,0 +1,136 @@
+import asyncio
+import os
+import re
+
+from app.intents import DAYS_AHEAD, fold
+
+SPECULATION_ENABLED = os.getenv("SPECULATIVE_TOOLS", "1") != "0"
+
+# Seuls des outils en lecture seule, sans effet de bord, peuvent être lancés
+# avant que GPT ne les demande : jamais add_event_to_calendar ni les prepare_*.
+READ_ONLY_TOOLS = frozenset({
+    "get_weather",
+    "get_weather_forecast",
+    "get_today_events",
+    "get_upcoming_events",
+})
+
+# Valeurs par défaut des schémas, pour comparer les arguments prédits à ceux de GPT
+DEFAULT_ARGS = {
+    "get_weather_forecast": {"days_ahead": 1},
+    "get_upcoming_events": {"max_results": 5},
+}
+
+_WEATHER = re.compile(
+    r"\b(?:meteo|temps|pleu|pluie|soleil|neige|vent|orage|temperature|degres|froid|chaud|parapluie)"
+)
+_DAYS = re.compile(r"\b(apres\s+demain|demain)\b")
+# Sur le texte d'origine : Whisper met une majuscule aux noms de ville
+_CITY = re.compile(
+    r"\b(?:à|a|au|aux|en|sur|pour|de)\s+"
+    r"(?P<city>[A-ZÀ-Ý][\w'-]*(?:[\s-](?:(?:sur|en|le|la|les|de|du)[\s-])?[A-ZÀ-Ý][\w'-]*){0,3})"
+)
+_AGENDA = re.compile(
+    r"\b(?:agenda|calendrier|rendez\s+vous|rdv|reunion|emploi\s+du\s+temps|planning|programme|prevu)"
+)
+_TODAY = re.compile(r"\b(?:aujourd\s+hui|ce\s+matin|cet\s+apres\s+midi|ce\s+soir)\b")
+_UPCOMING = re.compile(r"\b(?:prochain|prochaine|prochains|prochaines|a\s+venir)\b")
+
+
+def _args_key(name: str, args: dict) -> tuple:
+    """Clé d'un appel : arguments complétés par les défauts, casse et espaces ignorés."""
+    full = {**DEFAULT_ARGS.get(name, {}), **args}
+    return name, tuple(sorted((k, " ".join(str(v).casefold().split())) for k, v in full.items()))
+
+
+def predict(text: str) -> list[tuple[str, dict]]:
+    """Appels d'outils en lecture seule probables pour cette phrase (analyse lexicale seulement)."""
+    folded = fold(text)
+    calls = []
+
+    if _WEATHER.search(folded):
+        city = _CITY.search(text)
+        if city:
+            days = _DAYS.search(folded)
+            if days:
+                days_ahead = DAYS_AHEAD[" ".join(days.group(1).split())]
+                calls.append(("get_weather_forecast", {"city": city.group("city").strip(), "days_ahead": days_ahead}))
+            else:
+                calls.append(("get_weather", {"city": city.group("city").strip()}))
+
+    if _AGENDA.search(folded):
+        if _TODAY.search(folded):
+            calls.append(("get_today_events", {}))
+        elif _UPCOMING.search(folded):
+            calls.append(("get_upcoming_events", {}))
+
+    return calls
+
+
+def _consume(task: asyncio.Task):
+    # Résultat éventuellement jamais lu : on évite « exception never retrieved »
+    if not task.cancelled():
+        task.exception()
+
+
+class Speculation:
+    """Appels lancés pour un tour, en attente d'une demande identique de GPT."""
+
+    def __init__(self, speculator: "Speculator", tasks: dict[tuple, asyncio.Task]):
+        self.speculator = speculator
+        self._tasks = tasks
+
+    def take(self, name: str, args: dict) -> asyncio.Task | None:
+        task = self._tasks.pop(_args_key(name, args), None)
+        if task is not None:
+            self.speculator.used += 1
+        return task
+
+    def discard(self):
+        """
+        Fin du tour : les résultats non demandés sont ignorés. Les appels ne
+        sont pas annulés : la météo alimente son cache, et annuler une
+        récupération partagée ferait échouer les requêtes coalescées dessus.
+        """
+        self.speculator.wasted += len(self._tasks)
+        self._tasks.clear()
+
+
+class Speculator:
+    """
+    Préchargement spéculatif : les outils en lecture seule que la phrase
+    rend probables sont lancés en même temps que le premier appel GPT.
+    Si GPT demande le même appel (mêmes arguments), le résultat déjà
+    obtenu — ou en cours — est réutilisé ; sinon il est ignoré.
+    """
+
+    def __init__(self, enabled: bool = SPECULATION_ENABLED):
+        self.enabled = enabled
+        self.started = 0
+        self.used = 0
+        self.wasted = 0
+
+    def start(self, text: str, available: dict, allowed: list[str]) -> Speculation:
+        tasks = {}
+        if self.enabled:
+            for name, args in predict(text):
+                # Un outil absent des schémas envoyés ne peut pas être demandé par GPT
+                if name not in READ_ONLY_TOOLS or name not in allowed:
+                    continue
+                task = asyncio.create_task(available[name](**args))
+                task.add_done_callback(_consume)
+                tasks[_args_key(name, args)] = task
+                self.started += 1
+        return Speculation(self, tasks)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "started": self.started,
+            "used": self.used,
+            "wasted": self.wasted,
+            "hit_rate": round(self.used / self.started, 3) if self.started else 0.0,
+        }
+
+
+speculator = Speculator()
@@ -0,0 +1,295 @@
+import asyncio
+import contextvars
+import importlib.util
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO
+
+from app import local_speech
+
+logger = logging.getLogger(__name__)
+
+# 🗣️ Choix des fournisseurs (surchargé par variables d'environnement)
+#   openai : tout passe par l'API ; local : modèles sur CPU ; auto : routage par requête
+STT_PROVIDER = os.getenv("STT_PROVIDER", "openai")
+TTS_PROVIDER = os.getenv("TTS_PROVIDER", "openai")
+# auto : local pour les commandes courtes, API pour la dictée longue et les longues réponses
+LOCAL_STT_MAX_SECONDS = float(os.getenv("LOCAL_STT_MAX_SECONDS", "15"))
+LOCAL_TTS_MAX_CHARS = int(os.getenv("LOCAL_TTS_MAX_CHARS", "200"))
+# auto : au-delà de ce nombre de tâches en attente par processus, l'API prend le relais
+LOCAL_MAX_PENDING_PER_WORKER = int(os.getenv("LOCAL_MAX_PENDING_PER_WORKER", "2"))
+
+# Modèles locaux (dépendances facultatives : requirements-local.txt)
+# faster-whisper : tiny, base, small, medium, large-v3, distil-large-v3… ou un dossier CTranslate2
+LOCAL_STT_MODEL = os.getenv("LOCAL_STT_MODEL", "small")
+LOCAL_STT_COMPUTE_TYPE = os.getenv("LOCAL_STT_COMPUTE_TYPE", "int8")
+LOCAL_STT_LANGUAGE = os.getenv("LOCAL_STT_LANGUAGE", "fr")
+# Voix Piper : chemin du fichier .onnx (le .onnx.json doit être à côté)
+LOCAL_TTS_VOICE = os.getenv("LOCAL_TTS_VOICE", "voices/fr_FR-siwis-medium.onnx")
+LOCAL_TTS_BITRATE = int(os.getenv("LOCAL_TTS_BITRATE", "48"))
+# Processus par pool (STT et TTS ont chacun le leur) et threads de calcul par processus
+LOCAL_STT_WORKERS = int(os.getenv("LOCAL_STT_WORKERS", "2"))
+LOCAL_TTS_WORKERS = int(os.getenv("LOCAL_TTS_WORKERS", "1"))
+LOCAL_THREADS = int(os.getenv("LOCAL_THREADS", "2"))
+
+# Fournisseur STT retenu pour la requête en cours : la synthèse de la réponse suit le même choix
+speech_route: contextvars.ContextVar[str | None] = contextvars.ContextVar("speech_route", default=None)
+
+
+class SpeechProvider:
+    """Compteurs communs : requêtes, erreurs, temps cumulé."""
+
+    name = "?"
+    local = False
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    async def _timed(self, work):
+        start = time.perf_counter()
+        self.requests += 1
+        try:
+            return await work
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "mean_ms": round(self.seconds / self.requests * 1000, 1) if self.requests else 0.0,
+        }
+
+
+# ☁️ API OpenAI
+class OpenAISTT(SpeechProvider):
+    def __init__(self, client, model: str = "whisper-1"):
+        super().__init__()
+        self.client = client
+        self.model = model
+        self.name = f"openai:{model}"
+
+    async def transcribe(self, audio: bytes | BinaryIO, filename: str) -> str:
+        resp = await self._timed(self.client.audio.transcriptions.create(model=self.model, file=(filename, audio)))
+        return resp.text
+
+
+class OpenAITTS(SpeechProvider):
+    def __init__(self, client, model: str = "tts-1", voice: str = "nova"):
+        super().__init__()
+        self.client = client
+        self.model = model
+        self.voice = voice
+        self.name = f"openai:{model}"
+
+    async def synthesize(self, text: str) -> bytes:
+        resp = await self._timed(self.client.audio.speech.create(model=self.model, voice=self.voice, input=text))
+        return resp.content
+
+
+# 🖥️ Modèles locaux, dans un pool de processus (la boucle d'événements reste libre)
+class LocalPool:
+    """
+    Pool de processus démarré à la première tâche (ou par warm()), chaque
+    processus chargeant son modèle une fois. Un échec de chargement casse
+    le pool : le fournisseur est alors marqué indisponible.
+    """
+
+    def __init__(self, name: str, workers: int, initializer, initargs: tuple, requirements: tuple[str, ...]):
+        self.name = name
+        self.workers = workers
+        self.initializer = initializer
+        self.initargs = initargs
+        missing = [module for module in requirements if importlib.util.find_spec(module) is None]
+        self.error: str | None = f"modules manquants : {', '.join(missing)}" if missing else None
+        self.pending = 0
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def available(self) -> bool:
+        return self.error is None
+
+    @property
+    def busy(self) -> bool:
+        return self.pending >= self.workers * LOCAL_MAX_PENDING_PER_WORKER
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            import multiprocessing
+
+            # spawn : pas de copie de la boucle d'événements ni des sockets du serveur
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer, initargs=self.initargs,
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.error:
+            raise RuntimeError(f"{self.name} indisponible ({self.error})")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+        except BrokenProcessPool as e:
+            self.error = f"pool arrêté : {e}"
+            logger.error("Inférence locale %s indisponible : %s", self.name, e)
+            raise RuntimeError(f"{self.name} indisponible") from e
+        finally:
+            self.pending -= 1
+
+    async def warm(self):
+        """Démarre tous les processus et attend le chargement des modèles."""
+        await asyncio.gather(*(self.run(local_speech.ready) for _ in range(self.workers)))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class LocalSTT(SpeechProvider):
+    local = True
+
+    def __init__(self, model: str = LOCAL_STT_MODEL, compute_type: str = LOCAL_STT_COMPUTE_TYPE,
+                 language: str = LOCAL_STT_LANGUAGE, workers: int = LOCAL_STT_WORKERS, threads: int = LOCAL_THREADS):
+        super().__init__()
+        self.language = language
+        self.name = f"local:{model}-{compute_type}"
+        self.pool = LocalPool(self.name, workers, local_speech.init_stt, (model, compute_type, threads),
+                              ("faster_whisper",))
+
+    async def transcribe(self, audio: bytes | BinaryIO, filename: str) -> str:
+        data = audio if isinstance(audio, bytes) else audio.read()
+        return await self._timed(self.pool.run(local_speech.transcribe, data, self.language))
+
+
+class LocalTTS(SpeechProvider):
+    local = True
+
+    def __init__(self, voice: str = LOCAL_TTS_VOICE, workers: int = LOCAL_TTS_WORKERS, threads: int = LOCAL_THREADS,
+                 bitrate: int = LOCAL_TTS_BITRATE):
+        super().__init__()
+        self.model = "piper"
+        self.voice = os.path.basename(voice).removesuffix(".onnx")
+        self.name = f"local:piper-{self.voice}"
+        self.bitrate = bitrate
+        self.pool = LocalPool(self.name, workers, local_speech.init_tts, (voice, threads), ("piper", "lameenc"))
+        if self.pool.available and not os.path.exists(voice):
+            self.pool.error = f"voix introuvable : {voice}"
+
+    async def synthesize(self, text: str) -> bytes:
+        return await self._timed(self.pool.run(local_speech.synthesize, text, self.bitrate))
+
+
+# 🔀 Routage par requête
+class SpeechRouter:
+    """
+    Choisit le fournisseur de chaque transcription et de chaque synthèse.
+    En mode auto : modèle local pour un enregistrement court (commande) s'il
+    est disponible et pas saturé, API pour la dictée longue ; la synthèse
+    suit le choix fait pour la transcription de la même requête (une seule
+    voix par réponse), sinon la longueur du texte. Un échec local bascule
+    sur l'API.
+    """
+
+    MODES = ("openai", "local", "auto")
+
+    def __init__(self, cloud_stt: OpenAISTT, cloud_tts: OpenAITTS, local_stt: LocalSTT | None = None,
+                 local_tts: LocalTTS | None = None, stt_mode: str = STT_PROVIDER, tts_mode: str = TTS_PROVIDER):
+        for mode in (stt_mode, tts_mode):
+            if mode not in self.MODES:
+                raise ValueError(f"Fournisseur vocal inconnu : {mode} (attendu : {', '.join(self.MODES)})")
+        self.cloud_stt = cloud_stt
+        self.cloud_tts = cloud_tts
+        self.local_stt = local_stt if stt_mode != "openai" else None
+        self.local_tts = local_tts if tts_mode != "openai" else None
+        self.stt_mode = stt_mode
+        self.tts_mode = tts_mode
+        self.fallbacks = 0
+        for provider in (self.local_stt, self.local_tts):
+            if provider is not None and not provider.pool.available:
+                logger.warning("Inférence locale %s indisponible (%s) : l'API OpenAI est utilisée",
+                               provider.name, provider.pool.error)
+
+    def _usable(self, provider) -> bool:
+        return provider is not None and provider.pool.available
+
+    def stt_for(self, duration: float | None):
+        if not self._usable(self.local_stt):
+            return self.cloud_stt
+        if self.stt_mode == "local":
+            return self.local_stt
+        # Durée inconnue : on ne présume pas d'une commande courte
+        short = duration is not None and 0 <= duration <= LOCAL_STT_MAX_SECONDS
+        return self.local_stt if short and not self.local_stt.pool.busy else self.cloud_stt
+
+    def tts_for(self, text: str):
+        if not self._usable(self.local_tts):
+            return self.cloud_tts
+        if self.tts_mode == "local":
+            return self.local_tts
+        route = speech_route.get()
+        short = len(text) <= LOCAL_TTS_MAX_CHARS if route is None else route == "local"
+        return self.local_tts if short and not self.local_tts.pool.busy else self.cloud_tts
+
+    def tts_providers(self, text: str) -> list:
+        """Fournisseurs dont le cache peut tenir cette phrase, le plus probable d'abord."""
+        first = self.tts_for(text)
+        return [first] + [p for p in (self.cloud_tts, self.local_tts) if p is not None and p is not first]
+
+    def fell_back(self, what: str, error: Exception):
+        self.fallbacks += 1
+        logger.warning("%s locale en échec, repli sur l'API : %s", what, error)
+
+    def route(self, duration: float | None):
+        """Fournisseur STT de la requête en cours, retenu aussi pour la synthèse de sa réponse."""
+        provider = self.stt_for(duration)
+        speech_route.set("local" if provider.local else "cloud")
+        return provider
+
+    async def transcribe(self, audio: bytes | BinaryIO, filename: str, duration: float | None = None,
+                         provider=None) -> str:
+        """Transcription par `provider` (morceaux d'un même enregistrement) ou par le fournisseur routé."""
+        provider = provider or self.route(duration)
+        if not provider.local:
+            return await provider.transcribe(audio, filename)
+        # Le flux n'est lu qu'une fois : les octets servent aussi au repli
+        data = audio if isinstance(audio, bytes) else audio.read()
+        try:
+            return await provider.transcribe(data, filename)
+        except Exception as e:
+            self.fell_back("Transcription", e)
+            return await self.cloud_stt.transcribe(data, filename)
+
+    async def warm(self):
+        """Démarre les pools locaux et charge les modèles (étape d'échauffement)."""
+        await asyncio.gather(*(p.pool.warm() for p in (self.local_stt, self.local_tts) if self._usable(p)))
+
+    def close(self):
+        for provider in (self.local_stt, self.local_tts):
+            if provider is not None:
+                provider.pool.close()
+
+    def stats(self) -> dict:
+        providers = [self.cloud_stt, self.cloud_tts] + [p for p in (self.local_stt, self.local_tts) if p is not None]
+        return {
+            "stt_mode": self.stt_mode,
+            "tts_mode": self.tts_mode,
+            "fallbacks": self.fallbacks,
+            "providers": {
+                p.name: {
+                    **p.stats(),
+                    **({"available": p.pool.available, "error": p.pool.error, "pending": p.pool.pending}
+                       if p.local else {}),
+                }
+                for p in providers
+            },
+        }
@@ -0,0 +1,85 @@
+import os
+import re
+
+from app.intents import fold
+
+TOOL_SELECTION_ENABLED = os.getenv("TOOL_SELECTION", "1") != "0"
+
+# Schémas envoyés à chaque appel, toujours en tête et dans cet ordre :
+# avec le prompt système, ils forment un préfixe stable (cache de prompt).
+CORE_TOOLS = ("search_web", "get_weather", "get_weather_forecast")
+
+# Mots-clés (texte replié : minuscules, sans accents) → outils à ajouter
+TOOL_GROUPS = [
+    (
+        r"meteo|temps|pluie|pleu|soleil|neige|vent|degres|temperature|froid|chaud|orage",
+        ("get_weather", "get_weather_forecast"),
+    ),
+    (
+        r"agenda|calendrier|rendez vous|rdv|reunion|evenement|emploi du temps|planning|prevu|programme"
+        r"|ajoute|note|rappel",
+        ("add_event_to_calendar", "get_upcoming_events", "get_today_events", "read_local_calendar"),
+    ),
+    (
+        r"aller|itineraire|route|chemin|trajet|rendre|conduire|emmene|adresse|gare|maps|pied|voiture|bus|train",
+        ("get_directions",),
+    ),
+    (r"message|sms|texto|ecri|envoi|repond", ("prepare_send_message",)),
+    (r"appel|telephon|sonne", ("prepare_call_contact",)),
+    (r"photo|camera|appareil", ("prepare_open_camera",)),
+    (r"ouvr|lance|demarr|application|appli|app", ("prepare_open_app",)),
+    (r"cherche|recherche|internet|web|actualite|news|qui|quoi|quel|combien|pourquoi", ("search_web",)),
+]
+
+
+class ToolSelector:
+    """
+    Pré-sélection des schémas d'outils pour un tour : les outils de base
+    d'abord (ordre fixe), puis les groupes évoqués par la phrase et les
+    outils utilisés au tour précédent (suites de conversation), dans
+    l'ordre canonique. Si aucun groupe ne correspond, tous les outils sont
+    envoyés pour ne pas priver GPT d'une fonction utile.
+    """
+
+    def __init__(self, all_tools: list[str], enabled: bool = TOOL_SELECTION_ENABLED):
+        self.all_tools = list(all_tools)
+        self.enabled = enabled
+        self._groups = [(re.compile(rf"\b(?:{pattern})"), names) for pattern, names in TOOL_GROUPS]
+        self.turns = 0
+        self.full_fallbacks = 0
+        self.tools_sent = 0
+
+    def select(self, text: str, recent_tools: set[str] = frozenset()) -> list[str]:
+        self.turns += 1
+        selected = None
+        if self.enabled:
+            folded = fold(text)
+            matched = {name for regex, names in self._groups if regex.search(folded) for name in names}
+            if matched:
+                wanted = matched | set(recent_tools)
+                selected = list(CORE_TOOLS) + [
+                    name for name in self.all_tools if name in wanted and name not in CORE_TOOLS
+                ]
+        if selected is None:
+            self.full_fallbacks += 1
+            selected = list(CORE_TOOLS) + [name for name in self.all_tools if name not in CORE_TOOLS]
+        self.tools_sent += len(selected)
+        return selected
+
+    def stats(self) -> dict:
+        return {
+            "turns": self.turns,
+            "full_fallbacks": self.full_fallbacks,
+            "avg_tools_sent": round(self.tools_sent / self.turns, 2) if self.turns else 0.0,
+        }
+
+
+def recent_tool_names(messages: list[dict]) -> set[str]:
+    """Outils appelés au tour précédent (messages depuis le dernier message utilisateur)."""
+    names = set()
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            break
+        for call in message.get("tool_calls") or []:
+            names.add(call["function"]["name"])
+    return names
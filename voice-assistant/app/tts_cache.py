@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class TTSCache:
+    """
+    Cache des MP3 générés, adressé par le contenu (modèle, voix, texte).
+      • niveau mémoire : LRU borné en octets, réponse en quelques microsecondes ;
+      • niveau disque : un fichier par clé, borné en octets, éviction LRU
+        (l'heure de modification sert d'horodatage d'accès).
+    Les synthèses concurrentes d'une même clé sont coalescées.
+    """
+
+    def __init__(self, directory: str, memory_max_bytes: int, disk_max_bytes: int):
+        self.directory = directory
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._load_index()
+
+    @staticmethod
+    def key(model: str, voice: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{voice}\0{text}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def _load_index(self):
+        """Reconstruit l'index disque (du plus ancien au plus récent accès)."""
+        if self.disk_max_bytes <= 0:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".mp3"):
+                st = entry.stat()
+                entries.append((st.st_mtime, entry.name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.memory_max_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+
+    def _read_disk(self, key: str) -> bytes | None:
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            os.utime(self._path(key))
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, data: bytes):
+        tmp = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key))
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    async def get(self, key: str) -> bytes | None:
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return data
+        if key in self._disk:
+            data = await asyncio.to_thread(self._read_disk, key)
+            if data is not None:
+                self._disk.move_to_end(key)
+                self._remember(key, data)
+                self.disk_hits += 1
+                return data
+            # Fichier supprimé entre-temps
+            self._disk_bytes -= self._disk.pop(key)
+        return None
+
+    async def put(self, key: str, data: bytes):
+        self._remember(key, data)
+        if self.disk_max_bytes <= 0 or len(data) > self.disk_max_bytes:
+            return
+        try:
+            await asyncio.to_thread(self._write_disk, key, data)
+        except OSError as e:
+            logger.warning("Cache TTS : écriture disque impossible : %s", e)
+            return
+        self._disk_bytes += len(data) - self._disk.pop(key, 0)
+        self._disk[key] = len(data)
+        self._evict_disk()
+
+    async def get_or_synthesize(self, model: str, voice: str, text: str, synthesize) -> bytes:
+        key = self.key(model, voice, text)
+        data = await self.get(key)
+        if data is not None:
+            return data
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            data = await synthesize()
+        except BaseException as e:
+            future.set_exception(RuntimeError("TTS synthesis failed") if isinstance(e, asyncio.CancelledError) else e)
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(data)
+        await self.put(key, data)
+        return data
+
+    def stats(self) -> dict:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+
+tts_cache = TTSCache(
+    directory=os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "alto-tts-cache")),
+    memory_max_bytes=int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(16 * 1024 * 1024))),
+    disk_max_bytes=int(os.getenv("TTS_CACHE_DISK_BYTES", str(256 * 1024 * 1024))),
+)
@@ -0,0 +1,72 @@
+import json
+import os
+
+# Taille maximale d'un corps de requête (uploads audio compris)
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+
+class UploadLimitMiddleware:
+    """
+    Middleware ASGI : refuse en 413 tout corps de requête plus gros que la
+    limite de son chemin (`limits`, sinon `max_bytes`). Un Content-Length
+    trop grand est refusé sans rien lire ; sinon le corps est compté au fil
+    de la réception et la lecture s'arrête dès que la limite est franchie,
+    sans attendre la fin de l'envoi ni le spouler sur disque.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES, limits: dict[str, int] | None = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.limits = limits or {}
+
+    async def _reject(self, send, limit: int):
+        body = json.dumps({"error": f"Upload too large (max {limit} bytes)."}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = self.limits.get(scope["path"], self.max_bytes)
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            return await self._reject(send, limit)
+
+        received = 0
+        exceeded = False
+        started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Pour l'application, le client est parti : elle abandonne la requête
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                # La réponse (erreur de lecture du formulaire…) est remplacée par le 413
+                return
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not started:
+            await self._reject(send, limit)
@@ -1,42 +1,61 @@
+import asyncio
 import os
-import httpx
-import tempfile
-from openai import AsyncOpenAI
-from datetime import datetime, timedelta
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
 import json
+import logging
+import time
+from typing import BinaryIO
 
-# Instanciation du client OpenAI (à placer au début de votre module utils.py)
-client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from app import geo, google_calendar
+from app.cache import ttl_cache
+from app.calendar_mirror import calendar_mirror
+from app.audio import AUDIO_PREPROCESS, preprocess_audio
+from app.clients import (
+    BRAVE_API_BASE, GOOGLE_MAPS_API_BASE, OPENWEATHER_API_BASE, get_http_client, openai_client
+)
+from app.intents import fold, intent_router
+from app.memory import ConversationStore, DEFAULT_SESSION
+from app.metrics import observe_tool, stage
+from app.session_store import create_backend
+from app.speculation import speculator
+from app.speech import LocalSTT, LocalTTS, OpenAISTT, OpenAITTS, SpeechRouter
+from app.tool_selection import ToolSelector, recent_tool_names
+from app.tts_cache import tts_cache
+
+logger = logging.getLogger(__name__)
+
+# Client OpenAI partagé (pool de connexions commun, voir app/clients.py)
+client = openai_client
 
 BRAVE_API_KEY = os.getenv("BRAVE_API_KEY")
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
-GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
-GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
-GOOGLE_REFRESH_TOKEN = os.getenv("GOOGLE_REFRESH_TOKEN")
 GOOGLE_DIRECTIONS_API_KEY = os.getenv("GOOGLE_DIRECTIONS_API_KEY")
 
-def _get_google_creds() -> Credentials:
-    return Credentials(
-        token=None,
-        refresh_token=GOOGLE_REFRESH_TOKEN,
-        client_id=GOOGLE_CLIENT_ID,
-        client_secret=GOOGLE_CLIENT_SECRET,
-        token_uri="https://oauth2.googleapis.com/token",
-    )
+# 🗃️ Caches des outils en lecture seule (TTL en secondes)
+search_cache = ttl_cache("search_web", float(os.getenv("SEARCH_CACHE_TTL", "900")), maxsize=512)
+weather_cache = ttl_cache("get_weather", float(os.getenv("WEATHER_CACHE_TTL", "600")))
+forecast_cache = ttl_cache("get_weather_forecast", float(os.getenv("FORECAST_CACHE_TTL", "1800")))
+
+
+def _cache_key(text: str) -> str:
+    return " ".join(text.casefold().split())
+
 
 # 🔍 Brave Search
 async def search_web(query: str) -> list[dict]:
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://api.search.brave.com/res/v1/web/search",
-            headers={
-                "Accept": "application/json",
-                "X-Subscription-Token": BRAVE_API_KEY
-            },
-            params={"q": query, "count": 3}
-        )
+    return await search_cache.get_or_fetch(_cache_key(query), lambda: _fetch_search(query))
+
+async def _fetch_search(query: str) -> list[dict]:
+    resp = await get_http_client().get(
+        f"{BRAVE_API_BASE}/res/v1/web/search",
+        headers={
+            "Accept": "application/json",
+            "X-Subscription-Token": BRAVE_API_KEY
+        },
+        params={"q": query, "count": 3}
+    )
     if resp.status_code != 200:
         raise RuntimeError("Brave Search API error")
     data = resp.json().get("web", {}).get("results", [])
@@ -47,51 +66,63 @@ async def search_web(query: str) -> list[dict]:
     ]
 
 # 🌦️ Météo
-async def get_weather(city: str) -> dict:
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://api.openweathermap.org/data/2.5/weather",
-            params={
-                "q": city,
-                "appid": OPENWEATHER_API_KEY,
-                "lang": "fr",
-                "units": "metric"
-            }
-        )
+def _weather_query(city: str | None, lat: float | None, lng: float | None) -> tuple[str, dict]:
+    """
+    Clé de cache et paramètres OpenWeather : par nom de ville, ou à défaut
+    par position, arrondie au centre de sa tuile geohash (voir app/geo.py)
+    pour que les demandes voisines partagent la même entrée.
+    """
+    if city:
+        return _cache_key(city), {"q": city}
+    if lat is None or lng is None:
+        raise ValueError("Ville ou position nécessaire pour la météo.")
+    tile, (tile_lat, tile_lng) = geo.snap(lat, lng, geo.WEATHER_TILE_PRECISION)
+    return f"@{tile}", {"lat": round(tile_lat, 5), "lon": round(tile_lng, 5)}
+
+async def get_weather(city: str = None, lat: float = None, lng: float = None) -> dict:
+    key, query = _weather_query(city, lat, lng)
+    return await weather_cache.get_or_fetch(key, lambda: _fetch_weather(query))
+
+async def _fetch_weather(query: dict) -> dict:
+    resp = await get_http_client().get(
+        f"{OPENWEATHER_API_BASE}/data/2.5/weather",
+        params={
+            **query,
+            "appid": OPENWEATHER_API_KEY,
+            "lang": "fr",
+            "units": "metric"
+        }
+    )
     if resp.status_code != 200:
         raise RuntimeError("OpenWeather API error")
     data = resp.json()
     return {
+        "location": data.get("name"),
         "description": data["weather"][0]["description"],
         "temperature": round(data["main"]["temp"]),
         "feels_like": round(data["main"]["feels_like"])
     }
 
 # 🔮 Prévisions météo (3 h / 5 jours)
-async def get_weather_forecast(city: str, days_ahead: int = 1) -> dict:
+async def get_weather_forecast(
+    city: str = None, days_ahead: int = 1, lat: float = None, lng: float = None
+) -> dict:
     """
     Utilise l'API 5-day/3-hour forecast d'OpenWeather.
     days_ahead = 1 → prévision la plus proche de maintenant + 24 h.
     Renvoie un dict avec date, heure, température, ressenti et description.
+    La série complète est mise en cache par ville (ou par tuile si la
+    position remplace la ville) : toute valeur de days_ahead est servie
+    par un seul appel amont.
     """
-    url = "https://api.openweathermap.org/data/2.5/forecast"
-    params = {
-        "q": city,
-        "appid": OPENWEATHER_API_KEY,
-        "lang": "fr",
-        "units": "metric"
-    }
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, params=params)
-    if resp.status_code != 200:
-        raise RuntimeError("OpenWeather forecast API error")
-    data = resp.json()
+    key, query = _weather_query(city, lat, lng)
+    entries = await forecast_cache.get_or_fetch(key, lambda: _fetch_forecast(query))
 
     # Calculer l'heure cible : maintenant + (days_ahead * 24 h)
     target_dt = datetime.utcnow() + timedelta(days=days_ahead)
     # Trouver l'entrée de forecast la plus proche de target_dt
     best = min(
-        data["list"],
+        entries,
         key=lambda e: abs(
             datetime.fromisoformat(e["dt_txt"]) - target_dt
         )
@@ -104,10 +135,30 @@ async def get_weather_forecast(city: str, days_ahead: int = 1) -> dict:
         "description": best["weather"][0]["description"]
     }
 
-# 📅 Google Calendar
+async def _fetch_forecast(query: dict) -> list[dict]:
+    url = f"{OPENWEATHER_API_BASE}/data/2.5/forecast"
+    params = {
+        **query,
+        "appid": OPENWEATHER_API_KEY,
+        "lang": "fr",
+        "units": "metric"
+    }
+    resp = await get_http_client().get(url, params=params)
+    if resp.status_code != 200:
+        raise RuntimeError("OpenWeather forecast API error")
+    # On ne garde que les champs utiles de chaque pas de 3 h
+    return [
+        {
+            "dt_txt": e["dt_txt"],
+            "main": {"temp": e["main"]["temp"], "feels_like": e["main"]["feels_like"]},
+            "weather": [{"description": e["weather"][0]["description"]}]
+        }
+        for e in resp.json()["list"]
+    ]
+
+# 📅 Google Calendar (API REST asynchrone, jeton en cache : voir app/google_calendar.py)
+# Lectures servies par le miroir local tant qu'il est à jour (voir app/calendar_mirror.py)
 async def add_event_to_calendar(summary: str, start_time: str, duration_minutes: int = 60) -> dict:
-    creds = _get_google_creds()
-    service = build("calendar", "v3", credentials=creds)
     start_dt = datetime.fromisoformat(start_time)
     end_dt = start_dt + timedelta(minutes=duration_minutes)
     event_body = {
@@ -115,7 +166,10 @@ async def add_event_to_calendar(summary: str, start_time: str, duration_minutes:
         "start": {"dateTime": start_dt.isoformat(), "timeZone": "Europe/Brussels"},
         "end":   {"dateTime": end_dt.isoformat(),   "timeZone": "Europe/Brussels"},
     }
-    created = service.events().insert(calendarId="primary", body=event_body).execute()
+    created = await google_calendar.insert_event(event_body)
+    if calendar_mirror.enabled:
+        # Visible tout de suite dans le miroir, sans attendre la prochaine synchro
+        calendar_mirror.apply([created])
     return {
         "id": created.get("id"),
         "summary": summary,
@@ -123,77 +177,119 @@ async def add_event_to_calendar(summary: str, start_time: str, duration_minutes:
         "end": end_dt.isoformat()
     }
 
+async def _list_events(since: datetime, until: datetime = None, limit: int = None) -> list[dict]:
+    """Événements (titre éventuel, début) de la fenêtre, depuis le miroir s'il est à jour, sinon l'API."""
+    if calendar_mirror.fresh:
+        return calendar_mirror.between(
+            since.timestamp(), until.timestamp() if until else None, limit
+        )
+    calendar_mirror.api_reads += 1
+    params = {"timeMin": since.isoformat().replace("+00:00", "Z"), "singleEvents": True, "orderBy": "startTime"}
+    if until:
+        params["timeMax"] = until.isoformat().replace("+00:00", "Z")
+    if limit:
+        params["maxResults"] = limit
+    res = await google_calendar.list_events(**params)
+    return [
+        {"summary": ev.get("summary"), "start": ev["start"].get("dateTime", ev["start"].get("date"))}
+        for ev in res.get("items", [])
+    ]
+
 async def get_upcoming_events(max_results: int = 5) -> list[dict]:
-    creds = _get_google_creds()
-    service = build("calendar", "v3", credentials=creds)
-    now = datetime.utcnow().isoformat() + "Z"
-    res = service.events().list(
-        calendarId="primary",
-        timeMin=now,
-        maxResults=max_results,
-        singleEvents=True,
-        orderBy="startTime"
-    ).execute()
-    events = res.get("items", [])
+    events = await _list_events(datetime.now(timezone.utc), limit=max_results)
     return [
-        {
-          "summary": ev.get("summary", "(Sans titre)"),
-          "start": ev["start"].get("dateTime", ev["start"].get("date"))
-        }
+        {"summary": ev["summary"] or "(Sans titre)", "start": ev["start"]}
         for ev in events
     ]
 
 async def get_today_events() -> list[dict]:
-    creds = _get_google_creds()
-    service = build("calendar", "v3", credentials=creds)
-    now = datetime.utcnow().isoformat() + "Z"
-    end = (datetime.utcnow() + timedelta(hours=24)).isoformat() + "Z"
-    res = service.events().list(
-        calendarId="primary",
-        timeMin=now,
-        timeMax=end,
-        singleEvents=True,
-        orderBy="startTime"
-    ).execute()
-    items = res.get("items", [])
+    now = datetime.now(timezone.utc)
+    events = await _list_events(now, now + timedelta(hours=24))
     return [
-        {
-          "summary": ev.get("summary", "Sans titre"),
-          "start": ev["start"].get("dateTime", ev["start"].get("date"))
-        }
-        for ev in items
+        {"summary": ev["summary"] or "Sans titre", "start": ev["start"]}
+        for ev in events
     ]
 
 # 🗺️ Google Maps Directions
+# Résumés de trajet par (tuile d'origine, destination, mode), avec un TTL par
+# mode. En voiture et en transports en commun, la durée dépend du trafic et
+# des horaires, qui changent en quelques minutes. À pied, elle ne dépend que
+# de l'itinéraire : le résumé reste valable une heure.
+ROUTE_CACHE_TTL = {
+    "driving": float(os.getenv("ROUTE_CACHE_TTL_DRIVING", "300")),
+    "transit": float(os.getenv("ROUTE_CACHE_TTL_TRANSIT", "300")),
+    "walking": float(os.getenv("ROUTE_CACHE_TTL_WALKING", "3600")),
+}
+route_cache = ttl_cache("get_directions", max(ROUTE_CACHE_TTL.values()), maxsize=1024)
+
 async def get_directions_from_coords(
     lat: float, lng: float, destination: str, mode: str = "walking"
 ) -> dict:
-    origin = f"{lat},{lng}"
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://maps.googleapis.com/maps/api/directions/json",
-            params={
-                "origin": origin,
-                "destination": destination,
-                "mode": mode,
-                "language": "fr",
-                "key": GOOGLE_DIRECTIONS_API_KEY
-            }
-        )
-    data = resp.json()
-    if data.get("status") != "OK" or not data.get("routes"):
-        raise RuntimeError("Google Directions API error")
-    leg = data["routes"][0]["legs"][0]
+    """
+    L'origine est arrondie au centre de sa tuile geohash : deux demandes
+    voisines (même rue, ou la même personne une minute plus tard) partagent
+    le résumé du trajet. Une destination déjà résolue dans la région est
+    désignée par son place_id, quelle que soit sa formulation.
+    """
+    if lat is None or lng is None:
+        raise ValueError("Position inconnue : itinéraire impossible.")
+    tile, origin = geo.snap(lat, lng, geo.ROUTE_TILE_PRECISION)
+    place = geo.known_place(destination, lat, lng)
+    target = place["place_id"] if place else geo.destination_key(destination)
+    route = await route_cache.get_or_fetch(
+        (tile, target, mode),
+        lambda: _fetch_route(origin, destination, place, mode, lat, lng),
+        ttl=ROUTE_CACHE_TTL.get(mode),
+    )
+    if place is None and route["place_id"]:
+        # Destination résolue à l'instant : les autres formulations retrouvent ce trajet
+        route_cache.set((tile, route["place_id"], mode), route, ROUTE_CACHE_TTL.get(mode))
+    # Le lien Google Maps garde la position exacte : c'est lui qui guide l'utilisateur
     maps_url = (
         f"https://www.google.com/maps/dir/?api=1"
-        f"&origin={origin}&destination={destination.replace(' ', '+')}"
+        f"&origin={lat},{lng}&destination={destination.replace(' ', '+')}"
         f"&travelmode={mode}"
     )
+    if route["place_id"]:
+        maps_url += f"&destination_place_id={route['place_id']}"
+    return {
+        "end_address": route["end_address"],
+        "duration": route["duration"],
+        "distance": route["distance"],
+        "maps_url": maps_url
+    }
+
+async def _fetch_route(
+    origin: tuple[float, float], destination: str, place: dict | None, mode: str, lat: float, lng: float
+) -> dict:
+    resp = await get_http_client().get(
+        f"{GOOGLE_MAPS_API_BASE}/maps/api/directions/json",
+        params={
+            "origin": f"{origin[0]:.6f},{origin[1]:.6f}",
+            "destination": f"place_id:{place['place_id']}" if place else destination,
+            "mode": mode,
+            "language": "fr",
+            "key": GOOGLE_DIRECTIONS_API_KEY
+        }
+    )
+    data = resp.json()
+    if data.get("status") != "OK" or not data.get("routes"):
+        raise RuntimeError("Google Directions API error")
+    leg = data["routes"][0]["legs"][0]
+    # Le dernier point géocodé est la destination : sa résolution sert aux demandes suivantes
+    waypoints = data.get("geocoded_waypoints") or [{}]
+    place_id = place["place_id"] if place else waypoints[-1].get("place_id")
+    if place is None and place_id:
+        geo.remember_place(destination, lat, lng, {
+            "place_id": place_id,
+            "address": leg["end_address"],
+            "location": leg.get("end_location"),
+        })
     return {
         "end_address": leg["end_address"],
         "duration": leg["duration"]["text"],
         "distance": leg["distance"]["text"],
-        "maps_url": maps_url
+        "place_id": place_id,
     }
 
 # 📨 Préparation d’envoi de SMS
@@ -258,16 +354,19 @@ search_web_function = {
 
 weather_function = {
     "name": "get_weather",
-    "description": "Récupère la météo actuelle pour une ville et renvoie description, température et ressenti.",
+    "description": (
+        "Récupère la météo actuelle pour une ville et renvoie description, température et ressenti. "
+        "Sans ville, donne la météo à la position actuelle de l'utilisateur."
+    ),
     "parameters": {
         "type": "object",
         "properties": {
             "city": {
                 "type": "string",
-                "description": "Nom de la ville"
+                "description": "Nom de la ville (à omettre pour la position actuelle)"
             }
         },
-        "required": ["city"]
+        "required": []
     }
 }
 
@@ -275,14 +374,15 @@ forecast_function = {
     "name": "get_weather_forecast",
     "description": (
         "Donne la prévision météo pour une ville X jours à l'avance "
-        "en utilisant l'API OpenWeather 5 jours/3 heures."
+        "en utilisant l'API OpenWeather 5 jours/3 heures. "
+        "Sans ville, donne la prévision à la position actuelle de l'utilisateur."
     ),
     "parameters": {
         "type": "object",
         "properties": {
             "city": {
                 "type": "string",
-                "description": "Nom de la ville (ex: Paris)"
+                "description": "Nom de la ville (ex: Paris ; à omettre pour la position actuelle)"
             },
             "days_ahead": {
                 "type": "integer",
@@ -290,7 +390,7 @@ forecast_function = {
                 "default": 1
             }
         },
-        "required": ["city"]
+        "required": []
     }
 }
 
@@ -340,9 +440,9 @@ calendar_get_function = {
     "description": "Récupère tous les événements prévus aujourd'hui dans le calendrier Google.",
     "parameters": {
         "type": "object",
-        "properties": {}
-    },
-    "required": []
+        "properties": {},
+        "required": []
+    }
 }
 
 get_directions_function = {
@@ -464,197 +564,438 @@ read_local_calendar_function = {
 
 
 
-# 🧠 Mémoire de conversation (system prompt)
-conversation = [
-    {
-        "role": "system",
-        "content": (
-            "Tu es Alto, un assistant vocal local et autonome. "
-            "Ta mission est d'aider l'utilisateur, surtout les personnes peu à l'aise avec le numérique. "
-            "Tu expliques de façon claire, patiente et sans jargon.\n\n"
-            "CAPACITÉS  ▸  Transcription vocale, recherche web, météo, agenda Google, itinéraires Google Maps, "
-            "préparation d'envoi de SMS, preparation d'appel téléphonique, ouvrir l'appareil photo.\n\n"
-            "RÈGLES  ▸\n"
-            "1. Utilise toujours le *function calling* pour déclencher les fonctions prévues.\n"
-            "2. Quand l'utilisateur veut envoyer un SMS :\n"
-            "   • Appelle immédiatement la fonction **prepare_send_message** dès que tu connais le NOM du destinataire. "
-            "     Mets `message_content = \"\"` si l'utilisateur n'a encore rien dicté.\n"
-            "   • NE DEMANDE PAS le contenu du message avant de savoir qu'il existe exactement UN contact correspondant. "
-            "     S'il y a plusieurs homonymes, demande d'abord lequel choisir. "
-            "     S'il n'y en a aucun, informe-en l'utilisateur.\n"
-            "     Dès que l’utilisateur fournit le contenu du SMS :\n"
-            "   • Appelle de nouveau **prepare_send_message** avec **les deux** champs "
-            "     (nom + message_content). Ne demande pas de confirmation supplémentaire.\n"
-            "    Il faut qu'as ce moment tu aies le contenu du message avant de l'envoyer.\n"
-            "      Ne réponds jamais “Je ne peux pas envoyer le message moi-même” ; laisse le front faire l’envoi.\n"
-            "3. Après chaque appel de fonction, rédige la réponse finale en te basant sur les données renvoyées. \n"
-            "Si tu as besoin de plusieurs appels de fonction, fais-les dans l'ordre et rédige la réponse finale après le dernier appel.\n"
-            "4. Quand l'utilisateur veut passer un appel :\n"
-            "   • Appelle immédiatement la fonction **prepare_call_contact** dès que tu connais le NOM du destinataire.\n"
-            "   • NE DEMANDE PAS de confirmation avant de passer l'appel.\n"
-            "5. Quand l'utilisateur veut prendre une photo :\n"
-            "   • Appelle immédiatement la fonction **prepare_open_camera**.\n"
-            "   • NE DEMANDE PAS de confirmation avant d'ouvrir l'appareil photo.\n"
-            "6. Quand l'utilisateur veut ouvrir une application :\n"
-            "   • Appelle immédiatement la fonction **prepare_open_app** dès que tu connais le NOM de l'application.\n"
-            "7. Quand l'utilisateur veut connaitre son emploi du temps  :\n"
-            "   • Appelle immédiatement la fonction **read_local_calendar** dès que tu connais la période .\n"
-            "8. Quand l'utilisateur veut aller à un endroit :\n"
-            "   • Appelle immédiatement la fonction **get_directions** dès que tu connais la destination.\n"
-            "   Si il te manque une donnée, comme le mode de transport, demande-la à l'utilisateur.\n"
-            "   • NE DEMANDE PAS de confirmation avant d'ouvrir Google Maps.\n"
-            "9. Quand l'utilisateur veut savoir la météo :\n"
-            "   Il faut que tu dises explicitement degrés et pas °.\n"
-        )
-    }
+# 🧠 Prompt système
+system_message = {
+    "role": "system",
+    "content": (
+        "Tu es Alto, un assistant vocal local et autonome. "
+        "Ta mission est d'aider l'utilisateur, surtout les personnes peu à l'aise avec le numérique. "
+        "Tu expliques de façon claire, patiente et sans jargon.\n\n"
+        "CAPACITÉS  ▸  Transcription vocale, recherche web, météo, agenda Google, itinéraires Google Maps, "
+        "préparation d'envoi de SMS, preparation d'appel téléphonique, ouvrir l'appareil photo.\n\n"
+        "RÈGLES  ▸\n"
+        "1. Utilise toujours le *function calling* pour déclencher les fonctions prévues.\n"
+        "2. Quand l'utilisateur veut envoyer un SMS :\n"
+        "   • Appelle immédiatement la fonction **prepare_send_message** dès que tu connais le NOM du destinataire. "
+        "     Mets `message_content = \"\"` si l'utilisateur n'a encore rien dicté.\n"
+        "   • NE DEMANDE PAS le contenu du message avant de savoir qu'il existe exactement UN contact correspondant. "
+        "     S'il y a plusieurs homonymes, demande d'abord lequel choisir. "
+        "     S'il n'y en a aucun, informe-en l'utilisateur.\n"
+        "     Dès que l’utilisateur fournit le contenu du SMS :\n"
+        "   • Appelle de nouveau **prepare_send_message** avec **les deux** champs "
+        "     (nom + message_content). Ne demande pas de confirmation supplémentaire.\n"
+        "    Il faut qu'as ce moment tu aies le contenu du message avant de l'envoyer.\n"
+        "      Ne réponds jamais “Je ne peux pas envoyer le message moi-même” ; laisse le front faire l’envoi.\n"
+        "3. Après chaque appel de fonction, rédige la réponse finale en te basant sur les données renvoyées. \n"
+        "Si tu as besoin de plusieurs appels de fonction, fais-les dans l'ordre et rédige la réponse finale après le dernier appel.\n"
+        "4. Quand l'utilisateur veut passer un appel :\n"
+        "   • Appelle immédiatement la fonction **prepare_call_contact** dès que tu connais le NOM du destinataire.\n"
+        "   • NE DEMANDE PAS de confirmation avant de passer l'appel.\n"
+        "5. Quand l'utilisateur veut prendre une photo :\n"
+        "   • Appelle immédiatement la fonction **prepare_open_camera**.\n"
+        "   • NE DEMANDE PAS de confirmation avant d'ouvrir l'appareil photo.\n"
+        "6. Quand l'utilisateur veut ouvrir une application :\n"
+        "   • Appelle immédiatement la fonction **prepare_open_app** dès que tu connais le NOM de l'application.\n"
+        "7. Quand l'utilisateur veut connaitre son emploi du temps  :\n"
+        "   • Appelle immédiatement la fonction **read_local_calendar** dès que tu connais la période .\n"
+        "8. Quand l'utilisateur veut aller à un endroit :\n"
+        "   • Appelle immédiatement la fonction **get_directions** dès que tu connais la destination.\n"
+        "   Si il te manque une donnée, comme le mode de transport, demande-la à l'utilisateur.\n"
+        "   • NE DEMANDE PAS de confirmation avant d'ouvrir Google Maps.\n"
+        "9. Quand l'utilisateur veut savoir la météo :\n"
+        "   • Sans ville précisée, appelle la fonction sans `city` : la position de l'utilisateur est utilisée.\n"
+        "   Il faut que tu dises explicitement degrés et pas °.\n"
+    )
+}
+
+# 🧠 Mémoire de conversation, par session et bornée
+# SESSION_BACKEND : memory:// (défaut), sqlite://sessions.db ou redis://hôte:6379/0
+# (SQLite ou Redis dès que l'API tourne avec plusieurs workers uvicorn).
+# SQLite : deux barres pour un chemin relatif au répertoire de lancement
+# (sqlite://sessions.db), trois pour un chemin absolu (sqlite:///var/lib/alto/sessions.db)
+conversation_store = ConversationStore(
+    system_message,
+    backend=create_backend(
+        os.getenv("SESSION_BACKEND", "memory://"),
+        idle_ttl=float(os.getenv("SESSION_IDLE_TTL", "1800")),
+        max_sessions=int(os.getenv("MAX_SESSIONS", "1000")),
+        max_bytes=int(os.getenv("CONVERSATION_MAX_BYTES", "50000000")),
+    ),
+    max_tokens=int(os.getenv("CONVERSATION_MAX_TOKENS", "3000")),
+    function_result_max_chars=int(os.getenv("FUNCTION_RESULT_MAX_CHARS", "500")),
+)
+
+
+# 🧰 Fonctions exposées à GPT (ordre fixe)
+functions = [
+    search_web_function,
+    weather_function,
+    calendar_add_function,
+    calendar_read_function,
+    calendar_get_function,
+    get_directions_function,
+    prepare_send_message_function,
+    forecast_function,
+    prepare_call_contact_function,
+    prepare_open_camera_function,
+    open_app_function,
+    read_local_calendar_function
 ]
+tools = [{"type": "function", "function": f} for f in functions]
+tools_by_name = {tool["function"]["name"]: tool for tool in tools}
+tool_selector = ToolSelector([f["name"] for f in functions])
 
+# Nombre maximal de tours d'appels d'outils avant une réponse forcée
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "3"))
 
-# 💬 Dialogue principal
-async def ask_gpt(prompt: str, lat: float = None, lng: float = None) -> dict:
-    # 1) On ajoute l'input utilisateur
-    conversation.append({"role": "user", "content": prompt})
+FALLBACK_ANSWER = "Désolé, je n'ai pas de réponse."
+NO_SPEECH_ANSWER = "Je n'ai rien entendu. Pouvez-vous répéter ?"
+# Réponse de délestage (surcharge) : toujours servie depuis le cache TTS
+BUSY_ANSWER = "Je suis un peu débordée, réessayez dans un instant."
 
-    response_data = {"text_to_speak": None, "action": None}
 
-    # 2) Premier appel GPT avec Function Calling
-    tools = [
-        search_web_function,
-        weather_function,
-        calendar_add_function,
-        calendar_read_function,
-        calendar_get_function,
-        get_directions_function,
-        prepare_send_message_function,
-        forecast_function,
-        prepare_call_contact_function,
-        prepare_open_camera_function,
-        open_app_function,
-        read_local_calendar_function
-    ]
+def _available_functions(lat: float = None, lng: float = None) -> dict:
+    """Mapping nom → fonction async, avec la position du téléphone injectée."""
+    return {
+        "search_web": search_web,
+        "get_weather": lambda **kw: get_weather(lat=lat, lng=lng, **kw),
+        "get_weather_forecast": lambda **kw: get_weather_forecast(lat=lat, lng=lng, **kw),
+        "add_event_to_calendar": add_event_to_calendar,
+        "get_upcoming_events": get_upcoming_events,
+        "get_today_events": get_today_events,
+        "get_directions": lambda **kw: get_directions_from_coords(lat, lng, **kw),
+        "prepare_send_message": prepare_send_message,
+        "prepare_call_contact": prepare_call_contact,
+        "prepare_open_camera": prepare_open_camera,
+        "prepare_open_app": prepare_open_app,
+        "read_local_calendar": read_local_calendar
+    }
+
+
+def _action_for(name: str, result: dict) -> dict | None:
+    """Traduit le résultat d'une fonction en action exécutée par le front."""
+    if name == "get_directions":
+        return {"type": "maps", "data": {"maps_url": result["maps_url"]}}
+    action_types = {
+        "prepare_send_message": "send_message",
+        "prepare_call_contact": "make_call",
+        "prepare_open_camera": "open_camera",
+        "prepare_open_app": "open_app",
+        "read_local_calendar": "read_calendar",
+    }
+    if name in action_types:
+        return {"type": action_types[name], "data": result}
+    return None
+
 
-    first = await client.chat.completions.create(
-        model="gpt-4o",
-        messages=conversation,
-        functions=tools,
-        function_call="auto"
+def _directions_answer(args: dict) -> str:
+    # Récupération du mode (driving, walking, transit)
+    mode = args.get("mode", "driving")
+    fr_modes = {
+        "driving": "en voiture",
+        "walking": "à pied",
+        "transit": "en transport en commun"
+    }
+    mode_text = fr_modes.get(mode, "en voiture")
+    return (
+        f"L'itinéraire {mode_text} vers votre destination est prêt. "
+        "J'ouvre Google Maps pour vous."
     )
-    msg = first.choices[0].message
-
-    # 3) Si GPT a déclenché un appel de fonction
-    if msg.function_call:
-        name = msg.function_call.name
-        args = json.loads(msg.function_call.arguments)
-
-        # Mapping des fonctions disponibles
-        available = {
-            "search_web": search_web,
-            "get_weather": get_weather,
-            "get_weather_forecast": get_weather_forecast,
-            "add_event_to_calendar": add_event_to_calendar,
-            "get_upcoming_events": get_upcoming_events,
-            "get_today_events": get_today_events,
-            "get_directions": lambda **kw: get_directions_from_coords(lat, lng, **kw),
-            "prepare_send_message": prepare_send_message,
-            "prepare_call_contact": prepare_call_contact,
-            "prepare_open_camera": prepare_open_camera,
-            "prepare_open_app": prepare_open_app,
-            "read_local_calendar": read_local_calendar
-        }
 
-        # Exécution de la fonction
-        result = await available[name](**args)
 
-        # 4) Réinjecter d'abord le message assistant (avec function_call)
-        conversation.append({
-            "role": "assistant",
-            "content": msg.content,
-            "function_call": {
-                "name": name,
-                "arguments": msg.function_call.arguments
-            }
-        })
+OPEN_CAMERA_ANSWER = "J'ouvre l'appareil photo."
 
-        # 5) Puis injecter la réponse de la fonction avec role "function"
-        conversation.append({
-            "role": "function",
-            "name": name,
-            "content": json.dumps(result)
-        })
+# Outils dont la réponse parlée est un simple gabarit : le front exécute l'action
+DIRECT_RESPONSES = {
+    "get_directions": lambda args, result: _directions_answer(args),
+    "prepare_open_camera": lambda args, result: OPEN_CAMERA_ANSWER,
+    "prepare_open_app": lambda args, result: f"J'ouvre {result['app_name']}.",
+    "prepare_call_contact": lambda args, result: f"J'appelle {result['recipient_name']}.",
+    "read_local_calendar": lambda args, result: f"Je regarde votre agenda pour {result['period']}.",
+}
 
-        # 6) Deuxième appel GPT pour formuler la réponse finale
-        second = await client.chat.completions.create(
-            model="gpt-4o",
-            messages=conversation
-        )
-        answer_msg = second.choices[0].message
-        raw = answer_msg.content.strip()
-        answer = raw
-
-        # Spécialisation pour les itinéraires Google Maps
-        if name == "get_directions":
-            # Récupération du mode (driving, walking, transit)
-            mode = args.get("mode", "driving")
-            fr_modes = {
-                "driving": "en voiture",
-                "walking": "à pied",
-                "transit": "en transport en commun"
-            }
-            mode_text = fr_modes.get(mode, "en voiture")
 
-            dur = result["duration"]
-            dist = result["distance"]
-            dest = result["end_address"]
+# ✂️ Découpage en phrases pour la synthèse incrémentale
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
 
-            answer = (
-                f"L'itinéraire {mode_text} vers votre destination est prêt. "
-                "J'ouvre Google Maps pour vous."
-            )
 
-        # 7) On met à jour ce que l'assistant dira
-        response_data["text_to_speak"] = answer
+class SentenceSplitter:
+    """
+    Accumule les morceaux de texte streamés par GPT et renvoie les phrases
+    complètes dès qu'elles sont terminées. Les phrases trop courtes sont
+    regroupées avec la suivante pour éviter des appels TTS minuscules.
+    """
 
-        # 8) Extraction de l’action
-        if name == "get_directions":
-            response_data["action"] = {
-                "type": "maps",
-                "data": {"maps_url": result["maps_url"]}
-            }
-        elif name == "prepare_send_message":
-            response_data["action"] = {
-                "type": "send_message",
-                "data": result
-            }
-        elif name == "prepare_call_contact":
-            response_data["action"] = {
-                "type": "make_call",
-                "data": result
-            }
-        elif name == "prepare_open_camera":
-            response_data["action"] = {
-                "type": "open_camera",
-                "data": result
-            }
-        elif name == "prepare_open_app":
-            response_data["action"] = {
-                "type": "open_app",
-                "data": result
+    def __init__(self, min_chars: int = 20):
+        self.min_chars = min_chars
+        self.buffer = ""
+
+    def feed(self, delta: str) -> list[str]:
+        self.buffer += delta
+        parts = _SENTENCE_END.split(self.buffer)
+        # Le dernier morceau n'est pas encore terminé
+        self.buffer = parts.pop()
+        sentences, pending = [], ""
+        for part in parts:
+            pending = f"{pending} {part}".strip()
+            if len(pending) >= self.min_chars:
+                sentences.append(pending)
+                pending = ""
+        if pending:
+            # Le séparateur consommé par le découpage est gardé : la suite arrive peut-être au prochain morceau
+            self.buffer = f"{pending} {self.buffer}"
+        return sentences
+
+    def flush(self) -> str | None:
+        rest, self.buffer = self.buffer.strip(), ""
+        return rest or None
+
+
+async def _stream_answer(stream, splitter: SentenceSplitter, state: dict):
+    """
+    Consomme un stream chat.completions : relaie le texte phrase par phrase
+    et accumule les éventuels tool_calls (par index) dans `state`.
+    """
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        for tc in delta.tool_calls or []:
+            call = state["tool_calls"].setdefault(tc.index, {"id": "", "name": "", "arguments": ""})
+            if tc.id:
+                call["id"] = tc.id
+            if tc.function and tc.function.name:
+                call["name"] = tc.function.name
+            if tc.function and tc.function.arguments:
+                call["arguments"] += tc.function.arguments
+        if delta.content:
+            state["content"] += delta.content
+            for sentence in splitter.feed(delta.content):
+                yield sentence
+
+
+async def _run_tool(call: dict, available: dict, speculation=None):
+    """
+    Exécute un appel d'outil ; une erreur est renvoyée à GPT au lieu d'interrompre le tour.
+    Un appel identique déjà lancé par spéculation est simplement attendu.
+    """
+    start = time.perf_counter()
+    try:
+        args = json.loads(call["arguments"] or "{}")
+        prefetched = speculation.take(call["name"], args) if speculation else None
+        result = await (prefetched if prefetched is not None else available[call["name"]](**args))
+    except Exception as e:
+        observe_tool(call["name"], time.perf_counter() - start, ok=False)
+        logger.warning("Erreur outil %s : %s", call["name"], e)
+        return {}, {"error": str(e)}
+    observe_tool(call["name"], time.perf_counter() - start, ok=True)
+    return args, result
+
+
+def _tool_messages(content: str, calls: list[dict], outcomes: list) -> list[dict]:
+    """Message assistant porteur des tool_calls, suivi d'un message "tool" par résultat."""
+    return [{
+        "role": "assistant",
+        "content": content or None,
+        "tool_calls": [
+            {
+                "id": call["id"],
+                "type": "function",
+                "function": {"name": call["name"], "arguments": call["arguments"]}
             }
-        elif name == "read_local_calendar":
-            response_data["action"] = {
-                "type": "read_calendar",
-                "data": result
+            for call in calls
+        ]
+    }] + [
+        {
+            "role": "tool",
+            "tool_call_id": call["id"],
+            "content": json.dumps(result)
+        }
+        for call, (_, result) in zip(calls, outcomes)
+    ]
+
+
+# ⚡ Réponses locales du routeur d'intentions (outils sans second appel GPT)
+def _weather_answer(args: dict, result: dict) -> str:
+    place = args.get("city") or result.get("location")
+    where = f"À {place}" if place else "Ici"
+    return (
+        f"{where}, il fait {result['temperature']} degrés, {result['description']}. "
+        f"La température ressentie est de {result['feels_like']} degrés."
+    )
+
+def _forecast_answer(args: dict, result: dict) -> str:
+    days = args.get("days_ahead", 1)
+    when = "Demain" if days == 1 else f"Dans {days} jours"
+    where = f" à {args['city']}" if args.get("city") else ""
+    return (
+        f"{when}{where}, il fera {result['temp']} degrés, {result['description']}. "
+        f"La température ressentie sera de {result['feels_like']} degrés."
+    )
+
+ROUTER_RESPONSES = {
+    **DIRECT_RESPONSES,
+    "get_weather": _weather_answer,
+    "get_weather_forecast": _forecast_answer,
+}
+
+
+async def _route_locally(prompt: str, available: dict) -> tuple[list[dict], str, dict | None] | None:
+    """
+    Tente de traiter la transcription sans GPT via le routeur d'intentions.
+    Renvoie (messages d'outil, texte à dire, action) ou None pour retomber sur GPT.
+    """
+    match = intent_router.route(prompt)
+    if match is None:
+        return None
+    call = {
+        "id": f"call_local_{uuid.uuid4().hex[:16]}",
+        "name": match.tool,
+        "arguments": json.dumps(match.args, ensure_ascii=False)
+    }
+    args, result = await _run_tool(call, available)
+    if "error" in result:
+        intent_router.tool_errors += 1
+        return None
+    answer = ROUTER_RESPONSES[match.tool](args, result)
+    return _tool_messages("", [call], [(args, result)]), answer, _action_for(match.tool, result)
+
+
+# 💬 Dialogue principal (streaming)
+async def ask_gpt_stream(
+    prompt: str, lat: float = None, lng: float = None,
+    session_id: str = DEFAULT_SESSION
+):
+    """
+    Version streamée de `ask_gpt` : produit des événements
+      {"type": "sentence", "text": ...}  dès qu'une phrase est complète,
+      {"type": "done", "text_to_speak": ..., "action": ...} à la fin.
+    Les tours d'une même session sont sérialisés.
+    """
+    async with conversation_store.lock(session_id):
+        async for event in _dialogue(prompt, lat, lng, session_id):
+            yield event
+
+
+async def _dialogue(prompt: str, lat: float, lng: float, session_id: str):
+    # Aucune parole détectée : inutile de solliciter GPT ni l'historique
+    if not prompt.strip():
+        yield {"type": "sentence", "text": NO_SPEECH_ANSWER}
+        yield {"type": "done", "text_to_speak": NO_SPEECH_ANSWER, "action": None}
+        return
+
+    # 1) Historique de la session + input utilisateur
+    conversation = await conversation_store.history(session_id)
+    turn = [{"role": "user", "content": prompt}]
+    conversation.extend(turn)
+
+    available = _available_functions(lat, lng)
+
+    # Commandes courtes et formulaïques : réponse locale, sans GPT
+    local = await _route_locally(prompt, available)
+    if local is not None:
+        tool_messages, answer, action = local
+        turn.extend(tool_messages)
+        turn.append({"role": "assistant", "content": answer})
+        await conversation_store.commit(session_id, turn)
+        yield {"type": "sentence", "text": answer}
+        yield {"type": "done", "text_to_speak": answer, "action": action}
+        return
+
+    # Seuls les schémas utiles à ce tour sont envoyés (préfixe stable en tête)
+    turn_tools = [
+        tools_by_name[name]
+        for name in tool_selector.select(prompt, recent_tool_names(conversation[:-1]))
+    ]
+
+    # Outils en lecture seule probables : lancés pendant le premier appel GPT
+    speculation = speculator.start(prompt, available, [t["function"]["name"] for t in turn_tools])
+
+    splitter = SentenceSplitter()
+    spoken, action = [], None
+
+    try:
+        for round_index in range(MAX_TOOL_ROUNDS + 1):
+            # 2) Appel GPT en streaming ; le dernier tour n'offre plus d'outils
+            state = {"content": "", "tool_calls": {}}
+            options = {} if round_index == MAX_TOOL_ROUNDS else {
+                "tools": turn_tools,
+                "tool_choice": "auto",
+                "parallel_tool_calls": True
             }
+            with stage(f"llm_{round_index + 1}"):
+                stream = await client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=conversation,
+                    stream=True,
+                    **options
+                )
+                async for sentence in _stream_answer(stream, splitter, state):
+                    yield {"type": "sentence", "text": sentence}
+            if state["tool_calls"]:
+                # Le texte d'avant les outils est clos : la suite vient d'un autre appel,
+                # sans espace entre les deux (« …pour vous.Il fait… »)
+                rest = splitter.flush()
+                if rest:
+                    yield {"type": "sentence", "text": rest}
+            if state["content"].strip():
+                spoken.append(state["content"].strip())
+
+            # 3) Pas d'appel d'outil : la réponse est complète
+            if not state["tool_calls"]:
+                break
+
+            # 4) Tous les outils demandés s'exécutent en parallèle
+            calls = [state["tool_calls"][i] for i in sorted(state["tool_calls"])]
+            outcomes = await asyncio.gather(*(_run_tool(call, available, speculation) for call in calls))
+
+            # 5) Réinjecter le message assistant (tool_calls) puis un message "tool" par résultat
+            tool_messages = _tool_messages(state["content"], calls, outcomes)
+            turn.extend(tool_messages)
+            conversation.extend(tool_messages)
+
+            # 6) Extraction de l’action (la première action du tour est retenue)
+            for call, (args, result) in zip(calls, outcomes):
+                if action is None and "error" not in result:
+                    action = _action_for(call["name"], result)
 
-        # 9) On ajoute enfin la réponse à la conversation
-        conversation.append({"role": "assistant", "content": answer})
+            # 7) Outils « à réponse directe » : le texte vient d'un gabarit,
+            #    sans second appel GPT (le tour reste enregistré dans l'historique)
+            direct = [
+                DIRECT_RESPONSES[call["name"]](args, result)
+                for call, (args, result) in zip(calls, outcomes)
+                if call["name"] in DIRECT_RESPONSES and "error" not in result
+            ]
+            if len(direct) == len(calls):
+                for text in direct:
+                    spoken.append(text)
+                    yield {"type": "sentence", "text": text}
+                break
 
-    else:
-        # Pas d'appel de fonction : GPT répond directement
-        answer = msg.content.strip()
-        response_data["text_to_speak"] = answer
-        conversation.append({"role": "assistant", "content": answer})
+        rest = splitter.flush()
+        if rest:
+            yield {"type": "sentence", "text": rest}
+    finally:
+        # Même si GPT ou un outil échoue : les préchargements du tour sont libérés
+        speculation.discard()
 
+    # 8) On ajoute enfin la réponse et on enregistre le tour complet
+    answer = " ".join(spoken)
+    turn.append({"role": "assistant", "content": answer})
+    await conversation_store.commit(session_id, turn)
+
+    yield {"type": "done", "text_to_speak": answer or None, "action": action}
+
+
+async def ask_gpt(
+    prompt: str, lat: float = None, lng: float = None,
+    session_id: str = DEFAULT_SESSION
+) -> dict:
+    response_data = {"text_to_speak": None, "action": None}
+    async for event in ask_gpt_stream(prompt, lat=lat, lng=lng, session_id=session_id):
+        if event["type"] == "done":
+            response_data["text_to_speak"] = event["text_to_speak"]
+            response_data["action"] = event["action"]
     return response_data
 
 
@@ -662,30 +1003,147 @@ async def ask_gpt(prompt: str, lat: float = None, lng: float = None) -> dict:
 
 
 # 🎤 Transcription
-async def transcribe_audio(audio_path: str) -> str:
+# Morceaux d'un long enregistrement transcrits en même temps, par requête
+STT_CHUNK_PARALLELISM = int(os.getenv("STT_CHUNK_PARALLELISM", "8"))
+# Recollage : mots examinés de part et d'autre d'une coupure, et écart toléré
+STITCH_WINDOW_WORDS = 12
+STITCH_SLACK_WORDS = 2
+
+async def transcribe_audio(
+    audio: bytes | BinaryIO, filename: str = "audio.wav", preprocess: bool = True,
+    duration: float | None = None, stt_slots: asyncio.Semaphore | None = None
+) -> str:
     """
-    Envoie le fichier audio à Whisper et renvoie la transcription textuelle.
+    Transcrit l'audio (Whisper via l'API, ou modèle local selon le routage)
+    et renvoie le texte.
+    `audio` est soit des octets, soit un flux binaire (ex. le fichier de
+    l'upload) : le prétraitement le lit entièrement pour le décoder ; sans
+    prétraitement, il est transmis tel quel à l'API.
+    Le nom de fichier sert uniquement à indiquer le format à Whisper.
+    `preprocess=False` pour un audio déjà en mono 16 kHz sans silences
+    (segments de la session WebSocket), dont l'appelant donne la `duration`.
+    `stt_slots` : sémaphore partagé par plusieurs transcriptions (un lot),
+    qui borne leurs appels STT simultanés, morceaux compris.
+    Renvoie une chaîne vide si aucune parole n'est détectée.
     """
-    # Ouverture en mode binaire
-    with open(audio_path, "rb") as f:
-        resp = await client.audio.transcriptions.create(
-            model="whisper-1",
-            file=f
-        )
-    return resp.text
+    if preprocess and AUDIO_PREPROCESS:
+        # Mono 16 kHz sans les silences : envoi plus léger, transcription plus rapide
+        data = audio if isinstance(audio, bytes) else audio.read()
+        with stage("preprocess"):
+            chunks, duration = await preprocess_audio(data, filename)
+        if duration == 0:
+            return ""
+        if len(chunks) > 1:
+            # Enregistrement long : morceaux transcrits en parallèle puis recollés
+            slots = stt_slots or asyncio.Semaphore(STT_CHUNK_PARALLELISM)
+            provider = speech_router.route(duration)
+
+            async def transcribe_chunk(chunk: bytes, name: str) -> str:
+                async with slots:
+                    return await speech_router.transcribe(chunk, name, provider=provider)
+
+            with stage("stt"):
+                texts = await asyncio.gather(*(transcribe_chunk(c, n) for c, n in chunks))
+            return stitch_transcripts(texts)
+        audio, filename = chunks[0]
+    with stage("stt"):
+        if stt_slots is None:
+            return await speech_router.transcribe(audio, filename, duration)
+        async with stt_slots:
+            return await speech_router.transcribe(audio, filename, duration)
+
+
+def _overlap(previous: list[str], following: list[str]) -> tuple[int, int]:
+    """
+    Passage commun à la fin de `previous` et au début de `following`
+    (mots repliés) : renvoie (nombre de mots de `previous` à garder,
+    nombre de mots de `following` à sauter). Whisper écorche souvent le mot
+    coupé en bordure : on tolère quelques mots d'écart de chaque côté.
+    """
+    a = [fold(w).replace(" ", "") for w in previous[-STITCH_WINDOW_WORDS:]]
+    b = [fold(w).replace(" ", "") for w in following[:STITCH_WINDOW_WORDS]]
+    offset = len(previous) - len(a)
+    best, cut = None, (len(previous), 0)
+    for i in range(len(a)):
+        for j in range(min(len(b), STITCH_SLACK_WORDS + 1)):
+            k = 0
+            while i + k < len(a) and j + k < len(b) and a[i + k] and a[i + k] == b[j + k]:
+                k += 1
+            # La correspondance doit atteindre (presque) la fin du morceau précédent
+            # Un seul mot commun ne suffit que s'il est long et ouvre le morceau suivant
+            single = k == 1 and j == 0 and len(a[i]) > 3
+            if len(a) - (i + k) > STITCH_SLACK_WORDS or not (k >= 2 or single):
+                continue
+            # Passage répété (« bon alors bon alors ») : l'occurrence la plus proche de la
+            # coupure est le chevauchement ; à fin égale, la plus longue, puis la moins décalée
+            key = (i + k, k, -j)
+            if best is None or key > best:
+                best, cut = key, (offset + i + k, j + k)
+    return cut
+
+
+def stitch_transcripts(texts: list[str]) -> str:
+    """Recolle les transcriptions de morceaux qui se chevauchent, sans répéter le passage commun."""
+    words: list[str] = []
+    for text in texts:
+        following = text.split()
+        if words and following:
+            keep, skip = _overlap(words, following)
+            words, following = words[:keep], following[skip:]
+        words.extend(following)
+    return " ".join(words)
 
 # 🔊 TTS
-async def synthesize_speech(text: str) -> str:
+TTS_MODEL = "tts-1"
+TTS_VOICE = "nova"
+
+# Fournisseurs STT / TTS (API OpenAI, modèles locaux) et routage par requête : voir app/speech.py
+speech_router = SpeechRouter(
+    OpenAISTT(client, "whisper-1"), OpenAITTS(client, TTS_MODEL, TTS_VOICE), LocalSTT(), LocalTTS()
+)
+
+# Phrases produites par le code lui-même : pré-synthétisées au démarrage
+CANNED_PHRASES = [FALLBACK_ANSWER, NO_SPEECH_ANSWER, BUSY_ANSWER, OPEN_CAMERA_ANSWER] + [
+    _directions_answer({"mode": mode}) for mode in ("driving", "walking", "transit")
+] + [
+    # Applications connues du front (hooks/useVoiceRecognition.ts)
+    f"J'ouvre {app}." for app in ("YouTube", "Spotify", "WhatsApp", "Facebook", "Instagram")
+]
+
+async def _synthesize_with(provider, text: str) -> bytes:
+    # Clé de cache par modèle et voix : une voix locale ne sert jamais l'audio de l'API, et inversement
+    return await tts_cache.get_or_synthesize(provider.model, provider.voice, text, lambda: provider.synthesize(text))
+
+async def synthesize_speech(text: str) -> bytes:
     """
-    Génère un MP3 à partir du texte fourni via l'API TTS et renvoie le chemin du fichier.
+    Génère un MP3 à partir du texte fourni (API TTS ou voix locale selon le
+    routage) et renvoie ses octets.
+    Les phrases déjà synthétisées sont servies par le cache (mémoire puis disque).
     """
-    resp = await client.audio.speech.create(
-        model="tts-1",
-        voice="nova",
-        input=text
+    provider = speech_router.tts_for(text)
+    with stage("tts"):
+        if not provider.local:
+            return await _synthesize_with(provider, text)
+        try:
+            return await _synthesize_with(provider, text)
+        except Exception as e:
+            speech_router.fell_back("Synthèse", e)
+            return await _synthesize_with(speech_router.cloud_tts, text)
+
+async def cached_speech(text: str) -> bytes:
+    """MP3 déjà en cache (mémoire ou disque) sans jamais appeler l'API, b"" sinon."""
+    for provider in speech_router.tts_providers(text):
+        audio = await tts_cache.get(tts_cache.key(provider.model, provider.voice, text))
+        if audio:
+            return audio
+    return b""
+
+async def presynthesize_canned_phrases():
+    """Remplit le cache TTS avec les phrases fixes (appelé au démarrage)."""
+    results = await asyncio.gather(
+        *(synthesize_speech(text) for text in CANNED_PHRASES),
+        return_exceptions=True
     )
-    # Création d'un fichier temporaire .mp3
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-    tmp.write(resp.content)
-    tmp.close()
-    return tmp.name
\ No newline at end of file
+    for text, result in zip(CANNED_PHRASES, results):
+        if isinstance(result, Exception):
+            logger.warning("Pré-synthèse impossible pour « %s » : %s", text, result)
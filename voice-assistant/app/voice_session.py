@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import re
+
+from app.audio import TARGET_RATE, SpeechSegmenter, StreamResampler, decode_pcm16, downmix, encode
+from app.metrics import RequestTimer, mark, use_timer
+from app.utils import transcribe_audio
+
+logger = logging.getLogger(__name__)
+
+PCM16 = "pcm16"
+# Whisper refuse les fichiers de plus de 25 Mo
+MAX_TURN_BYTES = int(os.getenv("WS_MAX_TURN_BYTES", str(25 * 1024 * 1024)))
+
+
+class TurnTooLarge(Exception):
+    pass
+
+
+def validate_format(audio_format: str, sample_rate: int, channels: int):
+    """Lève ValueError si les paramètres audio annoncés par le client sont invalides."""
+    if audio_format != PCM16 and not re.fullmatch(r"[a-z0-9]{2,5}", audio_format):
+        raise ValueError(f"Unsupported audio format: {audio_format}")
+    if not 8000 <= sample_rate <= 48000:
+        raise ValueError(f"Unsupported sample rate: {sample_rate}")
+    if channels not in (1, 2):
+        raise ValueError(f"Unsupported channel count: {channels}")
+
+
+class StreamingTranscription:
+    """
+    Un tour de parole reçu en morceaux sur la WebSocket.
+      • PCM 16 bits : découpage aux pauses et transcription de chaque segment
+        terminé pendant que l'utilisateur parle encore ; la transcription
+        partielle (segments consécutifs déjà transcrits) est remontée via
+        `on_partial` ;
+      • autres formats (wav, webm, m4a…) : non décodables morceau par morceau,
+        l'audio est accumulé puis transcrit d'un bloc en fin de tour.
+    """
+
+    def __init__(self, audio_format: str = PCM16, sample_rate: int = TARGET_RATE,
+                 channels: int = 1, on_partial=None):
+        self.format = audio_format
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.on_partial = on_partial
+        self.timer = RequestTimer("/ws/voice")
+        self.received = 0
+        self._segmenter = SpeechSegmenter()
+        self._resampler = StreamResampler(sample_rate)
+        self._carry = b""
+        self._raw = bytearray()
+        self._texts: list[str | None] = []
+        self._tasks: list[asyncio.Task] = []
+        self._partial = ""
+
+    @property
+    def streaming(self) -> bool:
+        return self.format == PCM16
+
+    def feed(self, chunk: bytes) -> bool:
+        """Ajoute un morceau d'audio ; renvoie True quand la fin de parole est détectée."""
+        self.received += len(chunk)
+        if self.received > MAX_TURN_BYTES:
+            raise TurnTooLarge(f"Turn exceeds {MAX_TURN_BYTES} bytes")
+        if not self.streaming:
+            self._raw += chunk
+            return False
+
+        # Un morceau peut couper un échantillon en deux : le reste attend le suivant
+        data = self._carry + chunk
+        usable = len(data) - len(data) % (2 * self.channels)
+        self._carry = data[usable:]
+        samples = self._resampler.feed(downmix(decode_pcm16(data[:usable], self.channels)))
+        with use_timer(self.timer):
+            for segment in self._segmenter.feed(samples):
+                self._transcribe(segment)
+            if self._segmenter.ended:
+                mark("speech")
+        return self._segmenter.ended
+
+    def _transcribe(self, segment):
+        index = len(self._texts)
+        self._texts.append(None)
+        audio, filename = encode(segment)
+        duration = len(segment) / TARGET_RATE
+        self._tasks.append(asyncio.create_task(self._transcribe_segment(index, audio, filename, duration)))
+
+    async def _transcribe_segment(self, index: int, audio: bytes, filename: str, duration: float):
+        try:
+            text = await transcribe_audio(audio, filename, preprocess=False, duration=duration)
+        except Exception as e:
+            # Un segment perdu ne doit pas faire échouer tout le tour
+            logger.warning("Transcription du segment %d impossible : %s", index, e)
+            text = ""
+        self._texts[index] = text.strip()
+
+        done = []
+        for item in self._texts:
+            if item is None:
+                break
+            done.append(item)
+        partial = " ".join(t for t in done if t)
+        if partial != self._partial and self.on_partial is not None:
+            self._partial = partial
+            try:
+                await self.on_partial(partial)
+            except Exception as e:
+                logger.debug("Transcription partielle non envoyée : %s", e)
+
+    async def finish(self) -> str:
+        """Fin du tour : transcrit ce qui reste et renvoie la transcription complète."""
+        with use_timer(self.timer):
+            if not self.streaming:
+                text = await transcribe_audio(bytes(self._raw), f"audio.{self.format}") if self._raw else ""
+            else:
+                rest = self._segmenter.flush()
+                if rest is not None:
+                    self._transcribe(rest)
+                await asyncio.gather(*self._tasks)
+                text = " ".join(t for t in self._texts if t)
+            mark("transcript")
+        return text.strip()
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
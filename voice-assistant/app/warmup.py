@@ -0,0 +1,192 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
+
+from app import google_calendar
+from app.audio import SpeechSegmenter, encode, preprocess
+from app.clients import TOOL_HOSTS, get_http_client, openai_client, openai_http_client
+from app.utils import TTS_MODEL, TTS_VOICE, presynthesize_canned_phrases, speech_router, tools
+
+logger = logging.getLogger(__name__)
+
+# ⚙️ Échauffement au démarrage (surchargé par variables d'environnement)
+WARMUP_ENABLED = os.getenv("WARMUP", "1") != "0"
+# 1 : le serveur n'accepte de requêtes qu'une fois l'échauffement terminé
+WARMUP_BLOCKING = os.getenv("WARMUP_BLOCKING", "0") == "1"
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "15"))
+# Connexions ouvertes d'avance par hôte (HTTP/1.1 ; une seule suffit en HTTP/2)
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "2"))
+# Sonde de disponibilité : GET /models authentifié auprès d'OpenAI
+WARMUP_PROBE = os.getenv("WARMUP_PROBE", "0") == "1"
+PROBE_RETRY_INTERVAL = 5.0
+
+
+async def _preconnect(client, url: str):
+    # La réponse importe peu : seule compte la connexion (TCP + TLS) laissée dans le pool
+    responses = await asyncio.gather(
+        *(client.head(url) for _ in range(WARMUP_CONNECTIONS)), return_exceptions=True
+    )
+    errors = [r for r in responses if isinstance(r, Exception)]
+    if len(errors) == len(responses):
+        raise errors[0]
+
+
+async def preconnect():
+    """Ouvre d'avance les connexions vers OpenAI et les API des outils."""
+    targets = [(openai_http_client, str(openai_client.base_url))]
+    targets += [(get_http_client(), f"{host}/") for host in TOOL_HOSTS]
+    results = await asyncio.gather(*(_preconnect(c, url) for c, url in targets), return_exceptions=True)
+    for (_, url), result in zip(targets, results):
+        if isinstance(result, Exception):
+            logger.info("Échauffement : connexion à %s impossible : %s", url, result)
+
+
+async def calendar_token():
+    """Premier jeton OAuth Google obtenu d'avance (sinon payé par le premier appel d'agenda)."""
+    if google_calendar.GOOGLE_REFRESH_TOKEN:
+        await google_calendar.tokens.token()
+
+
+def _prime_audio():
+    # Un passage complet sur un son synthétique : charge les chemins de code numpy
+    rate = 16000
+    t = np.arange(rate, dtype=np.float32) / rate
+    tone = np.concatenate([np.zeros(rate // 4), 0.3 * np.sin(2 * np.pi * 220 * t), np.zeros(rate // 4)])
+    data, filename = encode(tone.astype(np.float32), rate)
+    preprocess(data, filename)
+    SpeechSegmenter().feed(tone.astype(np.float32))
+
+
+def _canned_response(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path.endswith("/chat/completions"):
+        chunk = {
+            "id": "warmup", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o",
+            "choices": [{"index": 0, "delta": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+        }
+        body = f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n"
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body)
+    if path.endswith("/audio/speech"):
+        return httpx.Response(200, headers={"content-type": "audio/mpeg"}, content=b"")
+    return httpx.Response(200, json={"text": ""})
+
+
+async def prime_sdk():
+    """
+    Le SDK OpenAI prépare ses conversions (paramètres, modèles de réponse)
+    au premier appel de chaque méthode, soit une bonne centaine de ms.
+    On les déclenche ici contre des réponses factices, sans réseau ni jetons.
+    """
+    async with httpx.AsyncClient(transport=httpx.MockTransport(_canned_response)) as http:
+        sdk = AsyncOpenAI(api_key="warmup", base_url="http://warmup.invalid/v1", http_client=http)
+        stream = await sdk.chat.completions.create(
+            model="gpt-4o",
+            messages=[{"role": "user", "content": "ok"}],
+            stream=True,
+            tools=tools,
+            tool_choice="auto",
+            parallel_tool_calls=True,
+        )
+        async for _ in stream:
+            pass
+        await sdk.audio.speech.create(model=TTS_MODEL, voice=TTS_VOICE, input="ok")
+        await sdk.audio.transcriptions.create(model="whisper-1", file=("warmup.wav", b""))
+
+
+async def probe() -> bool:
+    """Sonde : la clé OpenAI est acceptée et l'API répond."""
+    resp = await openai_http_client.get(
+        f"{openai_client.base_url}models",
+        headers={"Authorization": f"Bearer {openai_client.api_key}"},
+    )
+    return resp.status_code == 200
+
+
+class Warmup:
+    """
+    Phase d'échauffement lancée par le lifespan : connexions amont ouvertes,
+    jeton Google, phrases fixes pré-synthétisées, code audio, SDK OpenAI et
+    modèles vocaux locaux chargés, puis sonde facultative. Son état (durée de chaque étape) est exposé par /ready.
+    """
+
+    def __init__(self, enabled: bool = WARMUP_ENABLED, probe_enabled: bool = WARMUP_PROBE):
+        self.enabled = enabled
+        self.probe_enabled = probe_enabled
+        self.done = not enabled
+        self.probe_ok: bool | None = None
+        self._probed_at = 0.0
+        self.steps: dict[str, dict] = {}
+        self.duration_ms: float | None = None
+
+    async def _step(self, name: str, work):
+        start = time.perf_counter()
+        try:
+            await work
+            self.steps[name] = {"ok": True}
+        except Exception as e:
+            logger.warning("Échauffement : étape %s en échec : %s", name, e)
+            self.steps[name] = {"ok": False, "error": str(e)[:200]}
+        self.steps[name]["ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    async def _probe(self):
+        self._probed_at = time.monotonic()
+        try:
+            self.probe_ok = await probe()
+        except Exception as e:
+            logger.warning("Sonde OpenAI en échec : %s", e)
+            self.probe_ok = False
+
+    async def run(self):
+        if not self.enabled:
+            return
+        start = time.perf_counter()
+        steps = {
+            "connections": preconnect(),
+            "calendar_token": calendar_token(),
+            "tts": presynthesize_canned_phrases(),
+            "audio": asyncio.to_thread(_prime_audio),
+            "openai_sdk": prime_sdk(),
+        }
+        if speech_router.local_stt or speech_router.local_tts:
+            steps["local_speech"] = speech_router.warm()
+        if self.probe_enabled:
+            steps["probe"] = self._probe()
+        tasks = [asyncio.create_task(self._step(name, work)) for name, work in steps.items()]
+        try:
+            _, pending = await asyncio.wait(tasks, timeout=WARMUP_TIMEOUT)
+            for task in pending:
+                task.cancel()
+            for name in steps:
+                self.steps.setdefault(name, {"ok": False, "error": "timeout"})
+        finally:
+            self.duration_ms = round((time.perf_counter() - start) * 1000, 1)
+            self.done = True
+        logger.info("Échauffement terminé en %.0f ms : %s", self.duration_ms, self.steps)
+
+    async def ready(self) -> bool:
+        """Prêt : échauffement terminé et, si la sonde est active, OpenAI joignable."""
+        if not self.done:
+            return False
+        if not self.probe_enabled:
+            return True
+        if not self.probe_ok and time.monotonic() - self._probed_at >= PROBE_RETRY_INTERVAL:
+            await self._probe()
+        return bool(self.probe_ok)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "done": self.done,
+            "duration_ms": self.duration_ms,
+            "probe": self.probe_ok,
+            "steps": self.steps,
+        }
+
+
+warmup = Warmup()
@@ -0,0 +1 @@
+"""Banc de charge hors ligne (API amont factices) : python -m bench.loadtest --help"""
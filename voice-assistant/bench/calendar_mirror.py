@@ -0,0 +1,170 @@
+"""
+Banc du miroir d'agenda contre l'agenda factice (bench/fake_calendar.py,
+servi par bench/mock_upstreams.py) : synchro complète d'un agenda chargé,
+modifications côté « Google » (création, modification, annulation,
+journée entière), synchro incrémentale, jetons périmés (410), puis
+comparaison des fenêtres de temps lues dans le miroir avec celles de l'API
+et latence des deux chemins.
+
+    cd voice-assistant
+    python -m bench.calendar_mirror
+    python -m bench.calendar_mirror --events 5000 --latency calendar=0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+from bench.loadtest import free_port, start_process, wait_ready
+
+CALENDAR = "primary"
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat().replace("+00:00", "Z")
+
+
+async def _populate(client: httpx.AsyncClient, count: int, rng: random.Random) -> list[str]:
+    """Événements répartis de -5 à +60 jours, dont quelques longs et quelques journées entières."""
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    ids = []
+    for i in range(count):
+        start = now + timedelta(minutes=rng.randrange(-5 * 1440, 60 * 1440))
+        if i % 50 == 0:
+            body = {"start": {"date": start.date().isoformat()},
+                    "end": {"date": (start.date() + timedelta(days=rng.randint(1, 4))).isoformat()}}
+        else:
+            body = {"start": {"dateTime": _iso(start)},
+                    "end": {"dateTime": _iso(start + timedelta(minutes=rng.choice((15, 30, 60, 90, 600))))}}
+        resp = await client.post(f"/calendar/v3/calendars/{CALENDAR}/events", json={"summary": f"Événement {i}", **body})
+        ids.append(resp.json()["id"])
+    return ids
+
+
+async def _mutate(client: httpx.AsyncClient, ids: list[str], rng: random.Random, count: int):
+    """Modifications « faites ailleurs » (téléphone, web) : déplacements, renommages, annulations."""
+    now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    for event_id in rng.sample(ids, count):
+        action = rng.random()
+        if action < 0.4:
+            await client.delete(f"/calendar/v3/calendars/{CALENDAR}/events/{event_id}")
+            ids.remove(event_id)
+        elif action < 0.7:
+            start = now + timedelta(minutes=rng.randrange(0, 2 * 1440))
+            await client.patch(f"/calendar/v3/calendars/{CALENDAR}/events/{event_id}", json={
+                "start": {"dateTime": _iso(start)}, "end": {"dateTime": _iso(start + timedelta(minutes=45))},
+            })
+        else:
+            await client.patch(f"/calendar/v3/calendars/{CALENDAR}/events/{event_id}",
+                               json={"summary": f"Renommé {event_id[-4:]}"})
+
+
+async def _compare(utils, mirror) -> dict:
+    """Mêmes fenêtres lues dans le miroir puis via l'API (miroir déclaré périmé le temps de la lecture)."""
+    local = (await utils.get_today_events(), await utils.get_upcoming_events(10))
+    synced_at, mirror.synced_at = mirror.synced_at, None
+    try:
+        remote = (await utils.get_today_events(), await utils.get_upcoming_events(10))
+    finally:
+        mirror.synced_at = synced_at
+    return {"today": local[0] == remote[0], "upcoming": local[1] == remote[1], "today_events": len(local[0])}
+
+
+async def _latency(read, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await read()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return {"p50_us": round(statistics.median(samples), 1), "max_us": round(max(samples), 1)}
+
+
+async def run(opts) -> dict:
+    mock_port = free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock_args = ["-m", "bench.mock_upstreams", "--port", str(mock_port), "--jitter", "0"]
+    for item in opts.latency or []:
+        mock_args += ["--latency", item]
+    mock = start_process(mock_args, dict(os.environ))
+    # Le miroir tourne dans ce processus : configuration avant l'import de l'application
+    os.environ.update({
+        "GOOGLE_CLIENT_ID": "bench", "GOOGLE_CLIENT_SECRET": "bench", "GOOGLE_REFRESH_TOKEN": "bench",
+        "GOOGLE_API_BASE": mock_url, "GOOGLE_OAUTH_BASE": mock_url, "OPENAI_API_KEY": "sk-bench",
+    })
+    from app import utils
+    from app.calendar_mirror import calendar_mirror as mirror
+    from app.clients import close_clients
+
+    rng = random.Random(opts.seed)
+    report = {}
+    try:
+        await wait_ready(f"{mock_url}/stats", mock)
+        async with httpx.AsyncClient(base_url=mock_url, timeout=30) as client:
+            ids = await _populate(client, opts.events, rng)
+
+            await mirror.sync()
+            report["full_sync"] = {"events": mirror.stats()["events"], "ms": mirror.last_sync_ms}
+
+            await _mutate(client, ids, rng, opts.changes)
+            await mirror.sync()
+            report["incremental_sync"] = {"changes": opts.changes, "ms": mirror.last_sync_ms}
+            report["consistent_after_incremental"] = await _compare(utils, mirror)
+
+            created = await utils.add_event_to_calendar(
+                "Dentiste", (datetime.now() + timedelta(hours=2)).replace(microsecond=0).isoformat(), 30
+            )
+            upcoming = await utils.get_upcoming_events(50)
+            report["write_visible_before_sync"] = any(e["summary"] == created["summary"] for e in upcoming)
+
+            await client.post("/fake-calendar/expire-sync-tokens")
+            await _mutate(client, ids, rng, opts.changes)
+            await mirror.sync()
+            report["expired_token"] = {"resyncs": mirror.resyncs, "full_syncs": mirror.full_syncs,
+                                       "ms": mirror.last_sync_ms}
+            report["consistent_after_resync"] = await _compare(utils, mirror)
+
+            report["read_latency"] = {"mirror": await _latency(utils.get_today_events, opts.reads)}
+            mirror.synced_at = None
+            report["read_latency"]["api"] = await _latency(utils.get_today_events, max(opts.reads // 100, 5))
+        report["stats"] = mirror.stats()
+    finally:
+        await mirror.close()
+        await close_clients()
+        mock.terminate()
+        try:
+            mock.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            mock.kill()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc du miroir d'agenda (agenda Google factice)")
+    parser.add_argument("--events", type=int, default=2000, help="événements de l'agenda factice")
+    parser.add_argument("--changes", type=int, default=100, help="modifications entre deux synchros")
+    parser.add_argument("--reads", type=int, default=2000, help="lectures mesurées sur le miroir")
+    parser.add_argument("--latency", action="append", metavar="SERVICE=SECONDES",
+                        help="latence injectée côté API factices (défaut : calendar=0.15, oauth=0.1)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="écrit le rapport JSON dans ce fichier")
+    opts = parser.parse_args()
+
+    report = asyncio.run(run(opts))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if opts.output:
+        with open(opts.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    consistent = report["consistent_after_incremental"], report["consistent_after_resync"]
+    if not all(c["today"] and c["upcoming"] for c in consistent) or not report["write_visible_before_sync"]:
+        raise SystemExit("Miroir incohérent avec l'API")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Agenda Google factice (API Calendar v3, en mémoire), monté par
+bench/mock_upstreams.py, pour essayer hors ligne le miroir local :
+  • GET    /calendar/v3/calendars/{id}/events   timeMin, timeMax, orderBy,
+           maxResults, pageToken, showDeleted, et syncToken (modifications
+           depuis le jeton, annulations comprises ; 410 si le jeton est périmé) ;
+  • POST   /calendar/v3/calendars/{id}/events   création ;
+  • PATCH  /calendar/v3/calendars/{id}/events/{event_id}   modification ;
+  • DELETE /calendar/v3/calendars/{id}/events/{event_id}   annulation ;
+  • POST   /fake-calendar/expire-sync-tokens     périme tous les jetons émis.
+"""
+import random
+import re
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, Response
+
+MAX_PAGE_SIZE = 2500
+DEFAULT_PAGE_SIZE = 250
+
+_SYNC_TOKEN = re.compile(r"s(?P<epoch>\d+)\.(?P<seq>\d+)")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _instant(when: dict, zone: ZoneInfo) -> datetime:
+    if "dateTime" in when:
+        moment = datetime.fromisoformat(when["dateTime"])
+        return moment if moment.tzinfo else moment.replace(tzinfo=ZoneInfo(when["timeZone"]) if "timeZone" in when else zone)
+    # Journée entière : minuit dans le fuseau de l'agenda
+    return datetime.combine(date.fromisoformat(when["date"]), datetime.min.time(), zone)
+
+
+def _gone() -> JSONResponse:
+    return JSONResponse(status_code=410, content={"error": {
+        "code": 410,
+        "message": "Sync token is no longer valid, a full sync is required.",
+        "errors": [{"domain": "global", "reason": "fullSyncRequired"}],
+    }})
+
+
+class FakeCalendar:
+    """
+    Un agenda en mémoire : chaque modification reçoit un numéro de séquence,
+    un jeton de synchro est « s<époque>.<numéro courant> », et les événements
+    annulés restent présents (status « cancelled ») pour la synchro incrémentale.
+    """
+
+    def __init__(self, time_zone: str = "Europe/Brussels"):
+        self.zone = ZoneInfo(time_zone)
+        self.events: dict[str, dict] = {}
+        self.seq = 0
+        # Les jetons portent l'époque de leur émission : ceux d'une époque révolue sont refusés (410)
+        self.epoch = 0
+        self.list_calls = 0
+        self.sync_calls = 0
+
+    def _touch(self, event: dict) -> dict:
+        self.seq += 1
+        event["updated"] = _now()
+        event["_seq"] = self.seq
+        return event
+
+    @staticmethod
+    def _public(event: dict) -> dict:
+        return {k: v for k, v in event.items() if not k.startswith("_")}
+
+    def insert(self, body: dict) -> dict:
+        event = {"kind": "calendar#event", "id": f"ev{random.getrandbits(48):012x}", "status": "confirmed", **body}
+        self.events[event["id"]] = self._touch(event)
+        return self._public(event)
+
+    def patch(self, event_id: str, body: dict) -> dict | None:
+        event = self.events.get(event_id)
+        if event is None or event["status"] == "cancelled":
+            return None
+        event.update(body)
+        return self._public(self._touch(event))
+
+    def delete(self, event_id: str) -> bool:
+        event = self.events.get(event_id)
+        if event is None or event["status"] == "cancelled":
+            return False
+        event["status"] = "cancelled"
+        self._touch(event)
+        return True
+
+    def expire_tokens(self):
+        self.epoch += 1
+
+    def seed(self, count: int = 3):
+        """Quelques réunions dans les prochaines heures."""
+        now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        for i in range(count):
+            start = now + timedelta(hours=i + 1)
+            self.insert({
+                "summary": f"Réunion {i + 1}",
+                "start": {"dateTime": start.isoformat()},
+                "end": {"dateTime": (start + timedelta(hours=1)).isoformat()},
+            })
+
+    def list(self, params: dict) -> dict | None:
+        """Une page de résultats ; None si le jeton de synchro est refusé."""
+        size = min(int(params.get("maxResults", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        # Jeton de page : « position:numéro de séquence du début de la liste »
+        offset, snapshot = 0, self.seq
+        if params.get("pageToken"):
+            offset, snapshot = (int(x) for x in params["pageToken"].split(":"))
+
+        if params.get("syncToken"):
+            self.sync_calls += 1
+            match = _SYNC_TOKEN.fullmatch(params["syncToken"])
+            if match is None or int(match["epoch"]) != self.epoch:
+                return None
+            since = int(match["seq"])
+            events = sorted(
+                (e for e in self.events.values() if since < e["_seq"] <= snapshot), key=lambda e: e["_seq"]
+            )
+        else:
+            self.list_calls += 1
+            show_deleted = params.get("showDeleted") == "true"
+            events = [e for e in self.events.values() if show_deleted or e["status"] != "cancelled"]
+            if params.get("timeMin"):
+                since = datetime.fromisoformat(params["timeMin"])
+                events = [e for e in events if _instant(e.get("end", e["start"]), self.zone) > since]
+            if params.get("timeMax"):
+                until = datetime.fromisoformat(params["timeMax"])
+                events = [e for e in events if _instant(e["start"], self.zone) < until]
+            if params.get("orderBy") == "startTime":
+                # Départage des débuts identiques par identifiant (ordre non spécifié chez Google)
+                events.sort(key=lambda e: (_instant(e["start"], self.zone), e["id"]))
+            else:
+                events.sort(key=lambda e: e["_seq"])
+
+        page = events[offset:offset + size]
+        result = {"kind": "calendar#events", "items": [self._public(e) for e in page]}
+        if offset + size < len(events):
+            result["nextPageToken"] = f"{offset + size}:{snapshot}"
+        else:
+            result["nextSyncToken"] = f"s{self.epoch}.{snapshot}"
+        return result
+
+
+def create_router(calendar: FakeCalendar, before=None) -> APIRouter:
+    """Routes de l'API ; `before(service)` (coroutine) est appelée avant chaque réponse."""
+    router = APIRouter()
+
+    async def hook():
+        if before is not None:
+            await before("calendar")
+
+    @router.get("/calendar/v3/calendars/{calendar_id}/events")
+    async def list_events(calendar_id: str, request: Request):
+        await hook()
+        params = dict(request.query_params)
+        if params.get("syncToken") and any(k in params for k in ("timeMin", "timeMax", "orderBy", "q")):
+            return JSONResponse(status_code=400, content={"error": {"code": 400, "message": "Invalid sync request."}})
+        result = calendar.list(params)
+        return _gone() if result is None else result
+
+    @router.post("/calendar/v3/calendars/{calendar_id}/events")
+    async def insert_event(calendar_id: str, request: Request):
+        await hook()
+        return calendar.insert(await request.json())
+
+    @router.patch("/calendar/v3/calendars/{calendar_id}/events/{event_id}")
+    async def patch_event(calendar_id: str, event_id: str, request: Request):
+        await hook()
+        event = calendar.patch(event_id, await request.json())
+        if event is None:
+            return JSONResponse(status_code=404, content={"error": {"code": 404, "message": "Not Found"}})
+        return event
+
+    @router.delete("/calendar/v3/calendars/{calendar_id}/events/{event_id}")
+    async def delete_event(calendar_id: str, event_id: str):
+        await hook()
+        if not calendar.delete(event_id):
+            return JSONResponse(status_code=410, content={"error": {"code": 410, "message": "Resource has been deleted"}})
+        return Response(status_code=204)
+
+    @router.post("/fake-calendar/expire-sync-tokens")
+    async def expire_sync_tokens():
+        calendar.expire_tokens()
+        return {"epoch": calendar.epoch}
+
+    @router.get("/fake-calendar/stats")
+    async def stats():
+        return {
+            "events": sum(e["status"] != "cancelled" for e in calendar.events.values()),
+            "seq": calendar.seq,
+            "list_calls": calendar.list_calls,
+            "sync_calls": calendar.sync_calls,
+        }
+
+    return router
@@ -0,0 +1,196 @@
+"""
+Serveur factice parlant le protocole Redis (RESP2), en mémoire, pour
+essayer hors ligne le backend de sessions Redis et lancer l'API avec
+plusieurs workers sans installer Redis :
+    python -m bench.fake_redis --port 6390
+    SESSION_BACKEND=redis://127.0.0.1:6390/0 uvicorn app.main:app --workers 4
+
+Commandes : PING, ECHO, AUTH, SELECT, GET, SET (EX/PX/NX/XX), DEL, EXISTS,
+EXPIRE, TTL, DBSIZE, FLUSHDB, WATCH, UNWATCH, MULTI, EXEC, DISCARD, QUIT.
+Une seule base ; les transactions respectent WATCH (EXEC renvoie nil si
+une clé surveillée a été modifiée entre-temps).
+"""
+import argparse
+import asyncio
+import itertools
+import time
+
+
+class RespError(Exception):
+    pass
+
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return b"-%s\r\n" % str(value).encode()
+    if isinstance(value, bool):
+        return b":%d\r\n" % int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(v) for v in value)
+    raise TypeError(type(value))
+
+
+async def _read_command(reader: asyncio.StreamReader) -> list[bytes] | None:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Commande « inline » (ex. PING tapé dans telnet)
+        return line.split()
+    args = []
+    for _ in range(int(line[1:-2])):
+        header = await reader.readline()
+        length = int(header[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data: dict[bytes, bytes] = {}
+        self.expires: dict[bytes, float] = {}
+        # Estampille de modification par clé, pour WATCH
+        self.stamps: dict[bytes, int] = {}
+        self._clock = itertools.count(1)
+        self.commands = 0
+
+    def _touch(self, key: bytes):
+        self.stamps[key] = next(self._clock)
+
+    def _alive(self, key: bytes) -> bool:
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+            self._touch(key)
+        return key in self.data
+
+    def _delete(self, key: bytes) -> bool:
+        if not self._alive(key):
+            return False
+        del self.data[key]
+        self.expires.pop(key, None)
+        self._touch(key)
+        return True
+
+    def execute(self, name: str, args: list[bytes]):
+        self.commands += 1
+        if name == "PING":
+            return args[0] if args else "PONG"
+        if name == "ECHO":
+            return args[0]
+        if name in ("AUTH", "SELECT"):
+            return "OK"
+        if name == "GET":
+            return self.data[args[0]] if self._alive(args[0]) else None
+        if name == "SET":
+            return self._set(args)
+        if name == "DEL":
+            return sum(self._delete(key) for key in args)
+        if name == "EXISTS":
+            return sum(self._alive(key) for key in args)
+        if name == "EXPIRE":
+            if not self._alive(args[0]):
+                return 0
+            self.expires[args[0]] = time.monotonic() + int(args[1])
+            self._touch(args[0])
+            return 1
+        if name == "TTL":
+            if not self._alive(args[0]):
+                return -2
+            deadline = self.expires.get(args[0])
+            return -1 if deadline is None else max(int(deadline - time.monotonic()), 0)
+        if name == "DBSIZE":
+            return sum(self._alive(key) for key in list(self.data))
+        if name == "FLUSHDB":
+            for key in list(self.data):
+                self._delete(key)
+            return "OK"
+        return RespError(f"ERR unknown command '{name}'")
+
+    def _set(self, args: list[bytes]):
+        key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+        exists = self._alive(key)
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        for unit, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+            if unit in options:
+                self.expires[key] = time.monotonic() + int(args[2 + options.index(unit) + 1]) * scale
+        self._touch(key)
+        return "OK"
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        watched: dict[bytes, int] = {}
+        queued: list[tuple[str, list[bytes]]] | None = None
+        try:
+            while True:
+                command = await _read_command(reader)
+                if not command:
+                    break
+                name, args = command[0].decode().upper(), command[1:]
+                if name == "QUIT":
+                    writer.write(_encode("OK"))
+                    break
+                if name == "WATCH":
+                    for key in args:
+                        self._alive(key)
+                        watched[key] = self.stamps.get(key, 0)
+                    reply = "OK"
+                elif name == "UNWATCH":
+                    watched.clear()
+                    reply = "OK"
+                elif name == "MULTI":
+                    queued = []
+                    reply = "OK"
+                elif name == "DISCARD":
+                    queued, reply = None, "OK"
+                    watched.clear()
+                elif name == "EXEC":
+                    if queued is None:
+                        reply = RespError("ERR EXEC without MULTI")
+                    else:
+                        for key in watched:
+                            self._alive(key)
+                        changed = any(self.stamps.get(key, 0) != stamp for key, stamp in watched.items())
+                        reply = None if changed else [self.execute(n, a) for n, a in queued]
+                        queued = None
+                        watched.clear()
+                elif queued is not None:
+                    queued.append((name, args))
+                    reply = "QUEUED"
+                else:
+                    reply = self.execute(name, args)
+                writer.write(_encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host: str, port: int):
+    server = await asyncio.start_server(FakeRedis().handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur factice au protocole Redis, en mémoire")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
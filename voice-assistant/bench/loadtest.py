@@ -0,0 +1,363 @@
+"""
+Banc de charge hors ligne : démarre les API amont factices
+(bench/mock_upstreams.py) et l'application (uvicorn app.main:app) pointée
+dessus, envoie des requêtes vocales concurrentes, puis rapporte
+p50/p95/p99, débit, erreurs et croissance mémoire (RSS) du serveur.
+
+    cd voice-assistant
+    python -m bench.loadtest --concurrency 16 --requests 400
+    python -m bench.loadtest --endpoint /process-voice-stream --latency llm=0.8
+    python -m bench.loadtest --output bench.json              # référence
+    python -m bench.loadtest --baseline bench.json            # échoue si régression
+    python -m bench.loadtest --workers 4 --session-backend redis   # sessions partagées
+
+Aucune clé ni appel réel : tout le trafic reste sur 127.0.0.1.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# 🎙️ Audio de test : 2 s stéréo 44,1 kHz (silence, « parole », silence)
+def make_wav(seconds: float = 2.0, rate: int = 44100) -> bytes:
+    t = np.arange(int(seconds * rate)) / rate
+    envelope = ((t > 0.3) & (t < seconds - 0.3)).astype(np.float32)
+    voice = 0.3 * np.sin(2 * np.pi * 220 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    noise = np.random.default_rng(0).normal(0, 0.002, len(t))
+    mono = voice * envelope + noise
+    pcm = (np.clip(np.stack([mono, mono], axis=1), -1, 1) * 32767).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_bytes(pid: int) -> int | None:
+    """Mémoire résidente d'un processus et de ses enfants, workers uvicorn compris (Linux : /proc)."""
+    total = None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total = int(line.split()[1]) * 1024
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(child) for child in f.read().split()]
+    except OSError:
+        return total
+    for child in children:
+        total = (total or 0) + (rss_bytes(child) or 0)
+    return total
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    low, high = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def summarize(latencies: list[float]) -> dict:
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else float("nan"),
+        "max_ms": round(max(latencies) * 1000, 1) if latencies else float("nan"),
+    }
+
+
+# 🚀 Processus : API factices + serveur Alto
+def start_process(args: list[str], env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, *args], cwd=ROOT, env=env)
+
+
+async def wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"Le processus s'est arrêté (code {proc.returncode}) : {url}")
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"Pas de réponse de {url} après {timeout} s")
+
+
+async def wait_port(port: int, proc: subprocess.Popen, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Le processus s'est arrêté (code {proc.returncode}) : port {port}")
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Port {port} fermé après {timeout} s")
+
+
+def app_env(mock_url: str, opts) -> dict:
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": f"{mock_url}/v1",
+        "BRAVE_API_KEY": "bench",
+        "OPENWEATHER_API_KEY": "bench",
+        "GOOGLE_DIRECTIONS_API_KEY": "bench",
+        "GOOGLE_CLIENT_ID": "bench",
+        "GOOGLE_CLIENT_SECRET": "bench",
+        "GOOGLE_REFRESH_TOKEN": "bench",
+        "BRAVE_API_BASE": mock_url,
+        "OPENWEATHER_API_BASE": mock_url,
+        "GOOGLE_MAPS_API_BASE": mock_url,
+        "GOOGLE_API_BASE": mock_url,
+        "GOOGLE_OAUTH_BASE": mock_url,
+        "TTS_CACHE_DIR": tempfile.mkdtemp(prefix="alto-bench-tts-"),
+    }
+    if opts.no_cache:
+        env.update({
+            "TTS_CACHE_MEMORY_BYTES": "0",
+            "TTS_CACHE_DISK_BYTES": "0",
+            "SEARCH_CACHE_TTL": "0",
+            "WEATHER_CACHE_TTL": "0",
+            "FORECAST_CACHE_TTL": "0",
+            "ROUTE_CACHE_TTL_DRIVING": "0",
+            "ROUTE_CACHE_TTL_TRANSIT": "0",
+            "ROUTE_CACHE_TTL_WALKING": "0",
+            "GEOCODE_CACHE_TTL": "0",
+        })
+    if opts.session_url:
+        env["SESSION_BACKEND"] = opts.session_url
+    return env
+
+
+def session_url(backend: str | None, workers: int) -> tuple[str | None, int | None]:
+    """URL du backend de sessions, et port du Redis factice à démarrer (le cas échéant)."""
+    if backend is None:
+        # Plusieurs workers : il faut un état partagé pour garder le fil des sessions
+        backend = "sqlite" if workers > 1 else "memory"
+    if backend == "memory":
+        return "memory://", None
+    if backend == "sqlite":
+        return f"sqlite:///{tempfile.mkdtemp(prefix='alto-bench-sessions-')}/sessions.db", None
+    if backend == "redis":
+        port = free_port()
+        return f"redis://127.0.0.1:{port}/0", port
+    return backend, None
+
+
+# 📈 Génération de charge (boucle fermée : chaque utilisateur enchaîne ses tours)
+async def one_request(client: httpx.AsyncClient, endpoint: str, audio: bytes, session_id: str) -> dict:
+    start = time.perf_counter()
+    data = {"lat": "50.8466", "lng": "4.3528", "session_id": session_id}
+    files = {"file": ("audio.wav", audio, "audio/wav")}
+    first_audio = None
+    if endpoint.endswith("-stream"):
+        async with client.stream("POST", endpoint, data=data, files=files) as resp:
+            ok = resp.status_code == 200
+            async for line in resp.aiter_lines():
+                if line.startswith("event: audio") and first_audio is None:
+                    first_audio = time.perf_counter() - start
+                elif line.startswith("event: error"):
+                    ok = False
+    else:
+        resp = await client.post(endpoint, data=data, files=files)
+        ok = resp.status_code == 200 and bool(resp.json().get("audio"))
+    return {"ok": ok, "latency": time.perf_counter() - start, "first_audio": first_audio}
+
+
+async def drive(base_url: str, opts, audio: bytes) -> tuple[list[dict], float]:
+    results: list[dict] = []
+    remaining = opts.requests
+    limits = httpx.Limits(max_connections=opts.concurrency, max_keepalive_connections=opts.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=opts.timeout) as client:
+        async def user(index: int):
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                try:
+                    results.append(await one_request(client, opts.endpoint, audio, f"bench-{index}"))
+                except httpx.HTTPError as e:
+                    results.append({"ok": False, "latency": opts.timeout, "first_audio": None, "error": str(e)})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(opts.concurrency)))
+        return results, time.perf_counter() - start
+
+
+def compare(report: dict, baseline_path: str, tolerance: float) -> list[str]:
+    """Régressions par rapport à un rapport de référence (latences et débit)."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    problems = []
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        before, after = baseline["latency"][key], report["latency"][key]
+        if after > before * (1 + tolerance):
+            problems.append(f"{key} : {before} → {after} ms")
+    before, after = baseline["throughput_rps"], report["throughput_rps"]
+    if after < before * (1 - tolerance):
+        problems.append(f"débit : {before} → {after} req/s")
+    return problems
+
+
+async def run(opts) -> dict:
+    mock_port, app_port = free_port(), free_port()
+    mock_url, app_url = f"http://127.0.0.1:{mock_port}", f"http://127.0.0.1:{app_port}"
+
+    mock_args = ["-m", "bench.mock_upstreams", "--port", str(mock_port), "--jitter", str(opts.jitter)]
+    for item in opts.latency or []:
+        mock_args += ["--latency", item]
+    if opts.seed is not None:
+        mock_args += ["--seed", str(opts.seed)]
+    mock = start_process(mock_args, dict(os.environ))
+    server = redis = None
+    opts.session_url, redis_port = session_url(opts.session_backend, opts.workers)
+    try:
+        await wait_ready(f"{mock_url}/stats", mock)
+        if redis_port is not None:
+            redis = start_process(["-m", "bench.fake_redis", "--port", str(redis_port)], dict(os.environ))
+            await wait_port(redis_port, redis)
+        server = start_process(
+            ["-m", "uvicorn", "app.main:app", "--port", str(app_port), "--log-level", "warning",
+             "--no-access-log", "--workers", str(opts.workers)],
+            {**app_env(mock_url, opts), "LOG_LEVEL": "WARNING"},
+        )
+        await wait_ready(f"{app_url}/cache-stats", server)
+
+        audio = make_wav()
+        rss_start = rss_bytes(server.pid)
+        # Échauffement : connexions ouvertes, caches et imports paresseux chargés
+        warm = argparse.Namespace(**{**vars(opts), "requests": opts.warmup})
+        await drive(app_url, warm, audio)
+        rss_warm = rss_bytes(server.pid)
+
+        results, wall = await drive(app_url, opts, audio)
+        rss_end = rss_bytes(server.pid)
+
+        async with httpx.AsyncClient() as client:
+            upstream_calls = (await client.get(f"{mock_url}/stats")).json()
+    finally:
+        for proc in (server, redis, mock):
+            if proc is not None:
+                proc.terminate()
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+
+    ok = [r for r in results if r["ok"]]
+    first_audio = [r["first_audio"] for r in ok if r["first_audio"] is not None]
+    mib = 1024 * 1024
+    report = {
+        "endpoint": opts.endpoint,
+        "concurrency": opts.concurrency,
+        "workers": opts.workers,
+        "session_backend": opts.session_url.split("://", 1)[0],
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(ok) / wall, 2) if wall else 0.0,
+        "latency": summarize([r["latency"] for r in ok]),
+        "memory": {
+            "rss_start_mib": round(rss_start / mib, 1) if rss_start else None,
+            "rss_after_warmup_mib": round(rss_warm / mib, 1) if rss_warm else None,
+            "rss_end_mib": round(rss_end / mib, 1) if rss_end else None,
+            "growth_mib": round((rss_end - rss_warm) / mib, 1) if rss_end and rss_warm else None,
+            "growth_per_request_kib": round((rss_end - rss_warm) / 1024 / len(results), 2)
+            if rss_end and rss_warm and results else None,
+        },
+        "upstream_calls": upstream_calls,
+    }
+    if first_audio:
+        report["first_audio"] = summarize(first_audio)
+    return report
+
+
+def print_report(report: dict):
+    lat = report["latency"]
+    print(f"\n{report['endpoint']} — {report['requests']} requêtes, {report['concurrency']} en parallèle, "
+          f"{report.get('workers', 1)} worker(s), sessions {report.get('session_backend', 'memory')}")
+    print(f"  erreurs      : {report['errors']}")
+    print(f"  débit        : {report['throughput_rps']} req/s ({report['wall_s']} s)")
+    print(f"  latence      : p50 {lat['p50_ms']} ms · p95 {lat['p95_ms']} ms · p99 {lat['p99_ms']} ms "
+          f"· max {lat['max_ms']} ms")
+    if "first_audio" in report:
+        fa = report["first_audio"]
+        print(f"  1er audio    : p50 {fa['p50_ms']} ms · p95 {fa['p95_ms']} ms · p99 {fa['p99_ms']} ms")
+    mem = report["memory"]
+    if mem["rss_end_mib"] is not None:
+        print(f"  mémoire RSS  : {mem['rss_start_mib']} → {mem['rss_after_warmup_mib']} (après échauffement) "
+              f"→ {mem['rss_end_mib']} MiB, +{mem['growth_per_request_kib']} Kio/requête")
+    print(f"  appels amont : {json.dumps(report['upstream_calls'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de charge hors ligne d'Alto (API amont factices)")
+    parser.add_argument("--endpoint", default="/process-voice", choices=["/process-voice", "/process-voice-stream"])
+    parser.add_argument("--concurrency", type=int, default=8, help="utilisateurs simultanés (une session chacun)")
+    parser.add_argument("--requests", type=int, default=200, help="requêtes mesurées")
+    parser.add_argument("--warmup", type=int, default=16, help="requêtes d'échauffement (non mesurées)")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--latency", action="append", metavar="SERVICE=SECONDES",
+                        help="latence injectée côté API factices (voir bench/mock_upstreams.py), répétable")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true", help="désactive les caches outils et TTS")
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn")
+    parser.add_argument("--session-backend", metavar="memory|sqlite|redis|URL",
+                        help="état des sessions (défaut : memory, sqlite dès 2 workers) ; "
+                             "redis démarre bench/fake_redis.py")
+    parser.add_argument("--output", help="écrit le rapport JSON dans ce fichier")
+    parser.add_argument("--baseline", help="rapport JSON de référence : code de sortie 1 en cas de régression")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="régression tolérée (0.15 = 15 %%)")
+    opts = parser.parse_args()
+
+    report = asyncio.run(run(opts))
+    print_report(report)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    status = 0
+    if report["errors"]:
+        print(f"\n⚠️  {report['errors']} requête(s) en erreur")
+        status = 1
+    if opts.baseline:
+        problems = compare(report, opts.baseline, opts.tolerance)
+        for problem in problems:
+            print(f"❌ Régression {problem}")
+        status = status or int(bool(problems))
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Serveur factice qui imite les API amont d'Alto, avec une latence injectée
+réglable par service :
+  • OpenAI : /v1/audio/transcriptions, /v1/chat/completions (streaming SSE,
+    appels d'outils compris) et /v1/audio/speech ;
+  • Brave Search, OpenWeather (météo + prévisions), Google Directions,
+    Google OAuth et Google Calendar v3 (agenda en mémoire, bench/fake_calendar.py).
+
+Lancement seul :
+    python -m bench.mock_upstreams --port 8765 --latency llm=0.4 --latency stt=0.3
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from bench.fake_calendar import FakeCalendar, create_router
+
+# Latences par défaut (secondes), proches de ce qu'on observe en production
+DEFAULT_LATENCY = {
+    "stt": 0.35,        # Whisper
+    "llm": 0.40,        # délai avant le premier jeton
+    "llm_token": 0.01,  # délai entre deux morceaux du flux
+    "tts": 0.25,
+    "search": 0.30,
+    "weather": 0.12,
+    "directions": 0.20,
+    "oauth": 0.10,
+    "calendar": 0.15,
+}
+
+# Phrases « transcrites », servies à tour de rôle : elles couvrent les
+# chemins principaux (GPT seul, routeur local, outil + second appel, réponse directe)
+UTTERANCES = [
+    "Bonjour Alto, comment ça va aujourd'hui ?",
+    "Quel temps fait-il à Paris ?",
+    "Cherche les dernières nouvelles sur la mission Artemis.",
+    "Qu'est-ce que j'ai de prévu aujourd'hui dans mon agenda ?",
+    "Comment aller à la gare du Midi à pied ?",
+    "Raconte-moi une blague sur les chats.",
+    "Est-ce qu'il va pleuvoir demain à Lyon ?",
+    "Ouvre YouTube.",
+]
+
+ANSWERS = [
+    "Très bien, merci ! Je suis prête à vous aider. Que puis-je faire pour vous ?",
+    "Voici ce que j'ai trouvé. Les informations les plus récentes indiquent que tout se déroule comme prévu. "
+    "Voulez-vous plus de détails ?",
+    "Pourquoi les chats n'aiment-ils pas les ordinateurs ? Parce qu'ils ont peur de la souris !",
+]
+
+
+@dataclass
+class Latency:
+    """Latence injectée par service, avec une gigue relative uniforme (± jitter)."""
+
+    values: dict = field(default_factory=lambda: dict(DEFAULT_LATENCY))
+    jitter: float = 0.2
+    rng: random.Random = field(default_factory=random.Random)
+
+    def of(self, service: str) -> float:
+        base = self.values.get(service, 0.0)
+        return max(base * (1 + self.rng.uniform(-self.jitter, self.jitter)), 0.0)
+
+    async def wait(self, service: str):
+        delay = self.of(service)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+def parse_latency(items: list[str]) -> dict:
+    """["llm=0.4", "stt=0.3"] → {"llm": 0.4, "stt": 0.3} (sur les valeurs par défaut)."""
+    values = dict(DEFAULT_LATENCY)
+    for item in items or []:
+        name, _, value = item.partition("=")
+        if name not in values:
+            raise SystemExit(f"Service inconnu : {name} (attendus : {', '.join(values)})")
+        values[name] = float(value)
+    return values
+
+
+# 🤖 Décision « LLM » : outil selon des mots-clés de la dernière phrase utilisateur
+def _tool_call_for(text: str, available: set[str]) -> tuple[str, dict] | None:
+    lower = text.lower()
+    city = re.search(r"\b(?:à|a)\s+([A-ZÉ][\w-]+)", text)
+    city = city.group(1) if city else "Bruxelles"
+    candidates = [
+        ("pleuvoir" in lower or "demain" in lower, "get_weather_forecast", {"city": city, "days_ahead": 1}),
+        ("temps" in lower or "météo" in lower, "get_weather", {"city": city}),
+        ("agenda" in lower or "prévu" in lower, "get_today_events", {}),
+        ("aller" in lower or "itinéraire" in lower, "get_directions", {"destination": "Gare du Midi", "mode": "walking"}),
+        ("ouvre" in lower, "prepare_open_app", {"app_name": "YouTube"}),
+        ("cherche" in lower or "nouvelles" in lower, "search_web", {"query": text}),
+    ]
+    for matches, name, args in candidates:
+        if matches and name in available:
+            return name, args
+    return None
+
+
+def _chunk(completion_id: str, delta: dict, finish_reason: str | None = None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": "gpt-4o",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _words(text: str, size: int = 3) -> list[str]:
+    words = text.split(" ")
+    return [" ".join(words[i:i + size]) + (" " if i + size < len(words) else "") for i in range(0, len(words), size)]
+
+
+def create_app(latency: Latency | None = None, utterances: list[str] | None = None) -> FastAPI:
+    latency = latency or Latency()
+    app = FastAPI()
+    utterances = itertools.cycle(utterances or UTTERANCES)
+    answers = itertools.cycle(ANSWERS)
+    counters: dict[str, int] = {}
+
+    def count(service: str):
+        counters[service] = counters.get(service, 0) + 1
+
+    @app.get("/stats")
+    async def stats():
+        return counters
+
+    # 🎙️ Whisper
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        await request.body()
+        count("stt")
+        await latency.wait("stt")
+        return {"text": next(utterances)}
+
+    # 💬 Chat completions (streaming, outils)
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        count("llm")
+        messages = body.get("messages", [])
+        available = {t["function"]["name"] for t in body.get("tools", [])}
+        last = messages[-1] if messages else {}
+        call = None
+        if last.get("role") == "user" and body.get("tool_choice") != "none":
+            call = _tool_call_for(last.get("content") or "", available)
+        completion_id = f"chatcmpl-{random.getrandbits(48):x}"
+
+        async def stream():
+            await latency.wait("llm")
+            if call:
+                name, args = call
+                yield _chunk(completion_id, {"role": "assistant", "content": None, "tool_calls": [{
+                    "index": 0,
+                    "id": f"call_{random.getrandbits(48):x}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": ""},
+                }]})
+                yield _chunk(completion_id, {"tool_calls": [{
+                    "index": 0, "function": {"arguments": json.dumps(args, ensure_ascii=False)}
+                }]})
+                yield _chunk(completion_id, {}, "tool_calls")
+            else:
+                yield _chunk(completion_id, {"role": "assistant", "content": ""})
+                for piece in _words(next(answers)):
+                    await latency.wait("llm_token")
+                    yield _chunk(completion_id, {"content": piece})
+                yield _chunk(completion_id, {}, "stop")
+            yield "data: [DONE]\n\n"
+
+        if not body.get("stream"):
+            return JSONResponse({"error": {"message": "Only streaming is emulated"}}, status_code=400)
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    # 🔊 TTS : un « MP3 » dont la taille suit la longueur du texte (~1 Ko par mot)
+    @app.post("/v1/audio/speech")
+    async def speech(request: Request):
+        body = await request.json()
+        count("tts")
+        await latency.wait("tts")
+        text = body.get("input", "")
+        frame = b"\xff\xfb\x90\x64" + bytes(413)
+        return Response(frame * max(len(text.split()) * 2, 1), media_type="audio/mpeg")
+
+    # 🔍 Brave Search
+    @app.get("/res/v1/web/search")
+    async def brave(q: str = ""):
+        count("search")
+        await latency.wait("search")
+        return {"web": {"results": [
+            {"title": f"Résultat {i + 1} pour {q}", "url": f"https://example.org/{i}", "description": "Lorem ipsum " * 8}
+            for i in range(3)
+        ]}}
+
+    # 🌦️ OpenWeather
+    @app.get("/data/2.5/weather")
+    async def weather(q: str = "", lat: float = None, lon: float = None):
+        count("weather")
+        await latency.wait("weather")
+        name = q or ("Bruxelles" if lat is not None else "")
+        return {"weather": [{"description": "ciel dégagé"}], "main": {"temp": 18.4, "feels_like": 17.9}, "name": name}
+
+    @app.get("/data/2.5/forecast")
+    async def forecast(q: str = ""):
+        count("weather")
+        await latency.wait("weather")
+        start = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        return {"list": [
+            {
+                "dt_txt": (start + timedelta(hours=3 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+                "main": {"temp": 12 + i % 8, "feels_like": 11 + i % 8, "humidity": 70},
+                "weather": [{"description": "pluie légère" if i % 3 else "nuageux"}],
+                "wind": {"speed": 3.2},
+            }
+            for i in range(40)
+        ]}
+
+    # 🗺️ Google Directions
+    @app.get("/maps/api/directions/json")
+    async def directions(destination: str = ""):
+        count("directions")
+        await latency.wait("directions")
+        # place_id:… : destination déjà résolue par un appel précédent
+        name = destination.removeprefix("place_id:mock-")
+        return {
+            "status": "OK",
+            "geocoded_waypoints": [{"place_id": "mock-origin"}, {"place_id": f"mock-{name}"}],
+            "routes": [{"legs": [{
+                "end_address": f"{name}, 1060 Bruxelles",
+                "end_location": {"lat": 50.8355, "lng": 4.3357},
+                "duration": {"text": "18 minutes"},
+                "distance": {"text": "1,4 km"},
+            }]}],
+        }
+
+    # 🔑 Google OAuth + 📅 Calendar v3
+    @app.post("/token")
+    async def token():
+        count("oauth")
+        await latency.wait("oauth")
+        return {"access_token": f"mock-{random.getrandbits(32):x}", "expires_in": 3600, "token_type": "Bearer"}
+
+    # Agenda en mémoire : synchro incrémentale (syncToken) et 410 émulés, voir bench/fake_calendar.py
+    calendar = FakeCalendar()
+    calendar.seed()
+
+    async def before(service: str):
+        count(service)
+        await latency.wait(service)
+
+    app.include_router(create_router(calendar, before))
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API amont factices pour le banc de charge d'Alto")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", action="append", metavar="SERVICE=SECONDES",
+                        help=f"latence injectée ({', '.join(DEFAULT_LATENCY)}), répétable")
+    parser.add_argument("--jitter", type=float, default=0.2, help="gigue relative (0.2 = ±20 %%)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--utterance", action="append",
+                        help="phrase(s) « transcrite(s) » à la place des phrases par défaut, répétable")
+    args = parser.parse_args()
+
+    latency = Latency(parse_latency(args.latency), args.jitter, random.Random(args.seed))
+    uvicorn.run(create_app(latency, args.utterance), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
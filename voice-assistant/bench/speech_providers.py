@@ -0,0 +1,208 @@
+"""
+Banc des fournisseurs STT / TTS (app/speech.py) sur la machine courante :
+latence en série (p50 / p95) selon la durée de l'audio ou la longueur du
+texte, puis débit à concurrence donnée, pour l'API (factice par défaut,
+ou la vraie avec --cloud openai) et pour les modèles locaux sur CPU
+(faster-whisper int8, Piper). Un fournisseur local dont les dépendances
+(requirements-local.txt) ou la voix manquent est signalé et sauté.
+
+    cd voice-assistant
+    python -m bench.speech_providers
+    python -m bench.speech_providers --stt-model base --workers 4 --threads 1
+    python -m bench.speech_providers --audio commande.wav --audio dictee.wav --cloud openai
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+import wave
+
+import httpx
+from openai import AsyncOpenAI
+
+from app import speech
+from app.speech import LocalSTT, LocalTTS, OpenAISTT, OpenAITTS
+from bench.loadtest import free_port, make_wav, start_process, summarize, wait_ready
+
+# Réponses typiques : phrase fixe, réponse courte, réponse longue
+TEXTS = {
+    "short": "J'ouvre l'appareil photo.",
+    "medium": "Il fait quatorze degrés à Mons, avec quelques averses attendues en fin d'après-midi.",
+    "long": (
+        "Voici ce que j'ai trouvé. Les informations les plus récentes indiquent que tout se déroule "
+        "comme prévu : la réunion est maintenue à dix heures, la salle a été réservée et les "
+        "participants ont confirmé leur présence. Voulez-vous que je vous rappelle l'horaire une "
+        "heure avant, ou que j'ajoute un trajet jusqu'au bureau dans votre agenda ?"
+    ),
+}
+
+
+def _samples(opts) -> dict[str, tuple[bytes, str]]:
+    """Audio de test : fichiers fournis, sinon « parole » synthétique de plusieurs durées (16 kHz)."""
+    if opts.audio:
+        samples = {}
+        for path in opts.audio:
+            with open(path, "rb") as f:
+                data = f.read()
+            label = os.path.basename(path)
+            if path.endswith(".wav"):
+                with wave.open(path) as w:
+                    label += f" ({w.getnframes() / w.getframerate():.1f} s)"
+            samples[label] = (data, os.path.basename(path))
+        return samples
+    return {f"{seconds:g}s": (make_wav(seconds, rate=16000), "audio.wav") for seconds in opts.durations}
+
+
+async def _serial(call, runs: int) -> dict:
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+async def _throughput(call, requests: int, concurrency: int) -> dict:
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with slots:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {"concurrency": concurrency, "requests": requests,
+            "per_s": round(requests / elapsed, 2), **summarize(latencies)}
+
+
+async def _bench_stt(provider, samples: dict, opts) -> dict:
+    report = {"latency": {}}
+    for label, (audio, filename) in samples.items():
+        await provider.transcribe(audio, filename)  # premier appel hors mesure
+        report["latency"][label] = await _serial(lambda: provider.transcribe(audio, filename), opts.runs)
+    audio, filename = next(iter(samples.values()))
+    report["throughput"] = await _throughput(lambda: provider.transcribe(audio, filename),
+                                             opts.requests, opts.concurrency)
+    return report
+
+
+async def _bench_tts(provider, opts) -> dict:
+    report = {"latency": {}}
+    for label, text in TEXTS.items():
+        await provider.synthesize(text)
+        report["latency"][f"{label} ({len(text)} car.)"] = await _serial(lambda: provider.synthesize(text), opts.runs)
+    report["throughput"] = await _throughput(lambda: provider.synthesize(TEXTS["medium"]),
+                                             opts.requests, opts.concurrency)
+    return report
+
+
+async def _bench_local(provider, bench) -> dict:
+    if not provider.pool.available:
+        return {"skipped": provider.pool.error}
+    start = time.perf_counter()
+    try:
+        # Démarrage des processus et chargement des modèles, mesurés à part
+        await provider.pool.warm()
+        load_ms = round((time.perf_counter() - start) * 1000, 1)
+        return {"workers": provider.pool.workers, "load_ms": load_ms, **await bench(provider)}
+    except RuntimeError as e:
+        return {"skipped": str(e)}
+    finally:
+        provider.pool.close()
+
+
+async def run(opts) -> dict:
+    report = {
+        "machine": {"cpu": platform.processor() or platform.machine(), "cpus": os.cpu_count(),
+                    "python": platform.python_version()},
+        "stt": {}, "tts": {},
+    }
+    samples = _samples(opts)
+    mock = None
+    try:
+        if opts.cloud != "none":
+            if opts.cloud == "mock":
+                port = free_port()
+                mock_args = ["-m", "bench.mock_upstreams", "--port", str(port)]
+                for item in opts.latency or []:
+                    mock_args += ["--latency", item]
+                mock = start_process(mock_args, dict(os.environ))
+                await wait_ready(f"http://127.0.0.1:{port}/stats", mock)
+                sdk = AsyncOpenAI(api_key="sk-bench", base_url=f"http://127.0.0.1:{port}/v1",
+                                  http_client=httpx.AsyncClient(limits=httpx.Limits(max_connections=100)))
+            else:
+                sdk = AsyncOpenAI()
+            async with sdk:
+                cloud_stt, cloud_tts = OpenAISTT(sdk), OpenAITTS(sdk)
+                report["stt"][f"{cloud_stt.name} ({opts.cloud})"] = await _bench_stt(cloud_stt, samples, opts)
+                report["tts"][f"{cloud_tts.name} ({opts.cloud})"] = await _bench_tts(cloud_tts, opts)
+
+        local_stt = LocalSTT(opts.stt_model, opts.compute_type, opts.language, opts.workers, opts.threads)
+        report["stt"][local_stt.name] = await _bench_local(local_stt, lambda p: _bench_stt(p, samples, opts))
+        local_tts = LocalTTS(opts.voice, opts.tts_workers, opts.threads)
+        report["tts"][local_tts.name] = await _bench_local(local_tts, lambda p: _bench_tts(p, opts))
+    finally:
+        if mock is not None:
+            mock.terminate()
+            try:
+                mock.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                mock.kill()
+    return report
+
+
+def print_report(report: dict):
+    machine = report["machine"]
+    print(f"Machine : {machine['cpu']}, {machine['cpus']} CPU, Python {machine['python']}")
+    for kind in ("stt", "tts"):
+        for name, result in report[kind].items():
+            print(f"\n{kind.upper()} {name}")
+            if "skipped" in result:
+                print(f"  sauté : {result['skipped']}")
+                continue
+            if "load_ms" in result:
+                print(f"  chargement ({result['workers']} processus) : {result['load_ms']:.0f} ms")
+            for label, stats in result["latency"].items():
+                print(f"  {label:<24} p50 {stats['p50_ms']:>8.1f} ms   p95 {stats['p95_ms']:>8.1f} ms")
+            t = result["throughput"]
+            print(f"  débit ×{t['concurrency']:<3} {t['per_s']:>8.2f} req/s   p95 {t['p95_ms']:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc des fournisseurs STT / TTS (API et modèles locaux)")
+    parser.add_argument("--cloud", choices=("mock", "openai", "none"), default="mock",
+                        help="API comparée : factice (défaut), vraie API OpenAI (OPENAI_API_KEY) ou aucune")
+    parser.add_argument("--latency", action="append", metavar="SERVICE=SECONDES",
+                        help="latence de l'API factice (défaut : stt=0.35, tts=0.25)")
+    parser.add_argument("--audio", action="append", metavar="FICHIER", help="enregistrement réel à transcrire")
+    parser.add_argument("--durations", type=lambda s: [float(x) for x in s.split(",")], default=[2, 5, 15, 30],
+                        help="durées de l'audio synthétique, en secondes (défaut : 2,5,15,30)")
+    parser.add_argument("--runs", type=int, default=10, help="mesures en série par échantillon")
+    parser.add_argument("--requests", type=int, default=40, help="requêtes du test de débit")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stt-model", default=speech.LOCAL_STT_MODEL)
+    parser.add_argument("--compute-type", default=speech.LOCAL_STT_COMPUTE_TYPE)
+    parser.add_argument("--language", default=speech.LOCAL_STT_LANGUAGE)
+    parser.add_argument("--voice", default=speech.LOCAL_TTS_VOICE, help="voix Piper (.onnx)")
+    parser.add_argument("--workers", type=int, default=speech.LOCAL_STT_WORKERS, help="processus STT locaux")
+    parser.add_argument("--tts-workers", type=int, default=speech.LOCAL_TTS_WORKERS, help="processus TTS locaux")
+    parser.add_argument("--threads", type=int, default=speech.LOCAL_THREADS, help="threads de calcul par processus")
+    parser.add_argument("--output", help="écrit le rapport JSON dans ce fichier")
+    opts = parser.parse_args()
+
+    report = asyncio.run(run(opts))
+    print_report(report)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Banc de démarrage à froid : temps d'import de app.main (processus neuf),
+puis, serveur lancé contre les API amont factices, délai jusqu'à
+l'ouverture du port, jusqu'à la première réponse vocale complète et
+jusqu'à /ready, comparés à la latence d'une requête « à chaud ».
+
+    cd voice-assistant
+    python -m bench.startup                       # échauffement désactivé / en fond / bloquant
+    python -m bench.startup --modes off,background --runs 5 --latency tts=0.5
+    python -m bench.startup --top 15              # modules les plus coûteux à importer
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench.loadtest import ROOT, app_env, free_port, make_wav, start_process, wait_ready
+
+# Réglages d'échauffement de chaque mode comparé
+MODES = {
+    "off": {"WARMUP": "0"},
+    "background": {"WARMUP": "1", "WARMUP_BLOCKING": "0"},
+    "blocking": {"WARMUP": "1", "WARMUP_BLOCKING": "1"},
+}
+
+# Même phrase à chaque requête : la première et la requête « à chaud » suivent le même chemin
+UTTERANCE = "Bonjour Alto, comment ça va aujourd'hui ?"
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def _env(mock_url: str, mode: str) -> dict:
+    opts = argparse.Namespace(no_cache=False, session_url=None)
+    return {**app_env(mock_url, opts), **MODES[mode], "LOG_LEVEL": "WARNING"}
+
+
+def import_time(env: dict, runs: int) -> dict:
+    """Temps d'import de app.main, chaque fois dans un interpréteur neuf."""
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return {"median_ms": round(statistics.median(samples), 1), "min_ms": round(min(samples), 1)}
+
+
+def import_breakdown(env: dict, top: int) -> list[dict]:
+    """Modules de premier niveau les plus coûteux (python -X importtime, cumulé)."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        # « import time:  self [us] | cumulative | <indentation>module »
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+        if depth <= 2:
+            rows.append({"module": parts[2].strip(), "cumulative_ms": round(int(parts[1]) / 1000, 1)})
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+
+async def _wait_listening(port: int, proc: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Le serveur s'est arrêté (code {proc.returncode})")
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.005)
+    raise RuntimeError(f"Port {port} fermé après {timeout} s")
+
+
+async def _voice_request(client: httpx.AsyncClient, audio: bytes, session_id: str) -> float:
+    start = time.perf_counter()
+    resp = await client.post("/process-voice", data={"session_id": session_id},
+                             files={"file": ("audio.wav", audio, "audio/wav")})
+    if resp.status_code != 200 or not resp.json().get("audio"):
+        raise RuntimeError(f"Réponse inattendue : {resp.status_code}")
+    return (time.perf_counter() - start) * 1000
+
+
+async def cold_start(mock_url: str, mode: str, audio: bytes) -> dict:
+    """Un démarrage : le client attend l'ouverture du port puis envoie aussitôt une requête vocale."""
+    port = free_port()
+    spawned = time.perf_counter()
+    server = start_process(
+        ["-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        _env(mock_url, mode),
+    )
+    try:
+        await _wait_listening(port, server)
+        listening = (time.perf_counter() - spawned) * 1000
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            await _voice_request(client, audio, "cold")
+            first_response = (time.perf_counter() - spawned) * 1000
+            while (await client.get("/ready")).status_code != 200:
+                await asyncio.sleep(0.01)
+            ready = (time.perf_counter() - spawned) * 1000
+            warm = await _voice_request(client, audio, "warm")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return {
+        "listening_ms": round(listening, 1),
+        "first_response_ms": round(first_response, 1),
+        "first_request_ms": round(first_response - listening, 1),
+        "ready_ms": round(ready, 1),
+        "warm_request_ms": round(warm, 1),
+    }
+
+
+async def run(opts) -> dict:
+    mock_port = free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock_args = ["-m", "bench.mock_upstreams", "--port", str(mock_port), "--jitter", "0", "--utterance", UTTERANCE]
+    for item in opts.latency or []:
+        mock_args += ["--latency", item]
+    mock = start_process(mock_args, dict(os.environ))
+    report = {"import": {}, "modes": {}}
+    try:
+        await wait_ready(f"{mock_url}/stats", mock)
+        env = _env(mock_url, "background")
+        report["import"] = import_time(env, opts.runs)
+        if opts.top:
+            report["import"]["top_modules"] = import_breakdown(env, opts.top)
+
+        audio = make_wav()
+        for mode in opts.modes.split(","):
+            runs = [await cold_start(mock_url, mode, audio) for _ in range(opts.runs)]
+            report["modes"][mode] = {key: round(statistics.median(r[key] for r in runs), 1) for key in runs[0]}
+    finally:
+        mock.terminate()
+        try:
+            mock.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            mock.kill()
+    return report
+
+
+def print_report(report: dict):
+    imp = report["import"]
+    print(f"\nImport de app.main : médiane {imp['median_ms']} ms (min {imp['min_ms']} ms)")
+    for row in imp.get("top_modules", []):
+        print(f"    {row['cumulative_ms']:>8} ms  {row['module']}")
+    print(f"\n{'mode':<12}{'port ouvert':>13}{'1re réponse':>13}{'dont requête':>14}{'/ready':>10}{'à chaud':>10}")
+    for mode, r in report["modes"].items():
+        print(f"{mode:<12}{r['listening_ms']:>10} ms{r['first_response_ms']:>10} ms{r['first_request_ms']:>11} ms"
+              f"{r['ready_ms']:>7} ms{r['warm_request_ms']:>7} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de démarrage à froid d'Alto (API amont factices)")
+    parser.add_argument("--modes", default="off,background,blocking",
+                        help=f"modes d'échauffement comparés, parmi {', '.join(MODES)}")
+    parser.add_argument("--runs", type=int, default=3, help="démarrages par mode (médiane)")
+    parser.add_argument("--top", type=int, default=10, help="modules les plus coûteux à afficher (0 : aucun)")
+    parser.add_argument("--latency", action="append", metavar="SERVICE=SECONDES",
+                        help="latence injectée côté API factices (voir bench/mock_upstreams.py), répétable")
+    parser.add_argument("--output", help="écrit le rapport JSON dans ce fichier")
+    opts = parser.parse_args()
+    for mode in opts.modes.split(","):
+        if mode not in MODES:
+            parser.error(f"mode inconnu : {mode}")
+
+    report = asyncio.run(run(opts))
+    print_report(report)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import os
+
+# Les modules de l'application créent leurs clients à l'import
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
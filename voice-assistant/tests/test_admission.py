@@ -0,0 +1,115 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import main
+from app.governor import admission
+
+
+async def _call(path: str, files, data: dict, on_first_chunk=None) -> list[dict]:
+    """
+    Appel ASGI direct (sans client de test, qui attendrait la fin du corps) :
+    `on_first_chunk` est appelée au premier morceau de corps, flux encore ouvert.
+    """
+    request = httpx.Request("POST", f"http://test{path}", files=files, data=data)
+    body = request.read()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in request.headers.items()],
+        "client": ("test", 1), "server": ("test", 80),
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()
+
+    messages = []
+
+    async def send(message):
+        if on_first_chunk and message["type"] == "http.response.body" and message.get("body") and not any(
+            m["type"] == "http.response.body" and m.get("body") for m in messages
+        ):
+            await on_first_chunk()
+        messages.append(message)
+
+    await main.app(scope, receive, send)
+    return messages
+
+
+@pytest.fixture
+def idle_admission(monkeypatch):
+    monkeypatch.setattr(admission, "inflight", 0)
+    monkeypatch.setattr(admission, "limit", 4)
+    return admission
+
+
+def test_stream_holds_its_slot_until_the_body_is_sent(monkeypatch, idle_admission):
+    release = asyncio.Event()
+    observed = []
+
+    async def transcribe(file):
+        return "bonjour"
+
+    async def reply(transcript, lat, lng, session_id):
+        await release.wait()
+        yield {"type": "done", "transcript": transcript, "response_text": "Salut.", "action": None}
+
+    async def first_chunk():
+        observed.append(admission.inflight)
+        release.set()
+
+    monkeypatch.setattr(main, "_transcribe_upload", transcribe)
+    monkeypatch.setattr(main, "_spoken_reply", reply)
+    messages = asyncio.run(
+        _call("/process-voice-stream", {"file": ("a.wav", b"RIFF", "audio/wav")}, {}, first_chunk)
+    )
+    assert messages[0]["status"] == 200
+    assert observed == [1]
+    assert admission.inflight == 0
+
+
+def test_stream_releases_its_slot_when_transcription_fails(monkeypatch, idle_admission):
+    async def transcribe(file):
+        raise RuntimeError("whisper down")
+
+    monkeypatch.setattr(main, "_transcribe_upload", transcribe)
+    with pytest.raises(RuntimeError):
+        asyncio.run(_call("/process-voice-stream", {"file": ("a.wav", b"RIFF", "audio/wav")}, {}))
+    assert admission.inflight == 0
+
+
+def test_batch_counts_its_parallelism_against_admission(monkeypatch, idle_admission):
+    release = asyncio.Event()
+    observed = []
+
+    async def collect(files):
+        return ["a.wav", "b.wav"]
+
+    async def run_batch(items, mode, lat, lng, concurrency):
+        yield {"name": items[0]}
+        await release.wait()
+        yield {"summary": True}
+
+    async def first_chunk():
+        observed.append(admission.inflight)
+        release.set()
+
+    monkeypatch.setattr(main, "collect_items", collect)
+    monkeypatch.setattr(main, "run_batch", run_batch)
+    files = {"files": ("a.wav", b"RIFF", "audio/wav")}
+    messages = asyncio.run(_call("/batch", files, {"concurrency": "3"}, first_chunk))
+    assert messages[0]["status"] == 200
+    assert observed == [3]
+    assert admission.inflight == 0
+
+    # Serveur déjà chargé : le lot est refusé sans rien lancer
+    admission.inflight = 3
+    messages = asyncio.run(_call("/batch", files, {"concurrency": "3"}))
+    assert messages[0]["status"] == 503
+    assert admission.inflight == 3
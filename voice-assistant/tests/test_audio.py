@@ -0,0 +1,179 @@
+import io
+import logging
+import wave
+
+import numpy as np
+import pytest
+
+from app import audio
+from app.audio import TARGET_RATE, decode, preprocess, resample, split_at_silences, trim_silence
+
+
+def _tone(seconds: float, rate: int, freq: float = 220.0, amplitude: float = 0.3) -> np.ndarray:
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def _silence(seconds: float, rate: int) -> np.ndarray:
+    # Léger bruit de fond : un vrai micro n'enregistre jamais des zéros
+    return np.random.default_rng(0).normal(0, 0.0002, int(seconds * rate)).astype(np.float32)
+
+
+def _wav(samples: np.ndarray, rate: int, channels: int = 1, width: int = 2) -> bytes:
+    """Fixture WAV générée : mono dupliqué sur `channels` canaux, PCM `width` octets."""
+    frames = np.repeat(samples.reshape(-1, 1), channels, axis=1)
+    ints = (np.clip(frames, -1, 1) * (2 ** (8 * width - 1) - 1)).astype(np.int32)
+    if width == 1:
+        raw = (ints + 128).astype(np.uint8).tobytes()
+    elif width == 2:
+        raw = ints.astype("<i2").tobytes()
+    else:
+        raw = b"".join(int(v).to_bytes(3, "little", signed=True) for v in ints.ravel())
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(width)
+        w.setframerate(rate)
+        w.writeframes(raw)
+    return buf.getvalue()
+
+
+def _dominant_hz(x: np.ndarray, rate: int) -> float:
+    spectrum = np.abs(np.fft.rfft(x))
+    return float(np.fft.rfftfreq(len(x), 1 / rate)[np.argmax(spectrum)])
+
+
+# 🎧 Décodage
+@pytest.mark.parametrize("width", [2, 3])
+def test_decode_wav_stereo(width):
+    samples, rate = decode(_wav(_tone(0.5, 44100), 44100, channels=2, width=width))
+    assert rate == 44100
+    assert samples.shape == (22050, 2)
+    assert np.abs(samples).max() == pytest.approx(0.3, abs=0.01)
+
+
+def test_undecodable_input_without_ffmpeg(monkeypatch):
+    monkeypatch.setattr(audio, "FFMPEG", None)
+    assert decode(b"\x1aE\xdf\xa3 webm ?") is None
+
+
+# 🔧 Traitements
+def test_resample_keeps_duration_and_pitch():
+    x = _tone(1.0, 44100, freq=1000)
+    y = resample(x, 44100)
+    assert len(y) == TARGET_RATE
+    assert _dominant_hz(y, TARGET_RATE) == pytest.approx(1000, abs=2)
+
+
+def test_resample_same_rate_is_identity():
+    x = _tone(0.1, TARGET_RATE)
+    assert np.array_equal(resample(x, TARGET_RATE), x)
+
+
+def test_resample_filters_frequencies_above_new_nyquist():
+    # 12 kHz n'existe pas à 16 kHz : sans filtre, il se replierait en 4 kHz
+    y = resample(_tone(1.0, 48000, freq=12000), 48000)
+    assert np.sqrt(np.mean(y ** 2)) < 0.01
+
+
+def test_trim_silence_keeps_speech_and_padding():
+    rate = TARGET_RATE
+    x = np.concatenate([_silence(1.0, rate), _tone(2.0, rate), _silence(1.5, rate)])
+    y = trim_silence(x, rate, pad_ms=200)
+    assert 2.0 <= len(y) / rate <= 2.0 + 2 * 0.2 + 0.06
+
+
+def test_trim_silence_only_silence():
+    assert len(trim_silence(_silence(2.0, TARGET_RATE), TARGET_RATE)) == 0
+
+
+def test_split_short_recording_is_one_piece():
+    x = _tone(10.0, TARGET_RATE)
+    pieces = split_at_silences(x, chunk_s=30)
+    assert len(pieces) == 1 and pieces[0] is x
+
+
+def test_split_cuts_in_pauses_with_overlap():
+    rate = TARGET_RATE
+    # Phrases de 9 s séparées par des pauses de 1 s : 70 s au total
+    sentence = np.concatenate([_tone(9.0, rate), _silence(1.0, rate)])
+    x = np.tile(sentence, 7)
+    pieces = split_at_silences(x, rate, chunk_s=30, search_s=8, overlap_s=1)
+    assert len(pieces) == 3
+    assert all(len(p) <= (30 + 1) * rate for p in pieces)
+    # Les morceaux se recouvrent d'une seconde : la somme dépasse la durée d'autant
+    assert sum(len(p) for p in pieces) == pytest.approx(len(x) + 2 * rate, abs=2)
+    # Chaque coupure (au milieu du recouvrement) tombe dans une pause
+    start = 0
+    for piece in pieces[:-1]:
+        cut = start + len(piece) - rate // 2
+        assert cut % (10 * rate) >= 9 * rate
+        start += len(piece) - rate
+
+
+# 📦 Chaîne complète
+def test_preprocess_wav():
+    rate = 44100
+    x = np.concatenate([_silence(0.8, rate), _tone(2.0, rate), _silence(0.8, rate)])
+    chunks, duration = preprocess(_wav(x, rate, channels=2), "upload.wav")
+    assert len(chunks) == 1
+    assert 2.0 <= duration <= 2.5
+    if chunks[0][1].endswith(".wav"):
+        samples, out_rate = decode(chunks[0][0])
+        assert out_rate == TARGET_RATE and samples.shape[1] == 1
+
+
+def test_preprocess_long_recording_is_chunked():
+    rate = TARGET_RATE
+    sentence = np.concatenate([_tone(9.0, rate), _silence(1.0, rate)])
+    chunks, duration = preprocess(_wav(np.tile(sentence, 7), rate), "dictee.wav")
+    assert len(chunks) > 1
+    assert duration > 60
+
+
+def test_preprocess_silence_only():
+    assert preprocess(_wav(_silence(2.0, TARGET_RATE), TARGET_RATE), "vide.wav") == ([], 0.0)
+
+
+def test_preprocess_undecodable_passes_through(monkeypatch):
+    monkeypatch.setattr(audio, "FFMPEG", None)
+    data = b"\x1aE\xdf\xa3" + bytes(100)
+    assert preprocess(data, "audio.webm") == ([(data, "audio.webm")], -1.0)
+
+
+def test_missing_ffmpeg_is_reported(monkeypatch, caplog):
+    monkeypatch.setattr(audio, "FFMPEG", None)
+    monkeypatch.setattr(audio, "AUDIO_PREPROCESS", True)
+    with caplog.at_level(logging.WARNING, logger="app.audio"):
+        audio.check_decoders()
+    assert "ffmpeg" in caplog.text
+
+
+def test_preprocess_keeps_original_when_reencoding_is_larger(monkeypatch):
+    # WAV 8 kHz 8 bits (64 kbit/s) : le WAV 16 kHz 16 bits ré-encodé serait quatre fois plus gros
+    monkeypatch.setattr(audio, "soundfile", None)
+    rate = 8000
+    samples = np.concatenate([_silence(0.2, rate), _tone(2.0, rate), _silence(0.2, rate)])
+    data = _wav(samples, rate, width=1)
+    chunks, duration = preprocess(data, "appel.wav")
+    assert chunks == [(data, "appel.wav")]
+    assert 2.0 <= duration <= 2.5
+
+
+@pytest.mark.parametrize("rate", [8000, 22050, 44100, 48000])
+def test_stream_resampler_matches_whole_recording(rate):
+    x = _tone(2.0, rate, freq=440)
+    sizes = np.random.default_rng(1).integers(50, 2000, size=len(x))
+    stream = audio.StreamResampler(rate)
+    pieces, start = [], 0
+    for size in sizes:
+        if start >= len(x):
+            break
+        pieces.append(stream.feed(x[start:start + size]))
+        start += size
+    streamed = np.concatenate(pieces)
+    whole = resample(x, rate)
+    # Pas de dérive : seuls les derniers échantillons (encore dans le filtre) manquent
+    assert len(whole) - 32 * TARGET_RATE / rate - 1 <= len(streamed) <= len(whole)
+    # Pas d'artefact aux jonctions : mêmes échantillons que d'un seul bloc
+    assert np.abs(streamed - whole[:len(streamed)]).max() < 1e-4
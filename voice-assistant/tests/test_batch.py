@@ -0,0 +1,46 @@
+import asyncio
+
+from app import batch, utils
+from app.batch import BatchItem, run_batch
+
+
+class _CountingRouter:
+    """Fournisseur STT factice qui mesure ses appels simultanés."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    def route(self, duration):
+        return None
+
+    async def transcribe(self, audio, filename, duration=None, provider=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return "morceau"
+
+
+def test_batch_caps_stt_calls_across_items_and_chunks(monkeypatch):
+    router = _CountingRouter()
+
+    async def long_recording(data, filename):
+        # Dictée de quatre minutes : huit morceaux transcrits en parallèle
+        return [(b"pcm", f"part{i}.flac") for i in range(8)], 240.0
+
+    monkeypatch.setattr(utils, "speech_router", router)
+    monkeypatch.setattr(utils, "preprocess_audio", long_recording)
+    monkeypatch.setattr(batch, "BATCH_STT_PARALLELISM", 5)
+
+    async def read():
+        return b"RIFF"
+
+    items = [BatchItem(f"dictee{i}.wav", 4, read) for i in range(4)]
+
+    async def run():
+        return [event async for event in run_batch(items, "transcribe", concurrency=4)]
+
+    events = asyncio.run(run())
+    assert events[-1]["succeeded"] == 4
+    assert router.peak == 5
@@ -0,0 +1,32 @@
+import asyncio
+
+from app.cache import AsyncTTLCache
+
+
+def test_explicit_zero_ttl_is_not_kept():
+    cache = AsyncTTLCache("test", ttl=60)
+    cache.set("a", 1)
+    cache.set("a", 2, ttl=0)
+    cache.set("b", 3, ttl=0)
+    assert cache.get("a") is None and cache.get("b") is None
+
+
+def test_get_or_fetch_with_zero_ttl_fetches_every_time():
+    cache = AsyncTTLCache("test", ttl=60)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    async def run():
+        return [await cache.get_or_fetch("k", fetch, ttl=0) for _ in range(2)]
+
+    assert asyncio.run(run()) == [1, 2]
+    assert cache.stats()["size"] == 0
+
+
+def test_default_ttl_applies_when_none_is_given():
+    cache = AsyncTTLCache("test", ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a")[1] == 1
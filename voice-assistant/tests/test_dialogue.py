@@ -0,0 +1,76 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app import utils
+
+
+class _FailingCompletions:
+    async def create(self, **kwargs):
+        raise RuntimeError("upstream down")
+
+
+class _SpySpeculation:
+    def __init__(self):
+        self.discarded = False
+
+    def take(self, name, args):
+        return None
+
+    def discard(self):
+        self.discarded = True
+
+
+def test_speculation_is_discarded_when_the_llm_call_fails(monkeypatch):
+    spy = _SpySpeculation()
+    monkeypatch.setattr(utils, "client", SimpleNamespace(chat=SimpleNamespace(completions=_FailingCompletions())))
+    monkeypatch.setattr(utils.speculator, "start", lambda *args, **kwargs: spy)
+
+    async def run():
+        async for _ in utils.ask_gpt_stream("Raconte-moi une histoire", session_id="test-speculation"):
+            pass
+
+    with pytest.raises(RuntimeError, match="upstream down"):
+        asyncio.run(run())
+    assert spy.discarded
+
+
+def _chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class _TwoRoundCompletions:
+    """Premier tour : une phrase puis un appel d'outil ; second tour : la réponse."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            call = SimpleNamespace(index=0, id="call_1",
+                                   function=SimpleNamespace(name="outil_inconnu", arguments="{}"))
+            chunks = [_chunk("Je regarde "), _chunk("ça pour vous."), _chunk(tool_calls=[call])]
+        else:
+            chunks = [_chunk("Il fait 12 degrés "), _chunk("à Mons. Prenez un parapluie.")]
+
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+
+        return stream()
+
+
+def test_text_of_successive_rounds_is_not_glued(monkeypatch):
+    monkeypatch.setattr(utils, "client", SimpleNamespace(chat=SimpleNamespace(completions=_TwoRoundCompletions())))
+
+    async def run():
+        return [e async for e in utils.ask_gpt_stream("Quel temps fait-il dehors, en détail ?",
+                                                      session_id="test-rounds")]
+
+    events = asyncio.run(run())
+    sentences = [e["text"] for e in events if e["type"] == "sentence"]
+    assert sentences == ["Je regarde ça pour vous.", "Il fait 12 degrés à Mons.", "Prenez un parapluie."]
+    assert events[-1]["text_to_speak"] == "Je regarde ça pour vous. Il fait 12 degrés à Mons. Prenez un parapluie."
@@ -0,0 +1,66 @@
+import pytest
+
+from app.intents import IntentRouter
+
+
+@pytest.fixture
+def router():
+    return IntentRouter(threshold=0.85, enabled=True)
+
+
+def _routed(router, text):
+    match = router.route(text)
+    return (match.tool, match.args) if match else None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Quelle est la météo à Paris", ("get_weather", {"city": "Paris"})),
+    ("Quel temps fait-il à Saint-Jean-de-Luz", ("get_weather", {"city": "Saint-Jean-de-Luz"})),
+    ("quel temps va-t-il faire à La Roche-en-Ardenne", ("get_weather", {"city": "La Roche-en-Ardenne"})),
+    ("Quel temps fera-t-il demain à Lyon", ("get_weather_forecast", {"city": "Lyon", "days_ahead": 1})),
+    ("Météo à Mons demain", ("get_weather_forecast", {"city": "Mons", "days_ahead": 1})),
+    ("la météo de demain à Bruxelles", ("get_weather_forecast", {"city": "Bruxelles", "days_ahead": 1})),
+    ("Quel temps fait-il", ("get_weather", {})),
+])
+def test_weather_with_city(router, text, expected):
+    assert _routed(router, text) == expected
+
+
+@pytest.mark.parametrize("text", ["Météo pour demain", "Météo de demain"])
+def test_time_word_is_not_a_city(router, text):
+    assert _routed(router, text) == ("get_weather_forecast", {"days_ahead": 1})
+
+
+@pytest.mark.parametrize("text", [
+    "météo de la semaine",
+    "Météo du week-end à Mons",
+    "il fait quel temps en Espagne cette semaine",
+    "Quel temps fera-t-il en fin de semaine",
+    "Météo pour le week-end",
+    "météo de la semaine prochaine à Namur",
+])
+def test_multi_day_periods_are_left_to_gpt(router, text):
+    assert router.route(text) is None
+
+
+@pytest.mark.parametrize("text, name", [
+    ("Appelle Maman", "Maman"),
+    ("Téléphone à Didier maintenant", "Didier"),
+    ("Appelle Maman tout de suite", "Maman"),
+    ("Appelle Jean-Pierre Dupont", "Jean-Pierre Dupont"),
+])
+def test_call_name_stops_before_time_words(router, text, name):
+    assert _routed(router, text) == ("prepare_call_contact", {"recipient_name": name})
+
+
+@pytest.mark.parametrize("text", [
+    "Appelle Maman ce soir",
+    "Appelle le médecin demain",
+    "Appelle Papa demain matin",
+])
+def test_deferred_calls_are_left_to_gpt(router, text):
+    assert router.route(text) is None
+
+
+def test_several_cities_are_left_to_gpt(router):
+    assert router.route("Météo à Mons et à Namur") is None
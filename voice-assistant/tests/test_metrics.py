@@ -0,0 +1,30 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.metrics import UNMATCHED_ENDPOINT, TimingMiddleware, request_duration, stage
+
+
+def _endpoints() -> set[str]:
+    return {endpoint for endpoint, _ in request_duration._series}
+
+
+def test_endpoint_label_is_the_route_template():
+    app = FastAPI()
+    app.add_middleware(TimingMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        with stage("lookup"):
+            return {"id": item_id}
+
+    with TestClient(app) as client:
+        for item_id in range(5):
+            assert client.get(f"/items/{item_id}").status_code == 200
+        for path in ("/wp-login.php", "/.env", "/items"):
+            client.get(path)
+
+    endpoints = _endpoints()
+    assert "/items/{item_id}" in endpoints
+    assert UNMATCHED_ENDPOINT in endpoints
+    assert not any(e.startswith("/items/") and e != "/items/{item_id}" for e in endpoints)
+    assert not {"/wp-login.php", "/.env", "/items"} & endpoints
@@ -0,0 +1,34 @@
+from app.utils import SentenceSplitter
+
+
+def _run(deltas: list[str], min_chars: int = 20) -> list[str]:
+    splitter = SentenceSplitter(min_chars)
+    sentences = [s for delta in deltas for s in splitter.feed(delta)]
+    rest = splitter.flush()
+    return sentences + ([rest] if rest else [])
+
+
+def test_short_sentence_keeps_separator_across_deltas():
+    assert _run(["Bonjour. ", "Il est 15 h."]) == ["Bonjour. Il est 15 h."]
+
+
+def test_paragraph_break_keeps_separator():
+    assert _run(["Bonjour.\n\n", "Il est 15 h."]) == ["Bonjour. Il est 15 h."]
+
+
+def test_token_sized_deltas():
+    text = "Bonjour. Il est 15 h à Mons. Voulez-vous la météo de demain ?\n\nJe peux aussi l'ajouter."
+    deltas = [text[i:i + 3] for i in range(0, len(text), 3)]
+    sentences = _run(deltas)
+    assert " ".join(sentences) == " ".join(text.split())
+    assert sentences == [
+        "Bonjour. Il est 15 h à Mons.",
+        "Voulez-vous la météo de demain ?",
+        "Je peux aussi l'ajouter.",
+    ]
+
+
+def test_long_sentence_is_sent_as_soon_as_it_ends():
+    splitter = SentenceSplitter(10)
+    assert splitter.feed("Voici la première phrase. Et la") == ["Voici la première phrase."]
+    assert splitter.flush() == "Et la"
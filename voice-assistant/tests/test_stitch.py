@@ -0,0 +1,28 @@
+import pytest
+
+from app.utils import stitch_transcripts
+
+
+@pytest.mark.parametrize("texts, expected", [
+    # Chevauchement simple, mot coupé écorché d'un côté
+    (["Je vais à la gare de Mons", "gare de Mons pour prendre le train"],
+     "Je vais à la gare de Mons pour prendre le train"),
+    (["nous partirons demain matin vers", "demain matin vers dix heures"],
+     "nous partirons demain matin vers dix heures"),
+    (["il faudra acheter du pain et du beurr", "du pain et du beurre demain"],
+     "il faudra acheter du pain et du beurre demain"),
+    # Sans passage commun : simple concaténation
+    (["Bonjour à tous.", "Voici la suite."], "Bonjour à tous. Voici la suite."),
+])
+def test_overlap_is_removed(texts, expected):
+    assert stitch_transcripts(texts) == expected
+
+
+@pytest.mark.parametrize("texts, expected", [
+    (["bon alors bon alors", "bon alors on y va"], "bon alors bon alors on y va"),
+    (["je suis allé à la gare. La gare", "La gare était fermée."],
+     "je suis allé à la gare. La gare était fermée."),
+    (["merci merci merci beaucoup", "merci beaucoup pour tout"], "merci merci merci beaucoup pour tout"),
+])
+def test_repeated_phrase_across_a_cut(texts, expected):
+    assert stitch_transcripts(texts) == expected